@@ -0,0 +1,319 @@
+# Python package imports
+import os
+import time as t
+import numpy as np
+import pandas as pd
+import yaml
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import fields, replace
+from typing import Optional
+
+# Internal imports
+from .NumaxProxies import NumaxProxies, PROXY_METHODS, read_global_config
+from .data_preparation.dataclasses import *
+from .proxies.ScalingRelations import query_gaia_bulk
+from .proxies.ScalingRelations.gaia_cache import gaia_cache_from_config
+from .proxies.FliPer import predict_batch
+
+
+class NumaxCatalog:
+
+    def __init__(
+        self,
+        global_config : GlobalConfig,
+        manifest : pd.DataFrame,
+        proxies : Optional[tuple] = None,
+        max_workers : Optional[int] = None,
+        blas_threads : int = 1,
+        gaia_batch_size : int = 5000,
+    ):
+        """
+        Initialize NumaxCatalog class: one NumaxProxies run per row of the manifest.
+
+        Inputs:
+            global_config   : configuration shared by all targets (as read from YAML)
+            manifest        : table with a "target" column, every other column overrides
+                                the field of the same name in StarInfo, LightCurveInput,
+                                PSDInput or ProcessingConfig for that target
+            proxies         : names of the proxies to compute (keys of PROXY_METHODS),
+                                defaults to config.proxies of each target
+            max_workers     : number of worker processes (defaults to number of cores)
+            blas_threads    : threads each worker may use for numpy/scipy, keep at 1 so
+                                the worker processes do not oversubscribe the cores
+            gaia_batch_size : number of targets per bulk SIMBAD/Gaia job (see query_gaia_bulk)
+        """
+        self.global_config = global_config
+        self.max_workers = max_workers or os.cpu_count()
+        self.blas_threads = blas_threads
+        self.gaia_batch_size = gaia_batch_size
+        self.star_configs = star_configs_from_manifest(global_config, manifest)
+        if proxies is not None:
+            for star_config in self.star_configs:
+                star_config.config.proxies = list(proxies)
+
+        unknown = {
+            name for star_config in self.star_configs 
+            for name in star_config.config.proxies if name not in PROXY_METHODS
+        }
+        if unknown:
+            raise ValueError(f"Unknown proxies: {sorted(unknown)}. Choose from {list(PROXY_METHODS)}")
+        self.rows = []
+
+    @classmethod
+    def read_manifest(cls, yaml_path : str, manifest_path : str, **kwargs):
+        """Grab shared config from yaml file and targets from manifest file (CSV/Parquet/Feather)"""
+        return cls(
+            global_config=read_global_config(yaml_path),
+            manifest=read_manifest_file(manifest_path),
+            **kwargs
+        )
+
+    def run(self, results_file : Optional[str] = None) -> "NumaxCatalog":
+        """Run pipeline for all targets in the manifest, spread across a process pool"""
+        start = t.time()
+        n_targets = len(self.star_configs)
+        rows = [None] * n_targets
+        gaia_data = self._query_gaia_bulk()
+
+        if self.max_workers == 1:
+            # Run in this process (easier for debugging)
+            for i, star_config in enumerate(self.star_configs):
+                rows[i] = _process_star(star_config, gaia_data[i])
+        else:
+            with ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(self.blas_threads,),
+            ) as executor:
+                futures = {
+                    executor.submit(_process_star, star_config, gaia_data[i]): i
+                    for i, star_config in enumerate(self.star_configs)
+                }
+                for n_done, future in enumerate(as_completed(futures), start=1):
+                    rows[futures[future]] = future.result()
+                    if n_done % 100 == 0:
+                        print(f'Processed {n_done}/{n_targets} targets')
+
+        # Keep manifest order in the consolidated table
+        self.rows = [row for star_rows in rows for row in star_rows]
+        self._predict_fliper()
+
+        end = t.time()
+        print(
+            f'Catalog of {n_targets} targets processed in {np.round(end-start, 3)} seconds '
+            f'({np.round(n_targets / (end-start) * 3600 / self.max_workers, 1)} stars/hour per core)'
+        )
+
+        if results_file is not None:
+            self.save_results(results_file)
+        return self
+
+    def _query_gaia_bulk(self) -> list:
+        """
+        Gaia data of all targets with query_gaia set, queried in bulk before the stars are processed
+        (None for targets without query_gaia, and for targets whose query failed, which are then queried on their own)
+        """
+        gaia_data = [None] * len(self.star_configs)
+        targets = [
+            i for i, star_config in enumerate(self.star_configs)
+            if star_config.config.query_gaia and "scaling_relations" in star_config.config.proxies
+        ]
+        if not targets:
+            return gaia_data
+
+        start = t.time()
+        try:
+            results = query_gaia_bulk(
+                ids=[self.star_configs[i].star.target for i in targets],
+                batch_size=self.gaia_batch_size,
+                cache=gaia_cache_from_config(self.global_config.config),
+            )
+        except Exception as e:
+            # Every target is queried on its own while it is processed instead
+            print('Bulk Gaia query failed, querying targets one by one:', e)
+            return gaia_data
+        for i in targets:
+            gaia_data[i] = results.get(self.star_configs[i].star.target)
+        print(f'Gaia data of {len(targets)} targets queried in {np.round(t.time()-start, 3)} seconds')
+        return gaia_data
+
+    def _predict_fliper(self):
+        """
+        FliPer numax of all targets with one prediction of the random forest
+        (the workers only return the feature rows, see _process_star)
+        """
+        fliper_rows = [row for row in self.rows if "fliper_features" in row]
+        if not fliper_rows:
+            return
+
+        start = t.time()
+        features = np.array([row.pop("fliper_features") for row in fliper_rows])
+        try:
+            numax = predict_batch(features)
+        except Exception as e:
+            print('FliPer prediction failed:', e)
+            for row in fliper_rows:
+                row["error"] = f'{type(e).__name__}: {e}'
+            return
+        for row, value in zip(fliper_rows, numax):
+            row["numax"] = value
+        print(f'FliPer numax of {len(fliper_rows)} targets predicted in {np.round(t.time()-start, 3)} seconds')
+
+    @property
+    def results(self) -> pd.DataFrame:
+        """Consolidated results: one row per target and numax estimate"""
+        return pd.DataFrame(
+            self.rows, columns=["target", "label", "numax", "numax_err", "runtime", "error"]
+        )
+
+    def save_results(self, filename : str):
+        """Save consolidated results table to .csv, .parquet or .ftr/.feather file"""
+        df = self.results
+        if filename.endswith('.parquet') or filename.endswith('.pq'):
+            df.to_parquet(filename, index=False)
+        elif filename.endswith('.feather') or filename.endswith('.ftr'):
+            df.to_feather(filename)
+        else:
+            df.to_csv(filename, index=False)
+
+
+def read_manifest_file(filename : str) -> pd.DataFrame:
+    """Read manifest of targets from .csv, .parquet or .ftr/.feather file"""
+    if filename.endswith('.parquet') or filename.endswith('.pq'):
+        manifest = pd.read_parquet(filename)
+    elif filename.endswith('.feather') or filename.endswith('.ftr'):
+        manifest = pd.read_feather(filename)
+    else:
+        manifest = pd.read_csv(filename)
+
+    if "target" not in manifest.columns:
+        raise ValueError(f"Manifest {filename} needs a 'target' column")
+    return manifest
+
+
+def star_configs_from_manifest(global_config : GlobalConfig, manifest : pd.DataFrame) -> list[GlobalConfig]:
+    """
+    Build one GlobalConfig per target in the manifest.
+
+    Input:
+        global_config   : shared configuration
+        manifest        : table of targets and per-star overrides
+
+    Output:
+        star_configs    : list of GlobalConfig, one per manifest row
+    """
+    # Which dataclass does each manifest column override?
+    sections = {
+        "star": StarInfo,
+        "lightcurve": LightCurveInput,
+        "psd": PSDInput,
+        "config": ProcessingConfig,
+    }
+    # Proxy configs share field names (min_freq, max_freq, ...), so their columns are "<YAML section>.<field>"
+    proxy_sections = {
+        "acf_config": ("ACF_CONFIG", ACFConfig),
+        "cov_config": ("COV_CONFIG", COVConfig),
+        "eacf_config": ("EACF_CONFIG", EACFConfig),
+    }
+    column_section = {}
+    for section, cls in sections.items():
+        for f in fields(cls):
+            column_section[f.name] = (section, f)
+    for section, (prefix, cls) in proxy_sections.items():
+        for f in fields(cls):
+            column_section[f"{prefix}.{f.name}"] = (section, f)
+
+    unknown = [col for col in manifest.columns if col not in column_section]
+    if unknown:
+        raise ValueError(
+            f"Manifest columns {unknown} do not match any StarInfo/ProcessingConfig field "
+            "(or ACF_CONFIG.<field>, COV_CONFIG.<field>, EACF_CONFIG.<field>)"
+        )
+
+    star_configs = []
+    for record in manifest.to_dict(orient="records"):
+        overrides = {section: {} for section in (*sections, *proxy_sections)}
+        for col, value in record.items():
+            section, f = column_section[col]
+            value = parse_manifest_value(value, f)
+            if value is not None:
+                overrides[section][f.name] = value
+
+        # Results are collected in one table, not one file per star
+        overrides["config"]["save_results"] = False
+
+        star_configs.append(GlobalConfig(
+            star=replace(global_config.star, **overrides["star"]),
+            lightcurve=replace(global_config.lightcurve, **overrides["lightcurve"]),
+            psd=replace(global_config.psd, **overrides["psd"]),
+            config=replace(global_config.config, **overrides["config"]),
+            acf_config=replace(global_config.acf_config, **overrides["acf_config"]),
+            cov_config=replace(global_config.cov_config, **overrides["cov_config"]),
+            eacf_config=replace(global_config.eacf_config, **overrides["eacf_config"]),
+        ))
+    return star_configs
+
+
+def parse_manifest_value(value, f):
+    """Convert manifest cell to the type of the dataclass field (empty cells give None)"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, np.ndarray):
+        value = value.tolist()
+    if f.name == "target":
+        return str(value)
+    if isinstance(value, str) and f.name not in ("lc_file", "fits_file_folder", "psd_file", "avg_psd_file"):
+        # e.g. "[1, 2, 3]" or "true"
+        value = yaml.safe_load(value)
+    if "list" in str(f.type) and not isinstance(value, list):
+        value = [value]
+    return value
+
+
+def _init_worker(blas_threads : int):
+    """Initialize worker process: no interactive plotting and limited BLAS threads"""
+    import matplotlib
+    matplotlib.use("Agg")
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return
+    threadpool_limits(limits=blas_threads)
+
+
+def _process_star(global_config : GlobalConfig, gaia_data : Optional[GaiaData] = None) -> list[dict]:
+    """Load, process and compute numax proxies for a single target (with Gaia data queried in bulk if given)"""
+    target = global_config.star.target
+    start = t.time()
+    try:
+        proxy = NumaxProxies(global_config=global_config)
+        if gaia_data is not None:
+            proxy.gaia_data = gaia_data
+        proxy.run()
+        fliper_features = None
+        for name in global_config.config.proxies:
+            if name == "FliPer":
+                # Predicted for all targets at once (see NumaxCatalog._predict_fliper)
+                fliper_features = proxy.fliper_features()
+                proxy.numax_estimates["numax_FliPer"] = np.nan
+            else:
+                getattr(proxy, PROXY_METHODS[name])()
+        rows = proxy._result_rows()
+        for row in rows:
+            if row["label"] == "numax_FliPer" and fliper_features is not None:
+                row["fliper_features"] = fliper_features
+        error = None
+    except Exception as e:
+        print(f'{target} failed:', e)
+        rows = []
+        error = f'{type(e).__name__}: {e}'
+    runtime = t.time() - start
+
+    if not rows:
+        rows = [{"label": None, "numax": np.nan, "numax_err": np.nan}]
+    return [
+        {"target": target, **row, "runtime": runtime, "error": error}
+        for row in rows
+    ]
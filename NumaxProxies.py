@@ -1,4 +1,5 @@
 # Python package imports
+import os
 import numpy as np
 from uncertainties import unumpy as unp
 import lightkurve as lk
@@ -11,12 +12,23 @@ import pandas as pd
 import yaml
 import pyarrow.feather as feather
 import time as t
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
 
 # Internal imports
 from .data_preparation import GetLightcurve, DataProcessing, read_json_file
 from .data_preparation.dataclasses import *
+from .data_preparation.stage_cache import (
+    StageCache, 
+    LIGHTCURVE_FIELDS, 
+    PSD_FIELDS, 
+    AVG_PSD_FIELDS, 
+    WELCH_FIELDS
+)
 from .plotting import plot_spectrum_with_all_numax_estimates
 from .proxies.ScalingRelations import query_gaia
+from .proxies.ScalingRelations.gaia_cache import gaia_cache_from_config
+from .proxies.background import BackgroundCache
 from .proxies import (
     NumaxFromACF,
     NumaxFromScalingRelations,
@@ -25,6 +37,21 @@ from .proxies import (
     NumaxFromEACF
 )
 
+# Proxy names (as used in manifests and batch runs) and the method computing them
+PROXY_METHODS = {
+    "acf": "compute_numax_from_acf",
+    "CoV": "compute_numax_from_CoV",
+    "scaling_relations": "compute_numax_from_scaling_relations",
+    "FliPer": "compute_numax_from_FliPer",
+    "EACF": "compute_numax_from_EACF",
+}
+
+# Plotting (pyplot state) and writing to the results folders is not thread safe
+_OUTPUT_LOCK = threading.RLock()
+
+# Background threads for Gaia/SIMBAD queries (network bound)
+_GAIA_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="gaia_query")
+
 class NumaxProxies:
 
     def __init__(self, global_config : GlobalConfig):
@@ -39,44 +66,118 @@ class NumaxProxies:
         self.acf_config: ACFConfig = global_config.acf_config
         self.cov_config: COVConfig = global_config.cov_config
         self.eacf_config: EACFConfig = global_config.eacf_config
+        # Gaia data (see gaia_data property) and the background query producing it
+        self._gaia_data: Optional[GaiaData] = None
+        self._gaia_query: Optional[Future] = None
+        # Median-filtered backgrounds of the PSDs, shared by the proxies and plotting
+        self.background_cache = BackgroundCache(mode=self.config.background_mode)
 
-    def compute_numax_from_acf(self) -> float:
+    def compute_numax_from_acf(self):
         """
         Compute νmax using the 2D autocorrelation proxy.
         """
-        # import matplotlib.pyplot as plt
+        self.numax_estimates.update(self._numax_from_acf())
+
+    def compute_numax_from_scaling_relations(self):
+        """
+        Compute νmax using the scaling relations.
+        """
+        self.numax_estimates.update(self._numax_from_scaling_relations())
+
+    def compute_numax_from_CoV(self):
+        """
+        Compute νmax using coefficients of variation (Vianni et al. 2018)
+        """
+        self.numax_estimates.update(self._numax_from_CoV())
+
+    def compute_numax_from_FliPer(self, plot=True):
+        """
+        Compute numax with method from Bugnet et al. (2018).
+
+        Input:
+            Noise estimate (usually done with magnitude, but we have to be a bit smarter)
+            Teff
+        """
+        self.numax_estimates.update(self._numax_from_FliPer(plot=plot))
+
+    def compute_numax_from_EACF(self):
+        """Compute numax with method from Mosser & Appourchaux (2009) and I.W. Roxburgh (2009)"""
+        self.numax_estimates.update(self._numax_from_EACF())
+
+    def compute_all(self, proxies : Optional[list] = None, max_workers : Optional[int] = None) -> "NumaxProxies":
+        """
+        Compute independent proxies concurrently in a thread pool, once the PSDs are built.
+
+        The heavy lifting of each proxy is done in numpy/scipy, so threads overlap well.
+        The scaling relations wait for the Gaia query (started here if run() did not).
+        Estimates are added to numax_estimates in the order of PROXY_METHODS,
+        regardless of which proxy finishes first.
+
+        Input:
+            proxies     : names of proxies to compute (defaults to config.proxies)
+            max_workers : number of threads (defaults to one per proxy)
+        """
+        if proxies is None:
+            proxies = self.config.proxies
+        unknown = [name for name in proxies if name not in PROXY_METHODS]
+        if unknown:
+            raise ValueError(f"Unknown proxies: {unknown}. Choose from {list(PROXY_METHODS)}")
+        names = [name for name in PROXY_METHODS if name in proxies]
+        estimators = {
+            "acf": self._numax_from_acf,
+            "CoV": self._numax_from_CoV,
+            "scaling_relations": self._numax_from_scaling_relations,
+            "FliPer": self._numax_from_FliPer,
+            "EACF": self._numax_from_EACF,
+        }
+
+        start = t.time()
+        with ThreadPoolExecutor(max_workers=max_workers or max(len(names), 1)) as executor:
+            # Gaia query is submitted first, so it never waits behind the proxies
+            if "scaling_relations" in names:
+                self._start_gaia_query(executor)
+
+            futures = {name: executor.submit(estimators[name]) for name in names}
+            results = {name: futures[name].result() for name in names}
+
+        for name in names:
+            self.numax_estimates.update(results[name])
+        end = t.time()
+        print(f'Time to compute {", ".join(names)}: {np.round(end-start, 3)} seconds')
+        return self
+
+    def _numax_from_acf(self) -> dict:
+        """νmax from the 2D autocorrelation proxy"""
         acf_proxy = NumaxFromACF(
             avg_psd = self.avg_psd if self.config.do_avg_psd else self.psd, # sometimes we don't want to use averaged psd
             acf_config = self.acf_config,
             config = self.config,
             id = self.star.target,
+            background_cache = self.background_cache,
         )
         numax = acf_proxy.compute().numax_estimate
 
-        if self.acf_config.plot:
-            acf_proxy.plot()
+        # pyplot and results folders are shared between proxies running in threads
+        with _OUTPUT_LOCK:
+            if self.acf_config.plot:
+                acf_proxy.plot()
 
-        if self.acf_config.save_info:
-            acf_proxy.save_to_txt()
+            if self.acf_config.save_info:
+                acf_proxy.save_to_txt()
 
-        self.numax_estimates["numax_2DACF"] = numax
+        return {"numax_2DACF": numax}
 
-    def compute_numax_from_scaling_relations(self):
-        """
-        Compute νmax using the scaling relations.
-        """
+    def _numax_from_scaling_relations(self) -> dict:
+        """νmax from the scaling relations"""
         scaling_relations_proxy = NumaxFromScalingRelations(
             star = self.star,
             config = self.config,
-            gaia_data = self.gaia_data if self.gaia_data else None
+            gaia_data = self.gaia_data
         )
-        numaxes = scaling_relations_proxy.compute().numax_estimates
-        self.numax_estimates.update(numaxes)
+        return scaling_relations_proxy.compute().numax_estimates
 
-    def compute_numax_from_CoV(self):
-        """
-        Compute νmax using coefficients of variation (Vianni et al. 2018)
-        """
+    def _numax_from_CoV(self) -> dict:
+        """νmax from coefficients of variation"""
         CoV_proxy = NumaxFromCoefficientsOfVariation( 
             psd=self.welch_psd if self.cov_config.use_welch else self.psd, 
             config=self.config,
@@ -90,47 +191,63 @@ class NumaxProxies:
         else:
             numax = CoV_proxy.compute().numax_estimate
 
-        if self.cov_config.plot:
-            if self.cov_config.use_Bell:
-                CoV_proxy.plot_Bell()
-            else:
-                CoV_proxy.plot()
-        
-        if self.cov_config.save_info:
-            CoV_proxy.save_to_txt()
+        with _OUTPUT_LOCK:
+            if self.cov_config.plot:
+                if self.cov_config.use_Bell:
+                    CoV_proxy.plot_Bell()
+                else:
+                    CoV_proxy.plot()
+            
+            if self.cov_config.save_info:
+                CoV_proxy.save_to_txt()
 
-        self.numax_estimates["numax_CoV"] = numax
+        return {"numax_CoV": numax}
 
-    def compute_numax_from_FliPer(self, plot=True):
-        """
-        Compute numax with method from Bugnet et al. (2018).
+    def _FliPer_proxy(self) -> NumaxFromFliPer:
+        """FliPer proxy of this star (filtered spectra and noise estimate)"""
+        return NumaxFromFliPer(
+            id = self.star.target,
+            gmag = self.star.mag,
+            psd = self.psd,
+            lc = getattr(self, "lc", None),  # not set if the PSD is read from file
+            background_mode = self.config.background_mode,
+            background_cache = self.background_cache,
+        )
 
-        Input:
-            Noise estimate (usually done with magnitude, but we have to be a bit smarter)
-            Teff
+    def fliper_features(self) -> NDArray:
         """
-        gmag = self._mag
-        FliPer_proxy = NumaxFromFliPer(lc=self._lc, pg=self._pg, id=self._id, gmag=gmag)
+        FliPer feature row of this star (see proxies.FliPer.FEATURE_COLUMNS),
+        so numax of many stars can be predicted at once with proxies.FliPer.predict_batch
+        """
+        return self._FliPer_proxy().features()
+
+    def _numax_from_FliPer(self, plot=True) -> dict:
+        """νmax from FliPer"""
+        FliPer_proxy = self._FliPer_proxy()
 
         numax = FliPer_proxy.compute()
 
         if plot:
-            FliPer_proxy.plot()
+            with _OUTPUT_LOCK:
+                FliPer_proxy.plot()
 
-        self._numax_estimates["numax_FliPer"] = numax
+        return {"numax_FliPer": numax}
 
-    def compute_numax_from_EACF(self):
-        """Compute numax with method from Mosser & Appourchaux (2009) and I.W. Roxburgh (2009)"""
+    def _numax_from_EACF(self) -> dict:
+        """νmax from the EACF"""
         EACF_proxy = NumaxFromEACF(
             star = self.star,
             psd = self.psd,
             config = self.config,
             eacf_config = self.eacf_config
         )
-        EACF_proxy.compute()
+        numax = EACF_proxy.compute().numax_estimate
 
         if self.eacf_config.plot:
-            EACF_proxy.plot()
+            with _OUTPUT_LOCK:
+                EACF_proxy.plot()
+
+        return {"numax_EACF": numax}
 
     def plotting(self):
         """
@@ -139,11 +256,22 @@ class NumaxProxies:
         plot_spectrum_with_all_numax_estimates(
             psd = self.psd,
             star = self.star,
-            numax_estimates = self.numax_estimates
+            numax_estimates = self.numax_estimates,
+            backgrounds = self.background_cache.backgrounds(self.psd.psd)
         )
 
     @property
     def results(self):
+        df = pd.DataFrame(self._result_rows())
+        
+        # Save results?
+        if self.config.save_results:
+            df.to_csv(f'numax_proxies/results/{self.star.target}/{self.star.target}_results.txt', index=False)
+        
+        return df
+
+    def _result_rows(self) -> list[dict]:
+        """Collect numax estimates as rows of label, numax and numax_err"""
         rows = []
         for label, numax in self.numax_estimates.items():
             try:
@@ -157,13 +285,7 @@ class NumaxProxies:
                 "numax": numax_val,
                 "numax_err": numax_err,
             })
-        df = pd.DataFrame(rows)
-        
-        # Save results?
-        if self.config.save_results:
-            df.to_csv(f'numax_proxies/results/{self.star.target}/{self.star.target}_results.txt', index=False)
-        
-        return pd.DataFrame(rows)
+        return rows
 
     def _load_lightcurve(self):
         """Load light curve"""
@@ -186,47 +308,138 @@ class NumaxProxies:
             flux_err = flux_err
         )
 
+    def _psd_max_freq(self) -> Optional[float]:
+        """
+        Highest frequency (muHz) the proxies in config.proxies need from the PSDs, plus psd_range_margin.
+        None (full range up to Nyquist) unless limit_psd_range is set, or if any of these proxies uses the full range.
+        With a limited range, only the proxies in config.proxies should be computed.
+        """
+        if not self.config.limit_psd_range:
+            return None
+
+        limits = [0.0]
+        for name in self.config.proxies:
+            if name == "scaling_relations" or (name == "CoV" and self.cov_config.use_welch):
+                # No PSD, or the Welch PSD
+                continue
+            if name == "acf":
+                # Only the log_numax sliding window stops at max_freq
+                limit = self.acf_config.max_freq if self.acf_config.sliding_window_style == "log_numax" else None
+            elif name == "CoV":
+                limit = None if self.cov_config.use_linear_bins else self.cov_config.max_freq
+            elif name == "EACF":
+                limit = self.eacf_config.max_freq
+            else:
+                # FliPer integrates the PSD up to the Nyquist frequency
+                limit = None
+            if limit is None:
+                return None
+            limits.append(limit)
+        return max(limits) + self.config.psd_range_margin
+
     def _process_lightcurve(self):
         """
         Process lightcurve: 
             1) sort by time
             2) normalize
             3) close gaps
-            4) compute periodogram
+            4) decimate (if specified)
+            5) compute periodogram
+        Stages found in the stage cache (if specified) are loaded instead of recomputed.
         """
 
+        psd_max_freq = self._psd_max_freq()
         dp = DataProcessing(
             lc=self.unprocessed_lc, 
             config=self.config,
             cov_config=self.cov_config,
-            id=self.star.target
+            id=self.star.target,
+            max_freq=psd_max_freq
         )
-        # sort
-        if self.config.sort:
-            dp.sort_data_by_time()
-
-        # normalize to ppm
-        if self.config.normalize:
-            dp.normalize_flux()
-
-        # Sort by time and close gaps larger than "gap_size_days"
-        if self.config.close_gaps:
-            dp.close_gaps() 
-
-        # Save light curve as feather file
-        if self.config.save_lc:
-            dp.save_lc()
-
-        # Inject noise in ppm?
-        if self.config.add_noise:
-            dp.inject_noise()
+        # FliPer needs the spectrum up to the Nyquist frequency of the observed cadence
+        decimate = self.config.decimate and "FliPer" not in self.config.proxies
+        # The automatic decimation target depends on the PSD range and initial numax
+        decimation = {"psd_max_freq": psd_max_freq, "initial_numax": self.config.initial_numax} if decimate else None
+
+        # Injected noise is random, so nothing is cached in that case
+        cache = None
+        if self.config.stage_cache_dir and not self.config.add_noise:
+            cache = StageCache(self.config.stage_cache_dir)
+            lc_key = cache.stage_key(
+                StageCache.fingerprint(
+                    self.unprocessed_lc.time, self.unprocessed_lc.flux, self.unprocessed_lc.flux_err
+                ),
+                self.config,
+                LIGHTCURVE_FIELDS,
+                decimation
+            )
 
-        # Savgol
-        if self.config.savgol:
-            dp.savgol_smooth()
+        cached = cache.load("lightcurve", lc_key) if cache else None
+        if cached is not None:
+            dp.time, dp.flux, dp.flux_err = cached["time"], cached["flux"], cached["flux_err"]
+            if "observed_nyq" in cached:
+                dp.observed_nyq, dp.observed_noise = float(cached["observed_nyq"]), float(cached["observed_noise"])
+            if self.config.savgol:
+                dp.wl_days = self.config.savgol_window
+                dp.sg_filter, dp.old_flux = cached["sg_filter"], cached["old_flux"]
+            # Save light curve as feather file (before savgol smoothing, as below)
+            if self.config.save_lc:
+                final_flux = dp.flux
+                dp.flux = dp.old_flux if self.config.savgol else final_flux
+                dp.save_lc()
+                dp.flux = final_flux
+        else:
+            # sort
+            if self.config.sort:
+                dp.sort_data_by_time()
+
+            # normalize to ppm
+            if self.config.normalize:
+                dp.normalize_flux()
+
+            # Sort by time and close gaps larger than "gap_size_days"
+            if self.config.close_gaps:
+                dp.close_gaps() 
+
+            # Save light curve as feather file
+            if self.config.save_lc:
+                dp.save_lc()
+
+            # Inject noise in ppm?
+            if self.config.add_noise:
+                dp.inject_noise()
+
+            # Savgol
+            if self.config.savgol:
+                dp.savgol_smooth()
+
+            # Low-pass filter and decimate to the cadence the proxies need
+            if decimate:
+                dp.decimate()
+
+            if cache:
+                savgol_arrays = dict(sg_filter=dp.sg_filter, old_flux=dp.old_flux) if self.config.savgol else {}
+                decimated_arrays = {}
+                if dp.observed_nyq is not None:
+                    decimated_arrays = dict(observed_nyq=dp.observed_nyq, observed_noise=dp.observed_noise)
+                cache.save(
+                    "lightcurve", lc_key, 
+                    time=dp.time, flux=dp.flux, flux_err=dp.flux_err, **savgol_arrays, **decimated_arrays
+                )
 
         # Compute PSD with frequencies in microHz 
-        dp.microHz_periodogram()  
+        psd_range = {"psd_max_freq": psd_max_freq}
+        psd_key = cache.stage_key(lc_key, self.config, PSD_FIELDS, psd_range) if cache else None
+        cached = cache.load("psd", psd_key) if cache else None
+        if cached is not None:
+            dp.frequency, dp.power = cached["frequency"], cached["power"]
+            dp.nyq = float(cached["nyquist"])
+            dp.noise = float(cached["noise"]) if "noise" in cached else None
+        else:
+            dp.microHz_periodogram()  
+            if cache:
+                noise_array = dict(noise=dp.noise) if dp.noise is not None else {}
+                cache.save("psd", psd_key, frequency=dp.frequency, power=dp.power, nyquist=dp.nyq, **noise_array)
 
         # Light curve (potentially change DataProcessing to output dataclasses rather than tuples)
         time, flux, flux_err = dp.final_lc
@@ -240,25 +453,52 @@ class NumaxProxies:
         frequency, psd = dp.final_psd
         self.psd = PSDData(
             frequency = frequency,
-            psd = psd
+            psd = psd,
+            nyquist = dp.nyq,
+            noise = dp.noise
         )
 
         # Averaged PSD
         if self.config.do_avg_psd:
-            chunk_length = self.config.avg_psd_chunk
-            dp.averaged_psd(chunk_len=chunk_length)
+            avg_key = cache.stage_key(lc_key, self.config, AVG_PSD_FIELDS, psd_range) if cache else None
+            # PSD of every chunk as memory-mapped .npy (computed again if not written yet)
+            memmap_file = None
+            if self.config.avg_psd_memmap_dir is not None:
+                os.makedirs(self.config.avg_psd_memmap_dir, exist_ok=True)
+                memmap_file = os.path.join(self.config.avg_psd_memmap_dir, f"{dp.id}_chunk_psd.npy")
+            cached = cache.load("avg_psd", avg_key) if cache else None
+            if cached is not None and (memmap_file is None or os.path.isfile(memmap_file)):
+                dp.avgpsd_freq, dp.avgpsd_power = cached["frequency"], cached["power"]
+                dp.avgpsd_nyq = float(cached["nyquist"])
+            else:
+                chunk_length = self.config.avg_psd_chunk
+                dp.averaged_psd(chunk_len=chunk_length, memmap_file=memmap_file)
+                if cache:
+                    cache.save(
+                        "avg_psd", avg_key, frequency=dp.avgpsd_freq, power=dp.avgpsd_power, nyquist=dp.avgpsd_nyq
+                    )
             avg_psd_freq, avg_psd_power = dp.avg_psd
             self.avg_psd = AvgPSDData(
                 frequency = avg_psd_freq,
-                psd = avg_psd_power
+                psd = avg_psd_power,
+                nyquist = dp.avgpsd_nyq
             )
         
         # Welch PSD
         if self.cov_config.use_welch:
-            welch_freq, welch_psd = dp.calculate_welch_spectrum().welch_psd
+            welch_key = cache.stage_key(lc_key, self.cov_config, WELCH_FIELDS) if cache else None
+            cached = cache.load("welch", welch_key) if cache else None
+            if cached is not None:
+                dp.welch_f, dp.welch_p = cached["frequency"], cached["power"]
+            else:
+                dp.calculate_welch_spectrum()
+                if cache:
+                    cache.save("welch", welch_key, frequency=dp.welch_f, power=dp.welch_p)
+            welch_freq, welch_psd = dp.welch_psd
             self.welch_psd = AvgPSDData(
                 frequency = welch_freq,
-                psd = welch_psd
+                psd = welch_psd,
+                nyquist = dp.observed_nyq
             )            
 
         # Plot lc and pg
@@ -271,16 +511,37 @@ class NumaxProxies:
         if self.config.save_avgpsd:
             dp.save_avg_periodogram()
 
-    def _query_gaia(self):
-        """Query gaia if specified"""
+    @property
+    def gaia_data(self) -> GaiaData:
+        """Gaia data: waits for the background query if it is still running, queries now if never started"""
+        if self._gaia_query is not None:
+            self._gaia_data = self._gaia_query.result()
+            self._gaia_query = None
+        elif self._gaia_data is None:
+            self._gaia_data = self._query_gaia()
+        return self._gaia_data
+
+    @gaia_data.setter
+    def gaia_data(self, gaia_data : GaiaData):
+        """Use Gaia data queried elsewhere (e.g. in bulk for a catalog), no query is started"""
+        self._gaia_data = gaia_data
+
+    def _start_gaia_query(self, executor=None):
+        """Start Gaia query in the background (if not already started or done)"""
+        if self._gaia_query is None and self._gaia_data is None:
+            self._gaia_query = (executor or _GAIA_EXECUTOR).submit(self._query_gaia)
+
+    def _query_gaia(self) -> GaiaData:
+        """Query gaia if specified (through the Gaia cache if specified)"""
+        cache = gaia_cache_from_config(self.config)
+        if self.config.gaia_offline and cache is None:
+            # Offline and nothing cached
+            return GaiaData()
         if self.config.query_gaia:
-            gaia_dictionary = query_gaia(id=self.star.target)
-            if gaia_dictionary:
-                self.gaia_data = GaiaData(**gaia_dictionary)
-            else:
-                self.gaia_data = GaiaData()
-        else:
-            self.gaia_data = GaiaData()
+            gaia_data = query_gaia(id=self.star.target, cache=cache)
+            if gaia_data:
+                return gaia_data
+        return GaiaData()
             
     def _load_psd(self, filename : str):
         """Load PSD file from filename if specified in YAML input file"""
@@ -301,56 +562,42 @@ class NumaxProxies:
     @classmethod
     def read_yaml(cls, yaml_path: str):
         """Grab config parameters from yaml file"""
-        with open(yaml_path, 'r') as f:
-            yaml_file = yaml.safe_load(f)
-        # Store information in GlobalConfig structure
-        settings = GlobalConfig(
-            star=StarInfo(**yaml_file["STAR"]),
-            lightcurve=LightCurveInput(**yaml_file["LIGHTCURVE"]),
-            psd=PSDInput(**yaml_file['PSD']),
-            config=ProcessingConfig(**yaml_file["CONFIG"]),
-            acf_config=ACFConfig(**yaml_file["ACF_CONFIG"]),
-            cov_config=COVConfig(**yaml_file["COV_CONFIG"])
-        )
-        return cls(global_config=settings)
+        return cls(global_config=read_global_config(yaml_path))
     
     def run(self) -> "NumaxProxies":
         """Run pipeline"""
-        # Query Gaia DR3/2 for data
-        self._query_gaia()
+        # Query Gaia DR3/2 for data in the background, 
+        # SIMBAD/Gaia round-trips overlap with processing the light curve
+        if self.config.query_gaia:
+            self._start_gaia_query()
 
         if self.psd_input.psd_file:
             self.psd = PSDData(
-                self._load_psd(self.psd_input.psd_file)
+                *self._load_psd(self.psd_input.psd_file)
             )
 
         if self.psd_input.avg_psd_file:
             self.avg_psd = AvgPSDData(
-                self._load_psd(self.psd_input.avg_psd_file)
+                *self._load_psd(self.psd_input.avg_psd_file)
             )
         else:
             self._load_lightcurve()
             self._process_lightcurve() 
         
         return self
-        
-        
-
-
-        
-
-
-
-
-
-
-
-
-    
-
-    
-
-
-
 
 
+def read_global_config(yaml_path: str) -> GlobalConfig:
+    """Read yaml file and store information in GlobalConfig structure"""
+    with open(yaml_path, 'r') as f:
+        yaml_file = yaml.safe_load(f)
+    settings = GlobalConfig(
+        star=StarInfo(**yaml_file["STAR"]),
+        lightcurve=LightCurveInput(**yaml_file["LIGHTCURVE"]),
+        psd=PSDInput(**yaml_file['PSD']),
+        config=ProcessingConfig(**yaml_file["CONFIG"]),
+        acf_config=ACFConfig(**yaml_file["ACF_CONFIG"]),
+        cov_config=COVConfig(**yaml_file["COV_CONFIG"]),
+        eacf_config=EACFConfig(**yaml_file.get("EACF_CONFIG", {}))
+    )
+    return settings
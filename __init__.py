@@ -1,2 +1,3 @@
 from .NumaxProxies import NumaxProxies
-__all__ = ['NumaxProxies']
\ No newline at end of file
+from .NumaxCatalog import NumaxCatalog
+__all__ = ['NumaxProxies', 'NumaxCatalog']
@@ -7,6 +7,8 @@ from .add_noise import calculate_noise
 from .get_lightcurve import GetLightcurve
 from .data_processing import DataProcessing
 from .prepare_data import read_json_file
+from .stage_cache import StageCache
+from .periodogram import CadenceGrid, lombscargle_psd, summed_psd
 from .dataclasses import LightCurveData, LightCurveInput, PSDData, AvgPSDData, ProcessingConfig, StarInfo
 
 __all__ = [
@@ -15,6 +17,9 @@ __all__ = [
     "GetLightcurve",
     "DataProcessing",
     "read_json_file",
+    "StageCache",
+    "CadenceGrid",
+    "lombscargle_psd",
     "LightCurveData",
     "LightCurveInput",
     "PSDData",
@@ -1,12 +1,14 @@
 import numpy as np
 from astropy.timeseries import LombScargle
-from scipy.integrate import simpson
 import matplotlib.pyplot as plt
 import pandas as pd
 import time as t
 import os
 from scipy.signal import savgol_filter, welch
 from .dataclasses import LightCurveData, ProcessingConfig, COVConfig
+from .window_function import effective_resolution, window_function
+from .periodogram import lombscargle_psd, summed_psd, white_noise_level
+from .decimation import NUMAX_FACTOR, decimation_factor, decimate_light_curve, coarse_max_freq
 from typing import Optional, Literal
 
 class DataProcessing:
@@ -15,7 +17,9 @@ class DataProcessing:
         lc : LightCurveData,
         config : ProcessingConfig,
         cov_config : COVConfig,
-        id : Optional[str] = 'unknown'
+        id : Optional[str] = 'unknown',
+        workers : Optional[int] = None,
+        max_freq : Optional[float] = None
     ):
         # Load LC
         self.id = id or "unknown"
@@ -26,6 +30,13 @@ class DataProcessing:
         # Load config settings
         self.cfg = config
         self.cov_config = cov_config
+        # Threads for the periodograms (-1 = all cores), defaults to config.periodogram_workers
+        self.workers = config.periodogram_workers if workers is None else workers
+        # Highest frequency (muHz) needed from the PSDs, None for the full range (see frequency_grid)
+        self.max_freq = max_freq
+        # Nyquist frequency (muHz) and white-noise PSD level of the light curve before decimation, None if not decimated
+        self.observed_nyq = None
+        self.observed_noise = None
 
     # ----------------------------
     # Light curve
@@ -79,6 +90,39 @@ class DataProcessing:
         self.flux -= self.sg_filter
         return self
     
+    def decimate(self):
+        """
+        Low-pass filter and decimate the light curve (per gap-free segment) to the lowest cadence keeping
+        the frequencies up to decimate_max_freq, or else up to the PSD range (max_freq), a multiple of
+        initial_numax, or the signal in a coarse spectrum (see decimation.py)
+        """
+        max_freq = self.cfg.decimate_max_freq or self.max_freq
+        if max_freq is None and self.cfg.initial_numax:
+            max_freq = NUMAX_FACTOR * self.cfg.initial_numax
+        if max_freq is None:
+            max_freq = coarse_max_freq(self.time, self.flux)
+
+        factor = decimation_factor(self.nyquist(self.time) * 1e6 / 86400, max_freq)
+        if factor == 1:
+            return self
+
+        n_points, size = len(self.time), self.time.nbytes + self.flux.nbytes + self.flux_err.nbytes
+        self.observed_nyq = self.nyquist(self.time) * 1e6 / 86400
+        # The decimated light curve keeps the signal near its Nyquist frequency, the noise is measured before
+        self.observed_noise = white_noise_level(self.flux, self.flux_err)
+        self.time, self.flux, self.flux_err, keep = decimate_light_curve(
+            self.time, self.flux, self.flux_err, factor, grid_tolerance=self.cfg.grid_tolerance
+        )
+        if self.cfg.savgol:
+            self.sg_filter = self.sg_filter[keep]
+            self.old_flux = self.old_flux[keep]
+        decimated_size = self.time.nbytes + self.flux.nbytes + self.flux_err.nbytes
+        print(
+            f'Light curve decimated by {factor} (frequencies up to {np.round(max_freq, 1)} muHz): '
+            f'{n_points} -> {len(self.time)} points, {np.round(size / 2**20, 2)} -> {np.round(decimated_size / 2**20, 2)} MB'
+        )
+        return self
+
     def inject_noise(self):
         """Inject artifical noise (ppm units) in light curve"""
         noise = np.random.normal(0, self.cfg.noise_std, len(self.flux))
@@ -101,26 +145,29 @@ class DataProcessing:
 
     def microHz_periodogram(self):
         """Compute frequencies in muHz and power in spectral density"""
-        # Generate LombScargle object
-        self.compute_lombscargle()
+        start = t.time()
         # Calculate nyquist frequency
         nyq = self.nyquist(time=self.time)
         # Calculate frequency spacing (accounting for spectral window)
         df = self.freq_spacing(time=self.time, nyq=nyq)
         # Define frequency range including oversampling
-        self.frequency = np.arange(df/self.cfg.oversampling, nyq, df/self.cfg.oversampling)
-        # Calculate power
-        self.power = self.ls.power(
-            self.frequency, normalization="psd", method="fast", assume_regular_frequency=True
-        )
+        self.frequency = self.frequency_grid(df/self.cfg.oversampling, nyq, to_muHz=1e6 / 86400)
+        # Calculate power (FFT engine on a regular cadence grid, else Lomb-Scargle)
+        self.power = self.lombscargle_psd(self.time, self.flux, self.flux_err, self.frequency)
         self.frequency *= 1e6 / 86400
-        self.nyq = np.max(self.frequency)
+        self.nyq = self.grid_nyquist(df/self.cfg.oversampling, nyq, to_muHz=1e6 / 86400)
+        # A range-limited PSD has no pure-noise bins below Nyquist
+        self.noise = None
+        if self.max_freq is not None:
+            self.noise = self.observed_noise or white_noise_level(self.flux, self.flux_err)
+        end = t.time()
+        print(f'Time to produce PSD: {np.round(end-start, 3)} seconds ({len(self.time)} points, {len(self.frequency)} frequencies)')
         return self
 
     # ----------------------------
     # Averaged PSD (Sylvain Breton)
     # ----------------------------
-    def averaged_psd(self, chunk_len=90):
+    def averaged_psd(self, chunk_len=90, memmap_file=None):
         """
         Author: Sylvain Breton
         email: sylvain.breton@inaf.it
@@ -143,6 +190,11 @@ class DataProcessing:
         Length of the chunks in days.
         Optional, default 90
 
+        param memmap_file: str
+        .npy file the PSD of every chunk is written to
+        (memory-mapped, shape (n_chunk, n_freq)).
+        Optional, default None
+
         Returns
         -------
         tuple of arrays
@@ -169,18 +221,30 @@ class DataProcessing:
         flux_err = flux_err[: size_chunk * n_chunk].reshape((n_chunk, size_chunk))
 
         # Common frequency grid in Hz
-        freq_grid = np.arange(df / self.cfg.oversampling, 1/(2*dt_sec), df / self.cfg.oversampling)
+        freq_grid = self.frequency_grid(df / self.cfg.oversampling, 1/(2*dt_sec), to_muHz=1e6)
+        self.avgpsd_nyq = self.grid_nyquist(df / self.cfg.oversampling, 1/(2*dt_sec), to_muHz=1e6)
         # print(self.cfg.oversampling * df, 1/(2*dt_sec))
         # freq, psd = self.calculate_psd_for_avg_psd(
         #     time[0], flux[0], flux_err[0], freq_grid=None
         # )
 
-        # PSD for each segment on common frequency grid
-        psd = [
-            self.calculate_psd_for_avg_psd(t_chunk, f_chunk, ferr_chunk, freq_grid=freq_grid)
-            for t_chunk, f_chunk, ferr_chunk in zip(time, flux, flux_err)
-        ]
-        psd = sum(psd)
+        # Per-chunk spectra for time-resolved analysis
+        chunk_psds = None
+        if memmap_file is not None:
+            chunk_psds = np.lib.format.open_memmap(
+                memmap_file, mode="w+", dtype=np.float64, shape=(n_chunk, len(freq_grid))
+            )
+
+        # PSD for each segment on common frequency grid (in parallel), summed as they come in
+        psd = summed_psd(
+            time, flux, flux_err, freq_grid,
+            engine=self.cfg.periodogram_engine,
+            grid_tolerance=self.cfg.grid_tolerance,
+            workers=self.workers,
+            out=chunk_psds,
+        )
+        if chunk_psds is not None:
+            chunk_psds.flush()
 
         psd /= n_chunk
 
@@ -190,20 +254,14 @@ class DataProcessing:
 
     def calculate_psd_for_avg_psd(self, time, flux, flux_err, freq_grid=None):
         """Calculate freq and power to later sum up for averaged psd"""
-        ls = LombScargle(t=time, y=flux, dy=flux_err, fit_mean=False, center_data=True)
-
         if freq_grid is None:
+            ls = LombScargle(t=time, y=flux, dy=flux_err, fit_mean=False, center_data=True)
             nyq = self.nyquist(time)
             freq_Hz, power = ls.autopower(
                 normalization="psd", method="fast", maximum_frequency=nyq
             )
         else:
-            power = ls.power(
-                freq_grid,
-                normalization="psd",
-                method="fast",
-                assume_regular_frequency=True,
-            )
+            power = self.lombscargle_psd(time, flux, flux_err, freq_grid)
 
         if freq_grid is None:
             return freq_Hz, power
@@ -238,32 +296,59 @@ class DataProcessing:
     # ----------------------------   
     def nyquist(self, time):
         return 1 / (2 * np.mean(np.diff(time)))    
+
+    def frequency_grid(self, step, nyq, to_muHz):
+        """
+        Frequencies from step to nyq in steps of step, only up to max_freq if set
+        (the cadence is passed to the proxies separately, see grid_nyquist).
+        to_muHz converts the frequencies to muHz.
+        """
+        frequency = np.arange(step, nyq, step)
+        if self.max_freq is None:
+            return frequency
+        return frequency[:np.searchsorted(frequency * to_muHz, self.max_freq, side="right")]
+
+    def grid_nyquist(self, step, nyq, to_muHz):
+        """
+        Nyquist frequency in muHz passed to the proxies (their cadence-dependent defaults): the highest frequency
+        of the full grid of frequency_grid, or the Nyquist frequency of the light curve before decimation
+        """
+        if self.observed_nyq is not None:
+            return self.observed_nyq
+        return step * (np.ceil(nyq / step) - 1) * to_muHz
+
+    def lombscargle_psd(self, time, flux, flux_err, frequency):
+        """PSD on a regular frequency grid (or ranges of it), with the periodogram engine of the config"""
+        return lombscargle_psd(
+            time, flux, flux_err, frequency,
+            engine=self.cfg.periodogram_engine,
+            grid_tolerance=self.cfg.grid_tolerance,
+            workers=self.workers,
+        )
     
     def freq_spacing(self, time, nyq):
-        """Calculate frequency spacing accounting for spectral window"""
-        df = 1 / (np.nanmax(time) - np.nanmin(time))
-        f, w = self.windowfunction(df=df, nyq=nyq)#, width=None, oversampling=self.cfg.oversampling)
-        df = simpson(w, x=f)
-        return df
+        """Calculate frequency spacing accounting for spectral window (cached per time sampling)"""
+        return effective_resolution(
+            time=time,
+            nyq=nyq,
+            oversampling=self.cfg.oversampling,
+            width_factor=self.cfg.width_for_wf or 100,
+            engine=self.cfg.periodogram_engine,
+            grid_tolerance=self.cfg.grid_tolerance,
+            workers=self.workers,
+        )
     
     def windowfunction(self, df, nyq):
-        """Calculate spectral window function"""
-        if self.cfg.width_for_wf is None:
-            width = 100 * df
-        time = self.time.copy()
-        freq_cen = 0.5 * nyq
-        Nfreq = int(self.cfg.oversampling * width / df)
-        freq = freq_cen + (df / self.cfg.oversampling) * np.arange(-Nfreq, Nfreq, 1)
-        x = 0.5 * np.sin(2 * np.pi * freq_cen * time) + 0.5 * np.cos(
-            2 * np.pi * freq_cen * time
-        )
-        ls = LombScargle(time, x, center_data=True, fit_mean=False)
-        power = ls.power(
-            freq, method="fast", normalization="psd", assume_regular_frequency=True
+        """Calculate spectral window function (width_for_wf in units of df, default 100)"""
+        return window_function(
+            time=self.time,
+            nyq=nyq,
+            oversampling=self.cfg.oversampling,
+            width_factor=self.cfg.width_for_wf or 100,
+            engine=self.cfg.periodogram_engine,
+            grid_tolerance=self.cfg.grid_tolerance,
+            workers=self.workers,
         )
-        power /= power[int(len(power) / 2)]  # Normalize to have maximum of one
-        freq -= freq_cen
-        return freq, power
 
     def attenuation(self):
         eta = np.sinc(0.5 * self.frequency / self.nyq)
@@ -280,15 +365,12 @@ class DataProcessing:
 
     def super_Nyquist_spectrum(self):
         """Compute super Nyquist spectrum in muHz and PSD"""
-        self.compute_lombscargle()
         self.supNyq_lim = self.sup_nyquist(self.time)
-        self.df = self.freq_spacing(self.time)
-        freq_Hz = np.arange(self.df, self.supNyq_lim, self.df)
+        self.df = self.freq_spacing(self.time, nyq=self.nyquist(self.time))
+        freq = np.arange(self.df, self.supNyq_lim, self.df)
 
-        self.supNyq_freq = freq_Hz * 1e6
-        self.supNyq_power = self.power(
-            freq_Hz, normalization="psd", method="fast", assume_regular_frequency=True
-        )
+        self.supNyq_power = self.lombscargle_psd(self.time, self.flux, self.flux_err, freq)
+        self.supNyq_freq = freq * 1e6 / 86400
         return self
 
     # ----------------------------
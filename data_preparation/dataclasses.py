@@ -47,6 +47,7 @@ class ProcessingConfig:
     add_noise           :   bool = False
     sort                :   bool = False
     close_gaps          :   bool = False
+    decimate            :   bool = False
     plot_lc             :   bool = False
     plot_all_estimates  :   bool = False
     save_lc             :   bool = False
@@ -59,8 +60,21 @@ class ProcessingConfig:
     noise_std       :   float = 0.0
     savgol_window   :   float = 90.0
     avg_psd_chunk   :   float = 90.0
+    avg_psd_memmap_dir  :   Optional[str] = None
     initial_numax   :   Optional[float] = None
     gap_size_days   :   float = 3.0
+    stage_cache_dir :   Optional[str] = None
+    gaia_cache_file     :   Optional[str] = None
+    gaia_cache_ttl_days :   Optional[float] = None
+    gaia_offline        :   bool = False
+    background_mode :   Literal["exact", "approx"] = "exact"
+    periodogram_engine  :   Literal["auto", "lombscargle"] = "auto"
+    grid_tolerance      :   float = 0.01
+    periodogram_workers :   int = 1
+    limit_psd_range     :   bool = False
+    psd_range_margin    :   float = 100.0
+    decimate_max_freq   :   Optional[float] = None
+    proxies         :   list[str] = field(default_factory=lambda: ["acf", "CoV"])
 
 @dataclass
 class ACFConfig:
@@ -75,6 +89,8 @@ class ACFConfig:
     max_acf_fit_iterations  :   int = 1
     n_sigma_numax_acf       :   float = 2 
     save_info               :   Optional[str] = False
+    max_memory_mb           :   float = 1024
+    acf_memmap_dir          :   Optional[str] = None
 
 @dataclass
 class COVConfig:
@@ -82,6 +98,7 @@ class COVConfig:
     plot                        :   Optional[str] = False
     overlap_factor              :   Optional[float] = None
     min_freq                    :   Optional[float] = None
+    max_freq                    :   Optional[float] = None
     smoothing_width_factor      :   Optional[float] = None
     use_welch                   :   Optional[str] = False
     welch_seg_size              :   Optional[float] = None
@@ -92,7 +109,15 @@ class COVConfig:
 @dataclass
 class EACFConfig:
     """EACF configuration"""
-    plot    :   Optional[bool] = False
+    plot            :   Optional[bool] = False
+    window_style    :   Literal["fixed", "variable"] = "fixed"
+    min_freq        :   float = 1.0
+    max_freq        :   Optional[float] = None
+    window_width    :   float = 20.0
+    step            :   float = 1.0
+    width_factor    :   float = 6.0
+    overlap_factor  :   float = 4.0
+    max_memory_mb   :   float = 256
 
 @dataclass
 class GlobalConfig:
@@ -124,12 +149,15 @@ class PSDData:
     """Data class containing PSD data"""
     frequency   :   NDArray[np.float64]
     psd         :   NDArray[np.float64]
+    nyquist     :   Optional[float] = None  # Nyquist frequency (muHz) of the observations, None: highest frequency
+    noise       :   Optional[float] = None  # white noise level, None: from the highest frequencies (estimate_noise)
 
 @dataclass
 class AvgPSDData:
     """Data class containing averaged PSD"""
     frequency   :   NDArray[np.float64]
     psd         :   NDArray[np.float64]
+    nyquist     :   Optional[float] = None  # Nyquist frequency (muHz) of the observations, None: highest frequency
 
 @dataclass
 class GaiaData:
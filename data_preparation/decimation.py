@@ -0,0 +1,109 @@
+"""
+Anti-aliased decimation of (short-cadence) light curves.
+
+Short-cadence light curves of evolved stars hold many more samples than their low-frequency
+oscillations need. Every gap-free segment is low-pass filtered with a linear-phase FIR filter and
+decimated by an integer factor, so the PSD up to the passband of the new Nyquist frequency is
+unchanged (flux_err is propagated through the filter, which keeps the "psd" normalization).
+"""
+
+import numpy as np
+from scipy.signal import firwin, resample_poly, welch
+from numpy.typing import NDArray
+from typing import Optional
+from .periodogram import CadenceGrid, GRID_TOLERANCE
+
+# Fraction of the new Nyquist frequency in which the filter is flat (to 1e-4)
+PASSBAND = 0.8
+# Half length of the FIR filter in units of the decimation factor, and its Kaiser window
+FILTER_HALF_LENGTH = 20
+KAISER_BETA = 8.0
+
+# Without a target frequency: the highest frequency kept is NUMAX_FACTOR times the initial numax,
+# or COARSE_FACTOR times the highest frequency where a coarse spectrum is COARSE_SNR above the white noise
+NUMAX_FACTOR = 3.0
+COARSE_FACTOR = 2.0
+COARSE_SNR = 4.0
+COARSE_SEGMENT_DAYS = 2.0
+
+
+def decimation_factor(nyq : float, max_freq : float) -> int:
+    """Largest decimation factor keeping max_freq in the passband of the new Nyquist frequency (1: no decimation)"""
+    if max_freq is None or not np.isfinite(max_freq) or max_freq <= 0:
+        return 1
+    return max(int(PASSBAND * nyq / max_freq), 1)
+
+
+def lowpass_filter(factor : int) -> NDArray:
+    """Linear-phase FIR low-pass filter (unit gain) with cutoff at the Nyquist frequency after decimation by factor"""
+    return firwin(2 * FILTER_HALF_LENGTH * factor + 1, 1 / factor, window=("kaiser", KAISER_BETA))
+
+
+def decimate_light_curve(
+        time : NDArray,
+        flux : NDArray,
+        flux_err : NDArray,
+        factor : int,
+        grid_tolerance : float = GRID_TOLERANCE
+):
+    """
+    Low-pass filter and decimate every gap-free segment of a light curve by factor.
+    On a regular cadence grid, the kept samples are every factor-th point of the grid,
+    so the decimated light curve is on a regular grid too (see periodogram.CadenceGrid).
+
+    Input:
+        time            :: sorted time stamps
+        flux            :: flux
+        flux_err        :: flux uncertainties
+        factor          :: decimation factor
+        grid_tolerance  :: largest offset from the cadence grid (in cadences) to align to it
+
+    Output:
+        time, flux, flux_err    :: decimated light curve
+        keep                    :: indices of the kept time stamps in the input
+    """
+    grid = CadenceGrid.from_time(time)
+    on_grid = grid.regular(grid_tolerance)
+    cadence = np.median(np.diff(time))
+
+    # Segments without missing cadences
+    bounds = np.concatenate(([0], np.flatnonzero(np.diff(time) > 1.5 * cadence) + 1, [len(time)]))
+
+    h = lowpass_filter(factor)
+    times, fluxes, errors, keep = [], [], [], []
+    for first, stop in zip(bounds[:-1], bounds[1:]):
+        if on_grid:
+            # Start on a grid point that is a multiple of factor
+            first += (-grid.index[first]) % factor
+        if first >= stop:
+            continue
+        segment = slice(first, stop)
+        # Padded with the mean flux (and zero variance), so near the segment edges the flux and
+        # its uncertainty are filtered with the same (truncated) filter
+        fluxes.append(resample_poly(flux[segment], 1, factor, window=h, padtype="mean"))
+        # Variance of a filtered sample: sum of h^2 * flux_err^2
+        errors.append(np.sqrt(resample_poly(flux_err[segment] ** 2, 1, factor, window=h**2, padtype="constant")))
+        times.append(time[segment][::factor])
+        keep.append(np.arange(first, stop)[::factor])
+
+    return np.concatenate(times), np.concatenate(fluxes), np.concatenate(errors), np.concatenate(keep)
+
+
+def coarse_max_freq(time : NDArray, flux : NDArray) -> Optional[float]:
+    """
+    Highest frequency (muHz) worth keeping from a coarse Welch spectrum: COARSE_FACTOR times the highest
+    frequency with power COARSE_SNR above the white noise (taken from the top fifth of the spectrum).
+    None if the light curve is too short.
+    """
+    cadence = np.median(np.diff(time))
+    nperseg = int(COARSE_SEGMENT_DAYS / cadence)
+    if nperseg < 16 or len(flux) < 2 * nperseg:
+        return None
+
+    frequency, power = welch(flux - np.mean(flux), fs=1 / cadence, nperseg=nperseg)
+    frequency = frequency * 1e6 / 86400
+    noise = np.median(power[int(0.8 * len(power)):])
+    signal = np.flatnonzero(power[1:] > COARSE_SNR * noise) + 1
+    if len(signal) == 0:
+        return None
+    return COARSE_FACTOR * frequency[signal[-1]]
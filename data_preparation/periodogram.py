@@ -0,0 +1,542 @@
+"""
+Lomb-Scargle PSD engine for light curves on a regular cadence grid.
+
+Kepler and TESS light curves are sampled on a (nearly) regular cadence grid with gaps.
+On such a grid the sums of the Lomb-Scargle periodogram are discrete Fourier sums of the
+zero-filled (weighted) flux, evaluated with chirp-z transforms (a few FFTs, on workers threads)
+on exactly the regular frequency grid requested, with the same "psd" normalization as astropy
+(fit_mean=False, center_data=True). A light curve can be split into segments with their own grid,
+whose sums are added. The time stamps must be on the grid to a small fraction of the period of the
+highest frequency (the phase error sets the error of the PSD), else astropy's fast method is used.
+Barycentric time stamps (e.g. Kepler and TESS) drift off a regular grid by minutes over the orbit,
+which would take many short segments (slower than astropy), so these fall back to astropy.
+"""
+
+import os
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from astropy.timeseries import LombScargle
+from scipy import fft as sp_fft
+from numpy.typing import NDArray
+from typing import Literal, Optional
+
+try:
+    # Low-rank approximation NUFFT of astropy's fast method (algorithm "lra")
+    from astropy.timeseries.periodograms.lombscargle.implementations.utils import (
+        bessel_coefficients,
+        chebyshev_polynomials,
+        get_lra_params,
+        next_fast_len as lra_fast_len,
+    )
+except ImportError:
+    get_lra_params = None
+
+# Largest offset of a time stamp from the cadence grid (in cadences) for the grid engine
+GRID_TOLERANCE = 0.01
+# Largest phase error 2 pi f_max dt (radians) of a time stamp's offset dt from the grid at the highest
+# frequency f_max for the grid engine (the relative error of the PSD is of the same order)
+PHASE_TOLERANCE = 1e-3
+# Largest number of grid segments for the grid engine (every segment costs two chirp-z transforms
+# over the whole frequency grid, with more segments astropy's fast method is cheaper)
+MAX_GRID_SEGMENTS = 8
+# Precision of astropy's LRA NUFFT (default of trig_sum), and the fewest samples per thread
+# for which the samples of one light curve are spread in parallel
+LRA_EPS = 5e-13
+MIN_THREAD_SAMPLES = 10_000
+
+
+@dataclass
+class CadenceGrid:
+    """Time stamps on a regular cadence grid: time ~ start + cadence * index"""
+    start       :   float
+    cadence     :   float
+    index       :   NDArray     # grid index of every time stamp (first is 0)
+    mask        :   NDArray     # True where the grid holds a time stamp, False in gaps
+    max_offset  :   float       # largest distance of a time stamp from the grid, in cadences
+
+    @classmethod
+    def from_time(cls, time : NDArray) -> "CadenceGrid":
+        """Cadence grid of sorted time stamps (max_offset is inf if they do not fit on any grid)"""
+        time = np.asarray(time, dtype=np.float64)
+        if len(time) < 2:
+            return cls(0.0, 1.0, np.zeros(len(time), dtype=np.int64), np.ones(len(time), dtype=bool), np.inf)
+
+        diff = np.diff(time)
+        cadence = np.median(diff)
+        steps = np.rint(diff / cadence).astype(np.int64)
+        index = np.concatenate(([0], np.cumsum(steps)))
+        mask = np.zeros(index[-1] + 1, dtype=bool)
+        mask[index] = True
+        if np.any(steps < 1):
+            # duplicate or unsorted time stamps
+            return cls(time[0], cadence, index, mask, np.inf)
+
+        # Least-squares grid through all time stamps
+        cadence, start = np.polyfit(index, time, 1)
+        max_offset = np.max(np.abs(time - start - cadence * index)) / cadence
+        return cls(start, cadence, index, mask, max_offset)
+
+    def regular(self, tolerance : float = GRID_TOLERANCE) -> bool:
+        """True if all time stamps are within tolerance cadences of the grid"""
+        return bool(self.max_offset <= tolerance)
+
+    def fill(self, values : NDArray) -> NDArray:
+        """Values (along the last axis) on the grid, zero in the gaps"""
+        return fill_grid(self.index, values)
+
+
+def fill_grid(index : NDArray, values : NDArray) -> NDArray:
+    """Values placed at their grid index along the last axis, zero elsewhere"""
+    values = np.asarray(values)
+    index = np.broadcast_to(index, values.shape)
+    filled = np.zeros(values.shape[:-1] + (int(np.max(index)) + 1,), dtype=values.dtype)
+    np.put_along_axis(filled, index, values, axis=-1)
+    return filled
+
+
+def grid_segments(time : NDArray, tolerance : float = GRID_TOLERANCE) -> Optional[list]:
+    """
+    Split sorted time stamps into consecutive segments, each on its own regular cadence grid
+    (within tolerance cadences): the whole light curve if it fits on one grid, else split at the
+    largest gap (or in the middle) until every part fits, after which neighbouring parts that fit
+    on a common grid are merged again.
+
+    Output:
+        segments    :: list of (first, stop, CadenceGrid) of the time stamps time[first:stop],
+                        None if more than MAX_GRID_SEGMENTS are needed (or time is not strictly increasing)
+    """
+    time = np.asarray(time, dtype=np.float64)
+    if len(time) < 2 or np.any(np.diff(time) <= 0):
+        return None
+    cadence = np.median(np.diff(time))
+
+    def fit(first, stop):
+        if stop - first == 1:
+            # A single time stamp is on the grid of the light curve's cadence
+            return CadenceGrid(time[first], cadence, np.zeros(1, dtype=np.int64), np.ones(1, dtype=bool), 0.0)
+        return CadenceGrid.from_time(time[first:stop])
+
+    # Split (depth first, in time order) until every part fits on a grid
+    parts = []
+    todo = [(0, len(time))]
+    while todo:
+        first, stop = todo.pop()
+        grid = fit(first, stop)
+        if grid.regular(tolerance):
+            parts.append((first, stop, grid))
+            continue
+        if len(parts) + len(todo) >= 2 * MAX_GRID_SEGMENTS:
+            return None
+        diff = np.diff(time[first:stop])
+        gap = int(np.argmax(diff))
+        middle = first + gap + 1 if diff[gap] > 1.5 * cadence else (first + stop) // 2
+        todo += [(middle, stop), (first, middle)]
+
+    segments = [parts[0]]
+    for first, stop, grid in parts[1:]:
+        merged = fit(segments[-1][0], stop)
+        if merged.regular(tolerance):
+            segments[-1] = (segments[-1][0], stop, merged)
+        else:
+            segments.append((first, stop, grid))
+    return segments if len(segments) <= MAX_GRID_SEGMENTS else None
+
+
+def chirp_z(x : NDArray, f0 : float, df : float, n_freq : int, cadence : float, workers : int = -1) -> NDArray:
+    """
+    Fourier sums sum_n x_n exp(-2 pi i f_k n cadence) along the last axis at the regular
+    frequencies f_k = f0 + k df (k < n_freq), with Bluestein's chirp-z algorithm
+    (workers threads for scipy.fft, -1 = all cores).
+    """
+    n = x.shape[-1]
+    length = sp_fft.next_fast_len(n + n_freq - 1)
+    a, b = f0 * cadence, df * cadence
+
+    # Phases in units of pi, reduced modulo 2 before the exponential to keep them accurate
+    i = np.arange(n, dtype=np.float64)
+    k = np.arange(n_freq, dtype=np.float64)
+    u = x * np.exp(-1j * np.pi * np.mod(2 * a * i + b * i * i, 2.0))
+
+    chirp = np.zeros(length, dtype=complex)
+    chirp[:n_freq] = np.exp(1j * np.pi * np.mod(b * k * k, 2.0))
+    chirp[length - n + 1 :] = np.exp(1j * np.pi * np.mod(b * i[:0:-1] ** 2, 2.0))
+
+    conv = sp_fft.ifft(
+        sp_fft.fft(u, length, axis=-1, workers=workers) * sp_fft.fft(chirp, workers=workers),
+        axis=-1, workers=workers
+    )[..., :n_freq]
+    return conv * np.exp(-1j * np.pi * np.mod(b * k * k, 2.0))
+
+
+def grid_lombscargle(
+        index : NDArray,
+        cadence : float,
+        y : NDArray,
+        dy : NDArray,
+        frequency : NDArray,
+        workers : int = -1
+) -> NDArray:
+    """
+    Lomb-Scargle PSD (astropy normalization="psd", fit_mean=False, center_data=True) of samples
+    at grid positions index * cadence, computed with chirp-z transforms (Zechmeister & Kurster 2009,
+    as astropy's fast method but with exact sums).
+
+    Input:
+        index       :: grid index of every sample, shape (..., n_samples)
+        cadence     :: grid spacing (in units of 1 / frequency)
+        y           :: samples, shape (..., n_samples), one periodogram per row
+        dy          :: uncertainties of the samples (None for uniform weights)
+        frequency   :: regularly spaced frequencies
+        workers     :: threads for scipy.fft (-1 = all cores)
+
+    Output:
+        power       :: PSD at frequency, shape (..., n_freq)
+    """
+    y = np.asarray(y, dtype=np.float64)
+    dy = np.ones_like(y) if dy is None else np.broadcast_to(np.asarray(dy, dtype=np.float64), y.shape)
+    frequency = np.asarray(frequency, dtype=np.float64)
+    f0 = frequency[0]
+    df = frequency[1] - frequency[0] if len(frequency) > 1 else 0.0
+
+    w = dy**-2.0
+    w_sum = w.sum(axis=-1, keepdims=True)
+    w = w / w_sum
+    y = y - np.sum(w * y, axis=-1, keepdims=True)
+
+    # sum w y exp(-i omega t) = Ch - i Sh, and sum w exp(-2 i omega t) = C2 - i S2
+    yt = chirp_z(fill_grid(index, w * y), f0, df, len(frequency), cadence, workers)
+    wt = chirp_z(fill_grid(index, w), 2 * f0, 2 * df, len(frequency), cadence, workers)
+    Ch, Sh = yt.real, -yt.imag
+    C2, S2 = wt.real, -wt.imag
+
+    return _zechmeister_kurster(Ch, Sh, C2, S2) * 0.5 * w_sum
+
+
+def segmented_lombscargle(
+        time : NDArray,
+        y : NDArray,
+        dy : NDArray,
+        frequency : NDArray,
+        segments : list,
+        workers : int = -1
+) -> NDArray:
+    """
+    Lomb-Scargle PSD (as grid_lombscargle) of one light curve whose segments are on their own cadence grid
+    (see grid_segments). The Fourier sums are additive, so the chirp-z sums of every segment are shifted to
+    the start of the first segment (times exp(-i omega shift)) and added before the periodogram is formed.
+
+    Input:
+        time        :: sorted time stamps, shape (n_samples,)
+        y           :: samples
+        dy          :: uncertainties of the samples (None for uniform weights)
+        frequency   :: regularly spaced frequencies
+        segments    :: (first, stop, CadenceGrid) of consecutive parts of time, from grid_segments
+        workers     :: threads for scipy.fft (-1 = all cores)
+
+    Output:
+        power       :: PSD at frequency
+    """
+    y = np.asarray(y, dtype=np.float64)
+    dy = np.ones_like(y) if dy is None else np.broadcast_to(np.asarray(dy, dtype=np.float64), y.shape)
+    frequency = np.asarray(frequency, dtype=np.float64)
+    f0 = frequency[0]
+    df = frequency[1] - frequency[0] if len(frequency) > 1 else 0.0
+    k = np.arange(len(frequency), dtype=np.float64)
+
+    w = dy**-2.0
+    w_sum = w.sum()
+    w = w / w_sum
+    y = y - np.sum(w * y)
+
+    yt = np.zeros(len(frequency), dtype=complex)
+    wt = np.zeros(len(frequency), dtype=complex)
+    origin = segments[0][2].start
+    for first, stop, grid in segments:
+        shift = grid.start - origin
+        yt += chirp_z(fill_grid(grid.index, (w * y)[first:stop]), f0, df, len(frequency), grid.cadence, workers) \
+            * _shift(f0, df, k, shift)
+        wt += chirp_z(fill_grid(grid.index, w[first:stop]), 2 * f0, 2 * df, len(frequency), grid.cadence, workers) \
+            * _shift(2 * f0, 2 * df, k, shift)
+
+    return _zechmeister_kurster(yt.real, -yt.imag, wt.real, -wt.imag) * 0.5 * w_sum
+
+
+def _shift(f0 : float, df : float, k : NDArray, shift : float) -> NDArray:
+    """exp(-2 pi i (f0 + k df) shift), with the phases (in cycles) reduced before they are multiplied by k"""
+    cycles = np.mod(f0 * shift, 1.0) + np.mod(np.mod(df * shift, 1.0) * k, 1.0)
+    return np.exp(-2j * np.pi * cycles)
+
+
+def _zechmeister_kurster(Ch : NDArray, Sh : NDArray, C2 : NDArray, S2 : NDArray) -> NDArray:
+    """
+    Periodogram (without normalization) from the normalized sums sum w y cos/sin(omega t) and sum w cos/sin(2 omega t),
+    as astropy.timeseries.periodograms.lombscargle fast_impl (fit_mean=False)
+    """
+    # Time shift tau of every frequency
+    tan_2omega_tau = S2 / C2
+    S2w = tan_2omega_tau / np.sqrt(1 + tan_2omega_tau * tan_2omega_tau)
+    C2w = 1 / np.sqrt(1 + tan_2omega_tau * tan_2omega_tau)
+    Cw = np.sqrt(0.5) * np.sqrt(1 + C2w)
+    Sw = np.sqrt(0.5) * np.sign(S2w) * np.sqrt(1 - C2w)
+
+    YC = Ch * Cw + Sh * Sw
+    YS = Sh * Cw - Ch * Sw
+    CC = 0.5 * (1 + C2 * C2w + S2 * S2w)
+    SS = 0.5 * (1 - C2 * C2w - S2 * S2w)
+    return YC * YC / CC + YS * YS / SS
+
+
+def lombscargle_psd(
+        time : NDArray,
+        y : NDArray,
+        dy : NDArray,
+        frequency : NDArray,
+        engine : Literal["auto", "lombscargle"] = "auto",
+        grid_tolerance : float = GRID_TOLERANCE,
+        workers : int = 1
+) -> NDArray:
+    """
+    Lomb-Scargle PSD (normalization="psd", fit_mean=False, center_data=True) on a regular frequency grid.
+    With engine "auto" the cadence-grid engine is used if the light curve splits into at most MAX_GRID_SEGMENTS
+    segments with all time stamps on their segment's regular grid within the tolerance of engine_tolerance
+    (see grid_segments), otherwise (or with engine "lombscargle") astropy's fast method.
+    With more than one worker, astropy evaluates the rows in a thread pool sharing the data, one light curve
+    is evaluated with its samples spread onto the FFT grid by all threads (see _parallel_psd),
+    and the grid engine uses multi-threaded FFTs.
+
+    Input:
+        time            :: sorted time stamps, shape (n_samples,), or (n_rows, n_samples) for consecutive
+                            chunks of one light curve (one periodogram per row)
+        y               :: samples, same shape as time
+        dy              :: uncertainties (None for uniform weights)
+        frequency       :: regularly spaced frequencies (in units of 1 / time)
+        engine          :: "auto" or "lombscargle"
+        grid_tolerance  :: largest offset from the cadence grid (in cadences) for the grid engine
+                            (lowered to a phase error of PHASE_TOLERANCE at the highest frequency)
+        workers         :: number of threads (-1 = all cores)
+
+    Output:
+        power           :: PSD, shape (n_freq,) or (n_rows, n_freq)
+    """
+    if engine not in ("auto", "lombscargle"):
+        raise ValueError(f"Unknown periodogram engine {engine}. Choose from ['auto', 'lombscargle']")
+
+    time = np.asarray(time, dtype=np.float64)
+    frequency = np.asarray(frequency, dtype=np.float64)
+
+    if engine == "auto":
+        tolerance = engine_tolerance(time, frequency, grid_tolerance)
+
+    if engine == "auto" and time.ndim == 1:
+        segments = grid_segments(time, tolerance)
+        if segments is not None:
+            return segmented_lombscargle(time, y, dy, frequency, segments, workers)
+
+    elif engine == "auto":
+        grid = CadenceGrid.from_time(time.ravel())
+        if grid.regular(tolerance):
+            index = grid.index.reshape(time.shape)
+            index = index - index[..., :1]
+            return grid_lombscargle(index, grid.cadence, y, dy, frequency, workers)
+        if grid_segments(time.ravel(), tolerance) is not None:
+            # Every row on its own segments
+            dy = np.broadcast_to(dy, time.shape) if dy is not None else [None] * len(time)
+            return np.array([
+                lombscargle_psd(*row, frequency, engine, grid_tolerance, workers) for row in zip(time, y, dy)
+            ])
+
+    return _astropy_rows(time, y, dy, frequency, _threads(workers))
+
+
+def engine_tolerance(time : NDArray, frequency : NDArray, grid_tolerance : float = GRID_TOLERANCE) -> float:
+    """
+    Largest offset from the cadence grid (in cadences) for the grid engine: grid_tolerance, lowered so that
+    the phase error 2 pi f_max dt at the highest frequency stays below PHASE_TOLERANCE
+    """
+    diff = np.diff(np.ravel(time))
+    f_max_cadence = np.max(np.abs(frequency)) * np.median(diff) if len(diff) and len(frequency) else 0.0
+    if not f_max_cadence > 0:
+        return grid_tolerance
+    return min(grid_tolerance, PHASE_TOLERANCE / (2 * np.pi * f_max_cadence))
+
+
+def white_noise_level(y : NDArray, dy : NDArray = None) -> float:
+    """
+    White-noise level of the Lomb-Scargle PSD ("psd" normalization) from the point-to-point scatter of y,
+    instead of a transform up to the Nyquist frequency. The level is sum(w^2 sigma^2) / sum(w) with w = dy^-2
+    and sigma^2 half the (robust) variance of the differences of y, times ln(2), i.e. the median of the PSD
+    where it is pure noise (as FliPer.estimate_noise).
+    """
+    y = np.asarray(y, dtype=np.float64)
+    diff = np.diff(y)
+    sigma2 = (1.4826 * np.median(np.abs(diff - np.median(diff)))) ** 2 / 2
+    w = np.ones_like(y) if dy is None else np.asarray(dy, dtype=np.float64) ** -2.0
+    return float(np.log(2) * sigma2 * np.sum(w**2) / np.sum(w))
+
+
+def summed_psd(
+        time : NDArray,
+        y : NDArray,
+        dy : NDArray,
+        frequency : NDArray,
+        engine : Literal["auto", "lombscargle"] = "auto",
+        grid_tolerance : float = GRID_TOLERANCE,
+        workers : int = 1,
+        out : Optional[NDArray] = None
+) -> NDArray:
+    """
+    Sum of the PSDs (as lombscargle_psd) of the rows of time, y and dy, e.g. consecutive chunks of one
+    light curve. The rows are computed in a thread pool sharing the inputs, with at most one row per thread
+    in flight, and added in order to a single running sum, so the memory does not grow with the number of rows.
+
+    Input:
+        time, y, dy     :: shape (n_rows, n_samples) (dy may be None)
+        frequency       :: regularly spaced frequencies
+        engine          :: "auto" or "lombscargle"
+        grid_tolerance  :: largest offset from the cadence grid (in cadences) for the grid engine
+        workers         :: number of threads (-1 = all cores)
+        out             :: optional array (e.g. a memmap) of shape (n_rows, n_freq) for the PSD of every row
+
+    Output:
+        total           :: sum of the PSDs, shape (n_freq,)
+    """
+    # As lombscargle_psd of all rows: the engine is chosen from the cadence grid of the whole light curve
+    if engine == "auto" and grid_segments(np.ravel(time), engine_tolerance(time, frequency, grid_tolerance)) is None:
+        engine = "lombscargle"
+
+    n_rows = len(time)
+    n_threads = min(_threads(workers), n_rows)
+    total = np.zeros(len(frequency))
+
+    def row_psd(i):
+        # With parallel rows every row is computed in one thread
+        return lombscargle_psd(
+            time[i], y[i], None if dy is None else dy[i], frequency,
+            engine, grid_tolerance, workers=1 if n_threads > 1 else workers
+        )
+
+    def add(i, psd):
+        np.add(total, psd, out=total)
+        if out is not None:
+            out[i] = psd
+
+    if n_threads <= 1:
+        for i in range(n_rows):
+            add(i, row_psd(i))
+        return total
+
+    with ThreadPoolExecutor(max_workers=n_threads) as executor:
+        pending = deque()
+        for i in range(n_rows):
+            pending.append((i, executor.submit(row_psd, i)))
+            if len(pending) == n_threads:
+                j, future = pending.popleft()
+                add(j, future.result())
+        while pending:
+            j, future = pending.popleft()
+            add(j, future.result())
+    return total
+
+
+def _threads(workers : int) -> int:
+    """Number of threads for workers (-1 = all cores), at most the number of cores"""
+    cores = os.cpu_count() or 1
+    return cores if workers == -1 else min(max(int(workers), 1), cores)
+
+
+def _astropy_rows(time : NDArray, y : NDArray, dy : NDArray, frequency : NDArray, n_threads : int = 1) -> NDArray:
+    """astropy's fast Lomb-Scargle of one light curve (its samples spread over n_threads threads), or of every row"""
+    if time.ndim == 1:
+        return _astropy_psd(time, y, dy, frequency, n_threads)
+
+    dy = np.broadcast_to(dy, time.shape) if dy is not None else [None] * len(time)
+    rows = list(zip(time, y, dy))
+    if n_threads == 1 or len(rows) == 1:
+        return np.array([_astropy_psd(*row, frequency) for row in rows])
+    with ThreadPoolExecutor(max_workers=min(n_threads, len(rows))) as executor:
+        return np.array(list(executor.map(lambda row: _astropy_psd(*row, frequency), rows)))
+
+
+def _astropy_psd(time : NDArray, y : NDArray, dy : NDArray, frequency : NDArray, n_threads : int = 1) -> NDArray:
+    """astropy's fast Lomb-Scargle (with more than one thread, its samples are spread in parallel, see _parallel_psd)"""
+    n_threads = min(n_threads, len(time) // MIN_THREAD_SAMPLES)
+    if n_threads > 1 and get_lra_params is not None and len(frequency) > 1:
+        return _parallel_psd(time, y, dy, frequency, n_threads)
+    ls = LombScargle(t=time, y=y, dy=dy, fit_mean=False, center_data=True)
+    return ls.power(frequency, normalization="psd", method="fast", assume_regular_frequency=True)
+
+
+def _parallel_psd(time : NDArray, y : NDArray, dy : NDArray, frequency : NDArray, n_threads : int) -> NDArray:
+    """
+    astropy's fast Lomb-Scargle (fit_mean=False, center_data=True, "psd" normalization, LRA NUFFT of
+    Ruiz-Antolin & Townsend 2018) of one light curve, with the samples split over n_threads threads.
+    Spreading the samples onto the FFT grid is linear and dominates the cost, so every thread spreads
+    its share of the samples onto its own grid (n_fft x K complex values each), the grids are added,
+    and one set of FFTs follows. The result equals astropy's to rounding.
+    """
+    time = np.asarray(time, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    dy = np.ones_like(y) if dy is None else np.broadcast_to(np.asarray(dy, dtype=np.float64), y.shape)
+    frequency = np.asarray(frequency, dtype=np.float64)
+    f0, df = frequency[0], frequency[1] - frequency[0]
+
+    w = dy**-2.0
+    w_sum = w.sum()
+    w = w / w_sum
+    y = y - np.dot(w, y)
+
+    bounds = np.linspace(0, len(time), n_threads + 1).astype(int)
+    with ThreadPoolExecutor(max_workers=n_threads) as executor:
+        # sum w y exp(i omega t) = Ch + i Sh, and sum w exp(2 i omega t) = C2 + i S2
+        yt = _lra_sums(time, w * y, f0, df, len(frequency), bounds, executor)
+        wt = _lra_sums(time, w, 2 * f0, 2 * df, len(frequency), bounds, executor)
+    return _zechmeister_kurster(yt.real, yt.imag, wt.real, wt.imag) * 0.5 * w_sum
+
+
+def _lra_sums(
+        time : NDArray,
+        h : NDArray,
+        f0 : float,
+        df : float,
+        n_freq : int,
+        bounds : NDArray,
+        executor : ThreadPoolExecutor
+) -> NDArray:
+    """
+    sum h exp(2 pi i f t) at f = f0 + k df (k < n_freq), as astropy's trig_sum (algorithm "lra"),
+    with the samples time[bounds[i]:bounds[i + 1]] spread onto the FFT grid by the threads of executor
+    """
+    t0 = time.min()
+    x = (time - t0) * df
+    n_fft = lra_fast_len(max(n_freq, len(x)))
+    parts = list(zip(bounds[:-1], bounds[1:]))
+
+    # Grid indices of the samples, the rank K of the approximation follows from their largest deviation gamma
+    params = list(executor.map(lambda part: get_lra_params(x[part[0]:part[1]], n_fft, LRA_EPS), parts))
+    gamma = max(param[1] for param in params)
+    K = max(param[2] for param in params)
+    B = bessel_coefficients(K, gamma)
+
+    def spread(part, index):
+        first, stop = part
+        values = h[first:stop] * np.exp(2j * np.pi * f0 * (time[first:stop] - t0))
+        er = (n_fft * x[first:stop] - np.rint(n_fft * x[first:stop]) + 0.5) % 1 - 0.5
+        cheb = np.ones((stop - first, K)) if gamma == 0 else chebyshev_polynomials(K - 1, er / gamma)
+        product = np.conjugate(np.exp(-1j * np.pi * er)[:, None] * np.dot(cheb, B)) * values[:, None]
+        grid = np.empty((n_fft, K), dtype=complex)
+        for k in range(K):
+            grid[:, k].real = np.bincount(index, weights=product[:, k].real, minlength=n_fft)
+            grid[:, k].imag = np.bincount(index, weights=product[:, k].imag, minlength=n_fft)
+        return grid
+
+    grids = executor.map(spread, parts, [param[0] for param in params])
+    total = next(grids)
+    for grid in grids:
+        total += grid
+
+    total = sp_fft.ifft(total, axis=0, norm="forward", workers=len(parts))[:n_freq]
+    V = chebyshev_polynomials(K - 1, 2.0 * np.arange(n_freq) / n_fft - 1)
+    sums = np.sum(V * total, axis=1)
+    return sums * np.exp(2j * np.pi * t0 * (f0 + df * np.arange(n_freq)))
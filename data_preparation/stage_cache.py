@@ -0,0 +1,91 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+from dataclasses import asdict
+from typing import Optional
+from numpy.typing import NDArray
+
+# ProcessingConfig (and COVConfig) fields each stage depends on.
+# A stage key is the key of the previous stage plus these fields only,
+# so changing e.g. ACFConfig or COVConfig.use_Bell never invalidates the PSDs.
+LIGHTCURVE_FIELDS = (
+    "sort", "normalize", "close_gaps", "gap_size_days", "savgol", "savgol_window",
+    "decimate", "decimate_max_freq",
+)
+PSD_FIELDS = (
+    "oversampling", "width_for_wf", "periodogram_engine", "grid_tolerance",
+    "limit_psd_range", "psd_range_margin",
+)
+AVG_PSD_FIELDS = (
+    "oversampling", "avg_psd_chunk", "periodogram_engine", "grid_tolerance",
+    "limit_psd_range", "psd_range_margin",
+)
+WELCH_FIELDS = ("welch_seg_size",)
+
+
+class StageCache:
+    """
+    Persistent on-disk cache of pipeline stages (processed light curve, PSD,
+    averaged PSD and Welch PSD).
+
+    Every stage is stored in its own folder, <cache_dir>/<stage>/<key>/,
+    with one .npy file per array. Arrays are loaded memory-mapped, so a cache
+    hit costs (almost) no I/O until the values are actually used.
+    """
+
+    def __init__(self, cache_dir : str):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def fingerprint(*arrays : NDArray) -> str:
+        """Hash of the content (dtype, shape and values) of arrays"""
+        h = hashlib.sha256()
+        for a in arrays:
+            a = np.ascontiguousarray(a)
+            h.update(str(a.dtype).encode())
+            h.update(str(a.shape).encode())
+            h.update(a.tobytes())
+        return h.hexdigest()
+
+    @staticmethod
+    def stage_key(parent_key : str, config, names : tuple, extra : Optional[dict] = None) -> str:
+        """Key of a stage: key of the input plus the config fields (and extra settings) the stage depends on"""
+        values = asdict(config)
+        settings = {name: values[name] for name in names}
+        settings.update(extra or {})
+        h = hashlib.sha256(parent_key.encode())
+        h.update(json.dumps(settings, sort_keys=True, default=str).encode())
+        return h.hexdigest()
+
+    def path(self, stage : str, key : str) -> str:
+        return os.path.join(self.cache_dir, stage, key)
+
+    def load(self, stage : str, key : str) -> Optional[dict]:
+        """Load arrays of stage (memory-mapped), None if not cached"""
+        path = self.path(stage, key)
+        if not os.path.isdir(path):
+            return None
+        return {
+            filename[:-4]: np.load(os.path.join(path, filename), mmap_mode="r")
+            for filename in os.listdir(path)
+            if filename.endswith(".npy")
+        }
+
+    def save(self, stage : str, key : str, **arrays : NDArray):
+        """Save arrays of stage. Written to a temporary folder first so readers never see half a stage"""
+        path = self.path(stage, key)
+        if os.path.isdir(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=os.path.dirname(path), prefix=f".{key}-")
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp, f"{name}.npy"), np.asarray(array))
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            # Another process cached the same stage in the meantime
+            shutil.rmtree(tmp, ignore_errors=True)
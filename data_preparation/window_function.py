@@ -0,0 +1,122 @@
+"""
+Effective frequency resolution (integrated spectral window) per time sampling.
+
+Stars observed in the same Kepler quarters or TESS sectors share (nearly) the same time
+stamps, and therefore the same spectral window. The integrated window is cached per process,
+keyed by a fingerprint of the sampling (the grid positions of the time stamps, i.e. span and
+gaps, in units of the cadence), so it is computed once for every distinct sampling.
+For gap-free regular sampling the window is the Fejer kernel, and no Lomb-Scargle is needed.
+"""
+
+import hashlib
+import threading
+import numpy as np
+from scipy.integrate import simpson
+from numpy.typing import NDArray
+from typing import Literal
+from .periodogram import lombscargle_psd, GRID_TOLERANCE
+
+# Time stamps within this fraction of the cadence of a regular grid count as regular
+REGULAR_TOLERANCE = 1e-3
+
+_RESOLUTIONS = {}
+_LOCK = threading.Lock()
+
+
+def _rounded(x : float, digits : int = 6) -> float:
+    """x rounded to significant digits, so (nearly) equal samplings give equal keys"""
+    return float(f"{x:.{digits}g}")
+
+
+def sampling_fingerprint(time : NDArray):
+    """
+    Fingerprint of a time sampling: cadence, number of points, and a hash of the grid index of
+    every time stamp (which holds span and gaps).
+
+    Input:
+        time        :: sorted time stamps
+
+    Output:
+        fingerprint :: hashable key
+        regular     :: True if the sampling is gap-free and regular
+    """
+    time = np.asarray(time, dtype=np.float64)
+    diff = np.diff(time)
+    dt = np.median(diff)
+    # Grid index from the rounded steps (not from time - time[0], which drifts for long
+    # series of barycentric time stamps)
+    steps = np.rint(diff / dt).astype(np.int64)
+    regular = bool(np.all(steps == 1) and np.max(np.abs(diff - dt)) < REGULAR_TOLERANCE * dt)
+    index = np.concatenate(([0], np.cumsum(steps)))
+    digest = hashlib.sha1(index.tobytes()).hexdigest()
+    return (_rounded(dt), len(time), digest), regular
+
+
+def effective_resolution(time : NDArray, nyq : float, oversampling : float = 1.0, width_factor : float = 100,
+                         engine : Literal["auto", "lombscargle"] = "auto", grid_tolerance : float = GRID_TOLERANCE,
+                         workers : int = 1):
+    """
+    Frequency resolution accounting for the spectral window: the integral of the normalized
+    spectral window within width_factor / T of its peak (T the time span), cached per sampling.
+
+    Input:
+        time            :: sorted time stamps
+        nyq             :: Nyquist frequency (in units of 1 / time), the window is computed at nyq / 2
+        oversampling    :: oversampling of the frequency grid of the window
+        width_factor    :: half width of the window in units of 1 / T
+        engine          :: periodogram engine of window_function (see periodogram.lombscargle_psd)
+        grid_tolerance  :: largest offset from the cadence grid (in cadences) for the grid engine
+        workers         :: number of threads of the periodogram (-1 = all cores)
+
+    Output:
+        df              :: effective frequency resolution (in units of 1 / time)
+    """
+    (dt, n_points, digest), regular = sampling_fingerprint(time)
+    dt = np.median(np.diff(time))
+
+    # For a given pattern of grid positions the window scales with 1 / cadence, so the resolution
+    # is stored in units of 1 / cadence and shared by samplings that differ only in cadence
+    # (nyq * dt only sets where the window is evaluated, the window hardly depends on it)
+    key = (n_points, digest, _rounded(nyq * dt, 3), float(oversampling), float(width_factor), engine, float(grid_tolerance))
+    with _LOCK:
+        if key in _RESOLUTIONS:
+            return _RESOLUTIONS[key] / dt
+
+    if regular:
+        freq, power = fejer_window(n_points, dt, oversampling, width_factor)
+    else:
+        freq, power = window_function(time, nyq, oversampling, width_factor, engine, grid_tolerance, workers)
+    df = simpson(power, x=freq)
+
+    with _LOCK:
+        _RESOLUTIONS[key] = df * dt
+    return df
+
+
+def window_function(time : NDArray, nyq : float, oversampling : float = 1.0, width_factor : float = 100,
+                    engine : Literal["auto", "lombscargle"] = "auto", grid_tolerance : float = GRID_TOLERANCE,
+                    workers : int = 1):
+    """Spectral window of the sampling from the Lomb-Scargle periodogram of a sinusoid at nyq / 2"""
+    df = 1 / (np.nanmax(time) - np.nanmin(time))
+    width = width_factor * df
+    freq_cen = 0.5 * nyq
+    Nfreq = int(oversampling * width / df)
+    freq = freq_cen + (df / oversampling) * np.arange(-Nfreq, Nfreq, 1)
+    x = 0.5 * np.sin(2 * np.pi * freq_cen * time) + 0.5 * np.cos(
+        2 * np.pi * freq_cen * time
+    )
+    power = lombscargle_psd(time, x, None, freq, engine=engine, grid_tolerance=grid_tolerance, workers=workers)
+    power /= power[int(len(power) / 2)]  # Normalize to have maximum of one
+    freq -= freq_cen
+    return freq, power
+
+
+def fejer_window(n_points : int, dt : float, oversampling : float = 1.0, width_factor : float = 100):
+    """Spectral window of n_points regular samples (Fejer kernel) on the frequency grid of window_function"""
+    df = 1 / ((n_points - 1) * dt)
+    Nfreq = int(oversampling * width_factor)
+    freq = (df / oversampling) * np.arange(-Nfreq, Nfreq, 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        power = np.sin(np.pi * freq * n_points * dt) ** 2 / (n_points**2 * np.sin(np.pi * freq * dt) ** 2)
+    power[Nfreq] = 1.0  # limit at zero frequency
+    return freq, power
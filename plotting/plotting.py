@@ -1,11 +1,16 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import os
+from typing import Optional
 from ..data_preparation.dataclasses import PSDData, StarInfo
 
-def plot_spectrum_with_all_numax_estimates(psd : PSDData, star : StarInfo, numax_estimates : dict):
+def plot_spectrum_with_all_numax_estimates(psd : PSDData, star : StarInfo, numax_estimates : dict,
+                                           backgrounds : Optional[dict] = None):
+    """Plot full spectrum with all numax estimates, and the median-filtered backgrounds (window -> background) if given"""
     fig, ax = plt.subplots()
     ax.loglog(psd.frequency, psd.psd, c="gray")
+    for window, background in (backgrounds or {}).items():
+        ax.loglog(psd.frequency, background, c="k", lw=0.8, label=f"median filter ({window} bins)")
     for label, numax in numax_estimates.items():
         try:
             numax_val = numax.n
@@ -28,6 +33,12 @@ def plot_spectrum_with_all_numax_estimates(psd : PSDData, star : StarInfo, numax
         elif "FliPer" in label:
             ls = (5, (10, 3))
             c = "darkorange"
+        elif "EACF" in label:
+            ls = (0, (3, 1, 1, 1, 1, 1))
+            c = "crimson"
+        else:
+            ls = "-"
+            c = "k"
 
         ax.axvline(numax_val, linestyle=ls, c=c, label=line_label)
         if numax_err is not None:
@@ -2,7 +2,7 @@
 Functions for 2D ACF method
 """
 
-from .two_dim_acf import calculate_two_dim_ACF
+from .two_dim_acf import calculate_two_dim_ACF, calculate_linear_two_dim_ACF
 from .collapse_acf_and_fit import collapsed_acf, fit_gauss_to_collapsed_acf
 from .normalize_spectrum import calculate_relative_power
 from .acf_plot import plot_collapsed_acf_with_gaussian_fit, plot_spec
@@ -10,6 +10,7 @@ from .acf_plot_linear import plot_collapsed_acf_with_gaussian_fit_linear, plot_2
 
 __all__ = [
     "calculate_two_dim_ACF",
+    "calculate_linear_two_dim_ACF",
     "collapsed_acf",
     "fit_gauss_to_collapsed_acf",
     "calculate_relative_power",
@@ -14,9 +14,9 @@ def plot_spec_linear(frequency : NDArray, power : NDArray, smoothed_power : NDAr
     ax.text(0.02, 0.02, f"{id}", ha="left", va="bottom", transform=ax.transAxes)
     ax.legend()
 
-def plot_2D_ACF_linear(ACF : NDArray, frequency : NDArray, ax : NDArray):
-    """Plot heatmap of 2D ACF."""
-    if np.max(frequency) > 300:
+def plot_2D_ACF_linear(ACF : NDArray, frequency : NDArray, ax : NDArray, nyquist : float = None):
+    """Plot heatmap of 2D ACF (window size set by the Nyquist frequency, defaults to the highest frequency)."""
+    if (np.max(frequency) if nyquist is None else nyquist) > 300:
         window_size_muHz = 249
         step = 10
     else:
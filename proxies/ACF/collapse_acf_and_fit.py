@@ -4,22 +4,29 @@ from scipy.optimize import OptimizeWarning
 from scipy import integrate
 import warnings
 from numpy.typing import NDArray
+from typing import Optional
 from uncertainties import ufloat
+from ..smoothing import window_nanmean
 
-def collapsed_acf(acf : NDArray, freq_windows : NDArray, sliding_window_style : str = 'log_numax'):
+def collapsed_acf(acf : NDArray, freq_windows : NDArray, sliding_window_style : str = 'log_numax',
+                  collapsed : Optional[NDArray] = None):
     """
     Collapse 2D ACF into 1D ACF
 
     Input:
-        acf :: 2D ACF
+        acf :: 2D ACF (not used if collapsed is given)
         freq_windows :: binned frequency list
+        collapsed :: already collapsed segments (e.g. from the streaming linear 2D ACF)
 
     Output:
         collapsed_acf_numax :: collapsed 1D acf
         freq_centers :: medians of freq_windows for plotting and fitting
     """
     # Collapse acf with mean of each segment
-    collapsed_acf = np.array([collapse_segment(seg) for seg in acf])
+    if collapsed is None:
+        collapsed_acf = np.array([collapse_segment(seg) for seg in acf])
+    else:
+        collapsed_acf = np.asarray(collapsed, dtype=float)
 
     # Regularize and take absolute value
     collapsed_acf = collapsed_acf - np.median(collapsed_acf)
@@ -27,16 +34,24 @@ def collapsed_acf(acf : NDArray, freq_windows : NDArray, sliding_window_style :
     acfs /= np.max(acfs)
 
     # Grab frequency as median of each segment
-    frequency = np.array([np.median(seg) for seg in freq_windows])
+    if sliding_window_style == 'linear':
+        # Windows of the linear sliding window are sorted and of equal length,
+        # so the median is the middle element(s) (no copy of every window)
+        n_points = freq_windows.shape[1]
+        frequency = (freq_windows[:, (n_points - 1) // 2] + freq_windows[:, n_points // 2]) / 2
+    else:
+        frequency = np.array([np.median(seg) for seg in freq_windows])
     
     # Smooth acf (Viani+ 2019)
     unsmoothed_acf = acfs
     if sliding_window_style == 'linear':
         smoothed_acf = unsmoothed_acf
     else:
-        smoothed_acf = [
-            smoothing_func(center, frequency, unsmoothed_acf) for center in frequency
-        ]
+        # Windowed mean around every frequency (as smoothing_func, for all frequencies at once)
+        width = 0.66 * frequency**0.88 # Smooth with FWHM of oscillation envelope
+        smoothed_acf = window_nanmean(
+            frequency, unsmoothed_acf, frequency - width / 5, frequency + width / 5, closed_upper=True
+        )
     
     # Regularize smoothed ACF
     smoothed_acf = normalize_0_1(smoothed_acf)
@@ -62,6 +77,22 @@ def collapse_segment(seg : NDArray) -> float:
     return mean
     
 
+def collapse_segments(acf : NDArray) -> NDArray:
+    """Collapse every row (segment) of a 2D ACF array at once, as collapse_segment."""
+    # Ignore first index which always has ACF = 1
+    segs = acf[:, 1:]
+
+    # Check length of segments
+    if segs.shape[1] < 1:
+        return np.full(len(acf), np.nan)
+
+    # Segments with zero standard deviation give nan
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        std = np.nanstd(segs, axis=1, ddof=1)
+        mean = np.nanmean(segs, axis=1)
+    return np.where(std == 0, np.nan, mean)
+
 def fit_gauss_to_collapsed_acf(smoothed_acf : NDArray, freq_centers : NDArray, initial_numax : float,
                                max_acf_fit_iterations : float, n_sigma_numax_acf : float):
     """
@@ -2,6 +2,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 from numpy.typing import NDArray
 from scipy.signal import correlate
+from scipy import fft as sp_fft
 
 def batch_fft_acf(power_windows : NDArray):
     """
@@ -17,7 +18,8 @@ def batch_fft_acf(power_windows : NDArray):
 
     _, n_points = power_windows.shape
     nfft = 1 << (2 * n_points - 1).bit_length()
-    power_windows -= np.mean(power_windows, axis=1, keepdims=True)
+    # Not in place, windows can be (overlapping) views of the same power array
+    power_windows = power_windows - np.mean(power_windows, axis=1, keepdims=True)
 
     fft = np.fft.rfft(power_windows, n=nfft, axis=1)
     psd = np.abs(fft) ** 2
@@ -28,6 +30,69 @@ def batch_fft_acf(power_windows : NDArray):
     return abs(acf)
 
 
+# FFT sizes of the length buckets: 2^k times these factors (5-smooth, i.e. fast for scipy.fft)
+BUCKET_FACTORS = (1, 5 / 4, 3 / 2, 15 / 8)
+# Largest zero-padded batch (MB) transformed in one call
+MAX_BATCH_MB = 64
+
+
+def bucket_fft_size(n : int) -> int:
+    """Smallest FFT size >= n of the form 2^k * BUCKET_FACTORS (four sizes per octave, at most 25% padding)"""
+    base = 1 << max(int(n - 1).bit_length() - 1, 0)
+    for factor in BUCKET_FACTORS:
+        size = base * factor
+        if size >= n and size == int(size):
+            return int(size)
+    return 2 * base
+
+
+def ragged_fft_acf(windows : list, normalization : str = "sqrt", workers : int = -1):
+    """
+    Autocorrelation of windows of different lengths by means of batched FFTs.
+    Windows are grouped in coarse length buckets (FFT size bucket_fft_size(2 * len - 1), so there is
+    no circular wrap-around), zero-padded, and every bucket is transformed with multi-threaded
+    scipy.fft calls of at most MAX_BATCH_MB.
+
+    Input:
+        windows :: list of PSD windows (arrays or views, not modified)
+        normalization :: "sqrt" as abs_acf (divide by sqrt(len)) or "max" as abs_acf_linear (divide by max)
+        workers :: number of threads for scipy.fft (-1 = all cores)
+
+    Output:
+        acfs :: list of normalized absolute autocorrelations (positive lags), one per window
+    """
+    lengths = np.array([len(w) for w in windows], dtype=int)
+    nffts = np.array([bucket_fft_size(2 * n - 1) for n in lengths], dtype=int)
+    acfs = [None] * len(windows)
+
+    for nfft in np.unique(nffts):
+        bucket = np.flatnonzero(nffts == nfft)
+        # rfft output (complex) takes about as much memory as the padded batch
+        rows_per_batch = max(int(MAX_BATCH_MB * 1e6 / (16 * nfft)), 1)
+        for idx in np.array_split(bucket, -(-len(bucket) // rows_per_batch)):
+            n = lengths[idx]
+
+            # Zero-padded, mean subtracted windows of this FFT size
+            batch = np.zeros((len(idx), nfft))
+            for row, i in enumerate(idx):
+                batch[row, :n[row]] = windows[i]
+            batch -= (batch.sum(axis=1) / n)[:, None]
+            batch[np.arange(nfft) >= n[:, None]] = 0
+
+            fft = sp_fft.rfft(batch, axis=1, workers=workers)
+            corr = sp_fft.irfft(fft.real**2 + fft.imag**2, n=nfft, axis=1, workers=workers)
+            if normalization == "sqrt":
+                corr = np.abs(corr) * (1 / np.sqrt(n))[:, None]
+            else:
+                # The zero lag is the maximum of an autocorrelation
+                corr = np.abs(corr / corr[:, :1])
+
+            for row, i in enumerate(idx):
+                acfs[i] = corr[row, :n[row]].copy()  # positive lags (copy, the batch is freed)
+
+    return acfs
+
+
 def abs_acf(x : NDArray):
     """
     Autocorrelation by means of np.correlate(x,x).
@@ -40,8 +105,8 @@ def abs_acf(x : NDArray):
         np.abs(corr) * scaling :: normalized absolute autocorrelation
     """
     # print(len(x), np.max(x))
-    # Subtract mean
-    x -= np.mean(x)  
+    # Subtract mean (not in place, x can be a view of the full power array)
+    x = x - np.mean(x)
 
     # Perform ACF on segment (x)
     corr = correlate(x, x, mode='full')
@@ -66,8 +131,8 @@ def abs_acf_linear(x : NDArray):
         np.abs(corr / np.max(corr)) :: normalized absolute autocorrelation
     """
 
-    # Subtract mean
-    x -= np.mean(x)  
+    # Subtract mean (not in place, x can be a view of the full power array)
+    x = x - np.mean(x)
 
     # Perform ACF on segment (x)
     corr = np.correlate(x, x, mode="full")
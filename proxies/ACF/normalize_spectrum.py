@@ -1,11 +1,18 @@
-from scipy.ndimage import median_filter
 import numpy as np
+from typing import Literal, Optional
 from numpy.typing import NDArray
+from ..background import running_median, BackgroundCache
 
-def calculate_relative_power(frequency : NDArray, power : NDArray):
-    """Subtract and normalize PSD by median filter (Viani+ 2019)"""
+def calculate_relative_power(frequency : NDArray, power : NDArray, mode : Literal["exact", "approx"] = "exact",
+                             cache : Optional[BackgroundCache] = None, nyquist : Optional[float] = None):
+    """
+    Subtract and normalize PSD by median filter (Viani+ 2019), mode of the running median as in background.running_median.
+    With a BackgroundCache the median filter is taken from (or added to) the cache, in the mode of the cache.
+    The filter width depends on the cadence, i.e. the Nyquist frequency (defaults to the highest frequency).
+    """
+    nyquist = np.max(frequency) if nyquist is None else nyquist
 
-    if np.max(frequency) > 300:
+    if nyquist > 300:
         ws = 100  # muHz
     else:
         ws = 10  # muHz
@@ -13,7 +20,10 @@ def calculate_relative_power(frequency : NDArray, power : NDArray):
     df = np.median(np.diff(frequency))
     wp = int(ws / df)
 
-    med_filter = median_filter(power, size=wp, mode="reflect")
+    if cache is not None:
+        med_filter = cache.get(power, wp)
+    else:
+        med_filter = running_median(power, wp, mode=mode)
     rel_power = (power - med_filter) / med_filter
 
-    return rel_power, med_filter
\ No newline at end of file
+    return rel_power, med_filter
@@ -1,12 +1,15 @@
 import numpy as np
 from numpy.lib.stride_tricks import sliding_window_view
-from .corr_acf_and_fft_acf import batch_fft_acf, abs_acf, abs_acf_linear
+from .corr_acf_and_fft_acf import batch_fft_acf, abs_acf, abs_acf_linear, ragged_fft_acf
 import time as t
 from numpy.typing import NDArray
+from .collapse_acf_and_fit import collapse_segments
+from typing import Optional
 from ...data_preparation.dataclasses import ACFConfig
 
 
-def calculate_two_dim_ACF(frequency : NDArray, power : NDArray, acf_config : ACFConfig):
+def calculate_two_dim_ACF(frequency : NDArray, power : NDArray, acf_config : ACFConfig,
+                          nyquist : Optional[float] = None):
     """
     Calculate 2D autocorrelation function:
         Three options are provided:
@@ -25,6 +28,7 @@ def calculate_two_dim_ACF(frequency : NDArray, power : NDArray, acf_config : ACF
     Input:
         frequency :: list of frequencies in muHz
         power :: power normalized to relative power
+        nyquist :: Nyquist frequency in muHz, sets the cadence-dependent defaults (defaults to the highest frequency)
 
     Output:
         acf :: 2D AutoCorrelation Function
@@ -36,26 +40,22 @@ def calculate_two_dim_ACF(frequency : NDArray, power : NDArray, acf_config : ACF
     # Check flags
     sliding_window_flag = acf_config.sliding_window_style
     if sliding_window_flag == 'linear':
-        # Linear sliding window
-        freq_windows, power_windows = linear_sliding_window(
+        # Linear sliding window (full 2D ACF map, computed in batches)
+        acf, _, freq_windows = calculate_linear_two_dim_ACF(
             frequency=frequency,
-            power=power
+            power=power,
+            acf_config=acf_config,
+            keep_map=True,
+            nyquist=nyquist
         )
-        # Calculate acf for each segment
-        if np.max(frequency) > 300:
-            # Long cadence data
-            acf = batch_fft_acf(power_windows)
-        else:
-            # Short cadence data
-            acf = np.array([abs_acf_linear(seg) for seg in power_windows])
     elif sliding_window_flag == 'log':
         # Log sliding window
         freq_windows, power_windows = log_sliding_window(
             frequency=frequency,
             power=power
         )
-        # Calculate acf for each segment
-        acf = [abs_acf(seg) for seg in power_windows]
+        # Calculate acf for each segment (batched FFTs, same normalization as abs_acf)
+        acf = ragged_fft_acf(power_windows, normalization="sqrt")
     elif sliding_window_flag == 'log_numax':
         ## Special sliding window (Viani et al. 2019
         # Grab parameters with binning_parameters function
@@ -64,7 +64,8 @@ def calculate_two_dim_ACF(frequency : NDArray, power : NDArray, acf_config : ACF
             acf_config.overlap_scale, 
             acf_config.min_num_points, 
             acf_config.min_freq, 
-            acf_config.width_factor
+            acf_config.width_factor,
+            nyquist
         )
 
         freq_windows, power_windows = other_binning(
@@ -76,8 +77,8 @@ def calculate_two_dim_ACF(frequency : NDArray, power : NDArray, acf_config : ACF
             max_freq=acf_config.max_freq,
             width_factor=width_factor
         )
-        # Calculate acf for each segment
-        acf = [abs_acf(seg) for seg in power_windows]
+        # Calculate acf for each segment (batched FFTs, same normalization as abs_acf)
+        acf = ragged_fft_acf(power_windows, normalization="sqrt")
     else:
         raise ValueError(f"Unknown sliding window configuration style: '{sliding_window_flag}'")
     end = t.time()
@@ -85,13 +86,79 @@ def calculate_two_dim_ACF(frequency : NDArray, power : NDArray, acf_config : ACF
 
     return acf, freq_windows
 
+def calculate_linear_two_dim_ACF(frequency : NDArray, power : NDArray, acf_config : ACFConfig,
+                                 keep_map : bool = True, memmap_file : Optional[str] = None,
+                                 nyquist : Optional[float] = None):
+    """
+    2D ACF for the linear sliding window, computed in batches of windows so that the
+    working memory stays below acf_config.max_memory_mb.
+    Every batch is collapsed right away (collapse_segments), so the full 2D ACF map
+    is only stored if keep_map (needed for plotting), as float32 in memory or
+    in memmap_file (.npy) if given.
+
+    Input:
+        frequency :: list of frequencies in muHz
+        power :: power normalized to relative power
+        acf_config :: ACF configuration (max_memory_mb)
+        keep_map :: store the full 2D ACF map
+        memmap_file :: .npy file the 2D ACF map is written to (memory-mapped) instead of memory
+        nyquist :: Nyquist frequency in muHz, sets the cadence-dependent windows (defaults to the highest frequency)
+
+    Output:
+        acf :: 2D ACF map (float32, None if not keep_map)
+        collapsed :: collapsed 2D ACF (mean of each segment, as collapse_segment)
+        freq_windows :: frequency windows (views)
+    """
+    nyquist = np.max(frequency) if nyquist is None else nyquist
+    freq_windows, power_windows = linear_sliding_window(
+        frequency=frequency,
+        power=power,
+        nyquist=nyquist
+    )
+    n_windows, n_points = power_windows.shape
+
+    # Working memory per window: centered copy, spectrum, power and inverse transform
+    nfft = 1 << (2 * n_points - 1).bit_length()
+    bytes_per_window = 8 * (2 * n_points + 3 * nfft)
+    batch_size = max(1, int(acf_config.max_memory_mb * 1024**2 // bytes_per_window))
+
+    acf = None
+    if keep_map:
+        if memmap_file is not None:
+            acf = np.lib.format.open_memmap(
+                memmap_file, mode="w+", dtype=np.float32, shape=(n_windows, n_points)
+            )
+        else:
+            acf = np.empty((n_windows, n_points), dtype=np.float32)
+    collapsed = np.empty(n_windows)
+
+    for i in range(0, n_windows, batch_size):
+        batch = power_windows[i:i + batch_size]
+        # Calculate acf for each segment
+        if nyquist > 300:
+            # Long cadence data
+            acf_batch = batch_fft_acf(batch)
+        else:
+            # Short cadence data
+            acf_batch = np.array(ragged_fft_acf(batch, normalization="max"))
+
+        collapsed[i:i + batch_size] = collapse_segments(acf_batch)
+        if keep_map:
+            acf[i:i + batch_size] = acf_batch
+
+    if isinstance(acf, np.memmap):
+        acf.flush()
+
+    return acf, collapsed, freq_windows
+
 def binning_parameters(frequency : NDArray, overlap_scale : float = None, min_num_points : int = None, 
-                       min_freq : float = None, width_factor : float = None):
+                       min_freq : float = None, width_factor : float = None, nyquist : float = None):
     """
         Sliding window parameters for log_numax sliding window (Viani+ 2019).
         This parameters have been determined by trial-and-error.
+        The cadence is set by the Nyquist frequency (defaults to the highest frequency).
     """
-    max_freq = np.max(frequency)
+    max_freq = np.max(frequency) if nyquist is None else nyquist
     if max_freq > 300:
         # Short cadence data
         if max_freq > 5000:
@@ -121,15 +188,13 @@ def log_sliding_window(frequency : NDArray, power : NDArray, overlap_scale : flo
     # Lists we append results too
     freq_windows = []
     power_windows = []
-    for bin_center, bin_width in zip(bin_centers, bin_widths):
-        # Overlap controlled by overlap_scale, here we define mask
-        mask = (frequency >= bin_center - bin_width / overlap_scale) & \
-                (frequency <= bin_center + bin_width / overlap_scale)
-        frequency_window = frequency[mask]
-        power_window = power[mask]
-        if len(power_window) > 1:
-            freq_windows.append(frequency_window)
-            power_windows.append(power_window)
+    # Overlap controlled by overlap_scale, windows are contiguous ranges (views) of the sorted frequency array
+    starts = np.searchsorted(frequency, bin_centers - bin_widths / overlap_scale, side="left")
+    stops = np.searchsorted(frequency, bin_centers + bin_widths / overlap_scale, side="right")
+    for start, stop in zip(starts, stops):
+        if stop - start > 1:
+            freq_windows.append(frequency[start:stop])
+            power_windows.append(power[start:stop])
     return freq_windows, power_windows
 
 def bin_centers_and_widths(frequency : NDArray):
@@ -181,11 +246,11 @@ def bin_centers_and_widths(frequency : NDArray):
         )
     return bin_centers, bin_widths
 
-def linear_sliding_window(frequency : NDArray, power : NDArray):
-    """Linear sliding window (Viani+ 2019)"""
+def linear_sliding_window(frequency : NDArray, power : NDArray, nyquist : Optional[float] = None):
+    """Linear sliding window (Viani+ 2019), window sizes set by the Nyquist frequency (defaults to the highest frequency)"""
     df = np.mean(np.diff(frequency))
 
-    if np.max(frequency) > 300:
+    if (np.max(frequency) if nyquist is None else nyquist) > 300:
         window_size_muHz = 250  # window width
         overlap_muHz = 249  # overlap
     else:
@@ -197,7 +262,7 @@ def linear_sliding_window(frequency : NDArray, power : NDArray):
     if step <= 0:
         step = 10  # failsafe
     freq_windows = sliding_window_view(frequency, window_shape=window_size)[::step]
-    power_windows = sliding_window_view(power, window_shape=window_size)[::step].copy()
+    power_windows = sliding_window_view(power, window_shape=window_size)[::step]
     return freq_windows, power_windows
 
 def other_binning(frequency : NDArray, power : NDArray, 
@@ -217,18 +282,42 @@ def other_binning(frequency : NDArray, power : NDArray,
             min_freq        : minimum frequency (microHz) for first bin center.
 
         The function "binning_parameters" returns overlap_scale, min_num_points, min_freq.
+
+        Frequency must be sorted. Bins are returned as views into frequency and power,
+        so routines using them must not modify them in place.
     """
-    # Define fail-safe width
-    df = np.mean(np.diff(frequency))
+    starts, stops = other_binning_indices(
+        frequency=frequency,
+        overlap_scale=overlap_scale,
+        min_num_points=min_num_points,
+        min_freq=min_freq,
+        max_freq=max_freq,
+        width_factor=width_factor
+    )
+
+    # Frequency and power of each bin as views (no copies of overlapping bins)
+    fs = [frequency[i:j] for i, j in zip(starts, stops)]
+    ps = [power[i:j] for i, j in zip(starts, stops)]
+
+    return fs, ps
+
+def other_binning_indices(frequency : NDArray, 
+                          overlap_scale : float = 2, min_num_points : int = 200, 
+                          min_freq : float = 100, max_freq : float = None, width_factor : float = 1):
+    """
+        Bins of the other_binning sliding window as (start, stop) index pairs into the sorted frequency array,
+        i.e. bin k holds frequency[starts[k]:stops[k]] (the closed interval center +/- width / 2).
+        Empty bins are left out.
+    """
+    # Define fail-safe width (median resolution, the PSD may skip a frequency range, see DataProcessing.frequency_grid)
+    df = np.median(np.diff(frequency))
     width_floor = min_num_points * df
 
-    # Define initial bin center and initial width
+    # Define initial bin center
     init_bin_center = np.max([frequency[0], min_freq])
     bin_centers = [init_bin_center]
-    init_width = np.max([width_factor * 0.267 * bin_centers[0] ** 0.764, width_floor])
-    bin_widths = [init_width]
 
-    # While loop generating bins
+    # While loop generating bin centers
     if max_freq is None:
         max_freq = frequency[-1]
 
@@ -237,42 +326,16 @@ def other_binning(frequency : NDArray, power : NDArray,
         next_center = bin_centers[-1] + (width_factor * 0.267 * bin_centers[-1] ** 0.764) / overlap_scale
         bin_centers.append(next_center)
 
-        # Define next bin width and append
-        width = np.max([width_factor * 0.267 * next_center**0.764, width_floor])
-        bin_widths.append(width)
-
-    # Appending frequency and power values of each bin
-    fs = []
-    ps = []
-    for center, width in zip(bin_centers, bin_widths):
-        f, p = other_binning_freqs_power(center, width, frequency, power)
-        fs.append(f)
-        ps.append(p)
-
-    return fs, ps
-
-def other_binning_freqs_power(center : float, width : float, frequency : NDArray, power : NDArray):
-    """
-    Grab frequency and power values in bins defined with other_binning function.
-
-    Input:
-        center :: center of frequency bin
-        width :: width of frequency bin
-        frequency :: list of frequencies in muHz
-        power :: PSD
-
-    Return:
-        frequency and power of bin
-    """
-    lower = center - width / 2
-    upper = center + width / 2
-    index_bin = np.where((frequency >= lower) & (frequency <= upper))[0]
+    # Bin widths (at least width_floor)
+    bin_centers = np.asarray(bin_centers, dtype=float)
+    bin_widths = np.maximum(width_factor * 0.267 * bin_centers**0.764, width_floor)
 
-    # Is bin length zero?
-    if len(index_bin) == 0:
-        return np.nan
+    # Bins are contiguous ranges of the sorted frequency array
+    starts = np.searchsorted(frequency, bin_centers - bin_widths / 2, side="left")
+    stops = np.searchsorted(frequency, bin_centers + bin_widths / 2, side="right")
+    non_empty = stops > starts
 
-    return frequency[index_bin], power[index_bin]
+    return starts[non_empty], stops[non_empty]
 
 def get_bins(frequency : NDArray, min_points : float = 20):
     """Use frequency array to get the optimal geometric windows"""
@@ -7,6 +7,8 @@ from scipy.optimize import curve_fit
 from scipy.optimize import OptimizeWarning
 from scipy.interpolate import interp1d
 import matplotlib.pyplot as plt
+from .cov_engine import viani_bin_centers, bin_statistics
+from ..smoothing import window_nanmean
 
 def evaluate_faps(n_bins):
     """
@@ -85,7 +87,38 @@ def calculate_CoV(center, width, frequency, power):
     CoV = std / mean
     return [CoV, bin_size]
 
-def bin_spectrum(frequency=None, power=None, overlap_factor=6, min_freq=1.0):
+def calculate_CoVs(centers, widths, frequency, power):
+    """
+    Calculate CoV and bin size of all bins at once (same bins and fail safes as calculate_CoV).
+
+    Input:
+        centers :: centers of frequency bins
+        widths :: widths of frequency bins
+        frequency :: list of frequencies in muHz (sorted)
+        power :: PSD
+
+    Return:
+        [CoVs, bin_sizes] :: Coefficient of Variation and number of points per bin
+    """
+    centers = np.asarray(centers, dtype=float)
+    widths = np.asarray(widths, dtype=float)
+    n_total, n_finite, mean, std = bin_statistics(
+        frequency, power, centers - widths / 2, centers + widths / 2
+    )
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        CoVs = std / mean
+
+    # Fail safes: empty bins, less than two finite values, zero or non-finite mean or SDV
+    failed = (
+        (n_total == 0) | (n_finite <= 1)
+        | ~np.isfinite(mean) | (mean == 0) | ~np.isfinite(std)
+    )
+    CoVs[failed] = 1.
+    bin_sizes = np.where(failed, 0, n_total)
+    return [CoVs, bin_sizes]
+
+def bin_spectrum(frequency=None, power=None, overlap_factor=6, min_freq=1.0, max_freq=None):
     """
     Binning of spectrum based on formalism by Viani et al. (2018).
     Spectrum is binned in segments with size 0.267 * numax^0.764 (Yu et al. 2018), where numax is the central frequency of the bin.
@@ -97,30 +130,22 @@ def bin_spectrum(frequency=None, power=None, overlap_factor=6, min_freq=1.0):
         overlap_factor :: factor for sliding window
             Viani et al. (2018) had overlap_factor=6,
             but seems that higher values can improve without too much computational cost.
+        max_freq :: bins are added until a center reaches max_freq (defaults to the highest frequency)
 
     Return:
         binned_frequency
         binned_power
         mean_power
     """
+    if max_freq is None:
+        max_freq = frequency[-1]
 
     # Create the bin centers using a width proportional to numax, with numax assumed as the
     # center of the bin
-    bin_centers = [min_freq]  # starting point in muHz (1 muHz in Viani)
-    bin_widths = [0.267 * bin_centers[0] ** 0.764]
-    while bin_centers[-1] < frequency[-1]:
-        next_center = bin_centers[-1] + (0.267 * bin_centers[-1] ** 0.764) / overlap_factor
-        bin_centers.append(next_center)
-        width = 0.267 * next_center**0.764
-        bin_widths.append(width)
+    bin_centers, bin_widths = viani_bin_centers(min_freq, max_freq, overlap_factor)
 
     # Use the bin centers and widths to bin the spectrum
-    CoVs = []
-    bin_sizes = []
-    for center, width in zip(bin_centers, bin_widths):
-        CoV = calculate_CoV(center, width, frequency, power)
-        CoVs.append(CoV[0])
-        bin_sizes.append(CoV[1])
+    CoVs, bin_sizes = calculate_CoVs(bin_centers, bin_widths, frequency, power)
 
     # Regularize the data
     CoVs = np.asarray(CoVs)
@@ -148,12 +173,15 @@ def smooth_CoV_values(bin_centers, CoVs):
         Outputs:
             smoothed_CoVs   : smoothed CoV values
     """
-    smoothed_CoVs = [
-        smoothing_func(center, bin_centers, CoVs, 1) for center in bin_centers
-    ]
+    # Windowed mean around every bin center (as smoothing_func, for all centers at once)
+    bin_centers = np.asarray(bin_centers, dtype=float)
+    width = 0.66 * bin_centers**0.88
+    smoothed_CoVs = window_nanmean(
+        bin_centers, CoVs, bin_centers - width / 2, bin_centers + width / 2
+    )
 
     # Return smoothed CoVs
-    return np.asarray(smoothed_CoVs)
+    return smoothed_CoVs
 
 
 def smoothing_func(center, bin_centers, CoVs, smoothing_width_factor):
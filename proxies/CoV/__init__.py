@@ -4,14 +4,19 @@ Functions for Coefficients of Variation method
 
 from .calculate_coefficients import (
     calculate_CoV,
+    calculate_CoVs,
     bin_spectrum,
     smooth_CoV_values,
     numax_estimate_CoV,
 )
+from .cov_engine import viani_bin_centers, bin_statistics
 from .plot_CoV import plot_CoV_vs_bin_centers, plot_supNyq_spec, plot_CoV_Bell
 
 __all__ = [
     "calculate_CoV",
+    "calculate_CoVs",
+    "viani_bin_centers",
+    "bin_statistics",
     "bin_spectrum",
     "smooth_CoV_values",
     "numax_estimate_CoV",
@@ -9,6 +9,8 @@ from scipy.optimize import OptimizeWarning
 from typing import Optional
 from numpy.lib.stride_tricks import sliding_window_view
 from numpy.typing import NDArray
+from .cov_engine import viani_bin_centers, bin_statistics
+from ..smoothing import window_nanmean
 
 
 def calculate_CoV(center, width, frequency, power):
@@ -66,8 +68,39 @@ def calculate_CoV(center, width, frequency, power):
 
 
 
+def calculate_CoVs(centers, widths, frequency, power):
+    """
+    Calculate CoV of all bins at once (same bins and fail safes as calculate_CoV).
+
+    Input:
+        centers :: centers of frequency bins
+        widths :: widths of frequency bins
+        frequency :: list of frequencies in muHz (sorted)
+        power :: PSD
+
+    Return:
+        CoVs :: Coefficient of Variation per bin
+    """
+    centers = np.asarray(centers, dtype=float)
+    widths = np.asarray(widths, dtype=float)
+    n_total, n_finite, mean, std = bin_statistics(
+        frequency, power, centers - widths / 2, centers + widths / 2
+    )
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        CoVs = std / mean
+
+    # Fail safes (in reverse order of calculate_CoV, so the first applicable one wins)
+    CoVs[~np.isfinite(std)] = np.nan
+    CoVs[~np.isfinite(mean) | (mean == 0)] = np.nan
+    CoVs[n_finite <= 1] = 1.
+    CoVs[n_total == 0] = 1.
+    return CoVs
+
+
 def bin_spectrum(frequency=None, power=None, min_freq : Optional[float] = None, 
                  overlap_factor : Optional[float] = None, use_linear_bins : Optional[bool] = False,
+                 max_freq : Optional[float] = None, nyquist : Optional[float] = None,
     ):
     """
     Binning of spectrum based on formalism by Viani et al. (2018).
@@ -81,6 +114,8 @@ def bin_spectrum(frequency=None, power=None, min_freq : Optional[float] = None,
         overlap_factor :: factor for sliding window
             Viani et al. (2018) had overlap_factor=6,
             but seems that higher values can improve without too much computational cost.
+        max_freq :: bins are added until a center reaches max_freq (defaults to the highest frequency)
+        nyquist :: Nyquist frequency, sets the linear bin sizes (defaults to the highest frequency)
 
     Return:
         binned_frequency
@@ -91,7 +126,8 @@ def bin_spectrum(frequency=None, power=None, min_freq : Optional[float] = None,
     if use_linear_bins:
         freq_windows, power_windows = linear_binning(
             frequency=frequency,
-            power=power
+            power=power,
+            nyquist=nyquist
         )
         stds = np.nanstd(power_windows, axis=1, ddof=1)
         means = np.nanmean(power_windows, axis=1)
@@ -106,20 +142,12 @@ def bin_spectrum(frequency=None, power=None, min_freq : Optional[float] = None,
     if overlap_factor is None:
         overlap_factor = 6.0
 
-    # In this while-loop we'll create the bin centers
-    bin_centers = [min_freq]  # starting point is 0.1 muHz (1 muHz in Viani)
-    bin_widths = [0.267 * bin_centers[0] ** 0.764]
-    while bin_centers[-1] < frequency[-1]:
-        next_center = bin_centers[-1] + (0.267 * bin_centers[-1] ** 0.764) / overlap_factor
-        bin_centers.append(next_center)
-        width = 0.267 * next_center**0.764
-        bin_widths.append(width)
-
-    # Well use the bin centers and widths to bin the spectrum
-    CoVs = [
-        calculate_CoV(center, width, frequency, power)
-        for center, width in zip(bin_centers, bin_widths)
-    ]
+    if max_freq is None:
+        max_freq = frequency[-1]
+
+    # Bin centers and widths, then CoV of all bins at once
+    bin_centers, bin_widths = viani_bin_centers(min_freq, max_freq, overlap_factor)
+    CoVs = calculate_CoVs(bin_centers, bin_widths, frequency, power)
 
     # Safe data
     bin_centers = np.asarray(bin_centers, dtype=float)
@@ -147,12 +175,15 @@ def smooth_CoV_values(bin_centers, CoVs, smoothing_width_factor : Optional[float
     if smoothing_width_factor is None:
         smoothing_width_factor = 1.0
 
-    smoothed_CoVs = [
-        smoothing_func(center, bin_centers, CoVs, smoothing_width_factor) for center in bin_centers
-    ]
+    # Windowed mean around every bin center (as smoothing_func, for all centers at once)
+    bin_centers = np.asarray(bin_centers, dtype=float)
+    width = smoothing_width_factor * 0.66 * bin_centers**0.88
+    smoothed_CoVs = window_nanmean(
+        bin_centers, CoVs, bin_centers - width / 2, bin_centers + width / 2
+    )
 
     # Return smoothed CoVs
-    return np.asarray(smoothed_CoVs)
+    return smoothed_CoVs
 
 
 def smoothing_func(center, bin_centers, CoVs, smoothing_width_factor):
@@ -316,11 +347,11 @@ def gaussian_with_offset(x, A, sigma, mu):
     """Gaussian function"""
     return 1 + A * np.exp(-((x - mu) ** 2) / (2 * sigma**2))
 
-def linear_binning(frequency : NDArray, power : NDArray):
-    """Linear sliding window (Viani+ 2019)"""
+def linear_binning(frequency : NDArray, power : NDArray, nyquist : Optional[float] = None):
+    """Linear sliding window (Viani+ 2019), window sizes set by the Nyquist frequency (defaults to the highest frequency)"""
     df = np.mean(np.diff(frequency))
 
-    if np.max(frequency) > 300:
+    if (np.max(frequency) if nyquist is None else nyquist) > 300:
         window_size_muHz = 10  # window width
         overlap_muHz = 9  # overlap
     else:
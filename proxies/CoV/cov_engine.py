@@ -0,0 +1,113 @@
+# Prefix-sum engine for binned CoV values
+# Every bin is a contiguous range of the (sorted) frequency grid, found with searchsorted,
+# so means and standard deviations of all bins follow from cumulative sums in O(N + B)
+# (bins where the cumulative sums cancel are recomputed with two passes)
+
+import numpy as np
+from numpy.typing import NDArray
+
+# Bins whose sum of the power (or of the squared deviations) is below this fraction
+# of the prefix sum it is computed from are recomputed with two passes
+RECOMPUTE_RATIO = 1e-4
+
+def viani_bin_centers(min_freq : float, max_freq : float, overlap_factor : float):
+    """
+    Bin centers and widths following Viani et al. (2018).
+    Bins have size 0.267 * center^0.764 (Yu et al. 2018), and every next center
+    is moved 1/overlap_factor of the previous bin size.
+
+    Input:
+        min_freq        :: first bin center in muHz
+        max_freq        :: bins are added until a center reaches max_freq
+        overlap_factor  :: factor for sliding window
+
+    Return:
+        bin_centers, bin_widths
+    """
+    bin_centers = [min_freq]
+    while bin_centers[-1] < max_freq:
+        bin_centers.append(bin_centers[-1] + (0.267 * bin_centers[-1] ** 0.764) / overlap_factor)
+    bin_centers = np.asarray(bin_centers, dtype=float)
+    bin_widths = 0.267 * bin_centers ** 0.764
+    return bin_centers, bin_widths
+
+
+def bin_statistics(frequency : NDArray, power : NDArray, lower : NDArray, upper : NDArray):
+    """
+    Number of points, number of finite points, mean and ddof=1 standard deviation
+    of the finite power in the bins [lower, upper).
+
+    Input:
+        frequency   :: frequencies in muHz
+        power       :: PSD
+        lower       :: lower (closed) bin edges
+        upper       :: upper (open) bin edges
+
+    Return:
+        n_total     :: number of points in bin
+        n_finite    :: number of finite power values in bin
+        mean        :: mean of finite power in bin (nan if n_finite < 1)
+        std         :: ddof=1 standard deviation of finite power in bin (nan if n_finite < 2)
+    """
+    frequency = np.asarray(frequency)
+    power = np.asarray(power)
+    if np.any(np.diff(frequency) < 0):
+        order = np.argsort(frequency, kind="stable")
+        frequency = frequency[order]
+        power = power[order]
+
+    start = np.searchsorted(frequency, lower, side="left")
+    stop = np.searchsorted(frequency, upper, side="left")
+    stop = np.maximum(start, stop)
+
+    finite = np.isfinite(power)
+    finite_power = np.where(finite, power, 0.0)
+
+    # Sums are accumulated from the high-frequency end, where the power is smallest,
+    # so the (small) bins there do not lose precision to the large low-frequency power
+    def reverse_cumsum(x):
+        c = np.zeros(len(x) + 1)
+        c[:-1] = np.cumsum(x[::-1])[::-1]
+        return c
+
+    s0 = reverse_cumsum(finite.astype(np.float64))
+    s1 = reverse_cumsum(finite_power)
+    s2 = reverse_cumsum(finite_power ** 2)
+
+    n_total = stop - start
+    n_finite = np.rint(s0[start] - s0[stop]).astype(np.int64)
+    sum_power = s1[start] - s1[stop]
+    sum_power2 = s2[start] - s2[stop]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = sum_power / n_finite
+        var = (sum_power2 - sum_power * mean) / (n_finite - 1)
+
+    # Differences of the prefix sums (and sum_power2 - sum_power * mean) cancel when the bin's sums
+    # are small next to the prefix sums, e.g. bins below a strong low-frequency peak.
+    # Those bins are recomputed with a two-pass mean and standard deviation.
+    recompute = (n_finite >= 2) & (
+        (sum_power <= RECOMPUTE_RATIO * s1[start])
+        | ((n_finite - 1) * var <= RECOMPUTE_RATIO * s2[start])
+    )
+    if recompute.any():
+        mean[recompute], var[recompute] = _two_pass(finite_power, finite, start[recompute], stop[recompute])
+
+    mean = np.where(n_finite >= 1, mean, np.nan)
+    std = np.where(n_finite >= 2, np.sqrt(np.maximum(var, 0)), np.nan)
+    return n_total, n_finite, mean, std
+
+
+def _two_pass(finite_power : NDArray, finite : NDArray, start : NDArray, stop : NDArray):
+    """Mean and ddof=1 variance of the finite power in the (non-empty) bins [start, stop), two passes over the bins"""
+    lengths = stop - start
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    index = np.repeat(start - offsets, lengths) + np.arange(lengths.sum())
+    values = finite_power[index]
+    weights = finite[index].astype(np.float64)
+
+    n = np.add.reduceat(weights, offsets)
+    mean = np.add.reduceat(values, offsets) / n
+    deviation = (values - np.repeat(mean, lengths)) * weights
+    var = np.add.reduceat(deviation ** 2, offsets) / (n - 1)
+    return mean, var
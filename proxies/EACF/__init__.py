@@ -0,0 +1,16 @@
+"""
+Functions for EACF method
+"""
+
+from .calculate_envelope import calculate_envelope, calculate_variable_envelope, eacf_envelopes, expected_deltanu
+from .eacf_plot import plot_spec_eacf, plot_eacf_with_gaussian_fit, plot_envelope
+
+__all__ = [
+    "calculate_envelope",
+    "calculate_variable_envelope",
+    "eacf_envelopes",
+    "expected_deltanu",
+    "plot_spec_eacf",
+    "plot_eacf_with_gaussian_fit",
+    "plot_envelope",
+]
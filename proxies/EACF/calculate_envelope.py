@@ -1,72 +1,196 @@
 import numpy as np
 from numpy.typing import NDArray
-from scipy.signal import hilbert
-from scipy.ndimage import gaussian_filter, median_filter
-import matplotlib.pyplot as plt
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy import fft as sp_fft
 from scipy.signal.windows import hann
+from ..CoV.cov_engine import viani_bin_centers
+
+# The envelope is evaluated around the lag 2 / Δν (Mosser & Appourchaux 2009),
+# within a relative tolerance to allow for the uncertainty of the Δν-νmax relation
+LAG_TOLERANCE = 0.2
+# Lags inside the main lobe of the Fourier transform of the Hann window are excluded
+MIN_LAG_INDEX = 3
+
+
+def expected_deltanu(frequency : NDArray) -> NDArray:
+    """Expected large frequency separation (Yu et al. 2018) in muHz"""
+    return 0.267 * np.asarray(frequency, dtype=float) ** 0.764
+
+
+def eacf_envelopes(
+        frequency : NDArray,
+        power : NDArray,
+        centers : NDArray,
+        width : float
+):
+    """
+    Normalized autocorrelations and envelopes of the Hann-filtered spectrum around every center
+    (Mosser & Appourchaux 2009). All windows have the same number of points, so they are extracted
+    as rows of a strided view, tapered with one broadcast product and transformed with one batched rfft.
+
+    Input:
+        frequency   :: frequencies in muHz (evenly spaced)
+        power       :: PSD
+        centers     :: window centers in muHz
+        width       :: window width in muHz
+
+    Output:
+        lags        :: time lags in hours
+        acfs        :: normalized autocorrelations (real part), one row per center
+        envelopes   :: normalized envelopes (absolute value), one row per center
+    """
+    df = np.median(np.diff(frequency))
+    n_points = min(max(int(round(width / df)), 2), len(power))
+
+    # First index of every window, windows near the edges are shifted inside the spectrum
+    start = np.searchsorted(frequency, np.asarray(centers, dtype=float) - width / 2, side="left")
+    start = np.clip(start, 0, len(power) - n_points)
+
+    windows = sliding_window_view(power, n_points)[start] * hann(n_points)
+    ft = sp_fft.rfft(windows, axis=1, workers=-1)[:, : n_points // 2]
+
+    # Normalized by the zero lag (the mean filtered power in the window)
+    acfs = ft.real / ft.real[:, :1]
+    envelopes = np.abs(ft) / np.abs(ft[:, :1])
+
+    # Lag times in hours
+    dt = 1 / (n_points * df * 1e-6 * 3600)
+    lags = np.arange(n_points // 2) * dt
+    return lags, acfs, envelopes
+
 
 def calculate_envelope(
         frequency : NDArray,
-        power : NDArray
+        power : NDArray,
+        min_freq : float = 1.0,
+        max_freq : float = None,
+        width : float = 20.0,
+        step : float = 1.0,
+        max_memory_mb : float = 256
 ):
     """
-        Calculate envelope according to Mosser & Appourchaux 2009.
-        They recommend a Hann window for the filtered spectrum.
+    EACF as function of frequency: the largest envelope of the autocorrelation of the
+    Hann-filtered spectrum near the lag 2 / Δν expected at the window center.
+    Windows are processed in batches of at most max_memory_mb.
+
+    Input:
+        frequency       :: frequencies in muHz (evenly spaced)
+        power           :: PSD
+        min_freq        :: first window center in muHz
+        max_freq        :: last window center in muHz (defaults to the highest frequency)
+        width           :: window width in muHz
+        step            :: distance between window centers in muHz
+        max_memory_mb   :: memory budget of a batch of windows
+
+    Output:
+        freq_centers    :: window centers
+        eacf            :: EACF per window center (nan if 2 / Δν is not resolved by the window)
     """
-    df = np.mean(np.diff(frequency))
-    width_muHz = 20
-    hw = width_muHz / 2
-    freq_grid = np.arange(1.0, np.max(frequency) + 5, 5)
-    print(np.max(frequency))
-    acfs = []
-    envelopes = []
-    lags = []
-    for i, freq in enumerate(freq_grid):
-        # Define power and frequency arrays in window
-        indexes = np.where((frequency >= freq - hw) & (frequency <= freq + hw))[0] # indexes for window
-        p = power[indexes] # power values in window
-        f = frequency[indexes] # frequencies in window
-
-        # Define hann window filter
-        filt = hann(len(p))
-
-        # Calculate product (essentially smoothing)
-        prod = p * filt
-
-        # Calculate inverse Fourier transform and grab positive frequencies
-        ft = np.fft.ifft(prod)[:len(prod)//2]
-
-        # Calculate normalized ACF as the real values
-        # and the envelope as the absolute values
-        acf = ft.real/ft.real[0]
-        envelope = np.abs(ft)/np.abs(ft[0])
-
-        # Define lag times in hours for plotting the autocorrelation
-        tot = len(p) * df * 1e-6
-        dt = 1 / (tot * 3600)
-        lag = np.arange(len(acf)) * dt
-
-        # Append values
-        acfs.append(acf)
-        envelopes.append(envelope)
-        lags.append(lag)   
-
-        if i == 40:
-            print(dt)
-            plt.figure()
-            plt.plot(f, p/np.max(p), c='gray')
-            plt.plot(f, prod/np.max(prod), c='k')
-            plt.plot(f, filt, c='r')
-
-            plt.figure()
-            plt.plot(lag, acf, c='gray')
-            plt.plot(lag, envelope, c='k')
-            plt.plot(lag, -envelope, c='k')
-            # plt.xlim(0, 100)
-            # plt.vlines(69, ymin=-1, ymax=1, zorder=-1, colors='r', linestyles='--')
-
-    return None
-
-def gaussian(x : NDArray, A : float, sigma : float, mu : float):
-    """Gaussian function"""
-    return A * np.exp(-((x - mu) ** 2) / (2 * sigma**2))
+    if max_freq is None:
+        max_freq = np.max(frequency)
+    freq_centers = np.arange(min_freq, max_freq + step / 2, step)
+
+    # Lag index of 2 / Δν: a window of width muHz resolves lags in steps of 1 / width
+    target = 2 * width / expected_deltanu(freq_centers)
+    lower = np.maximum(np.floor((1 - LAG_TOLERANCE) * target), MIN_LAG_INDEX).astype(int)
+    upper = np.ceil((1 + LAG_TOLERANCE) * target).astype(int)
+
+    df = np.median(np.diff(frequency))
+    n_points = max(int(round(width / df)), 2)
+    batch_size = max(int(max_memory_mb * 2**20 / (3 * 8 * n_points)), 1)
+
+    eacf = np.full(len(freq_centers), np.nan)
+    for first in range(0, len(freq_centers), batch_size):
+        batch = slice(first, first + batch_size)
+        _, _, envelopes = eacf_envelopes(frequency, power, freq_centers[batch], width)
+
+        eacf[batch] = envelope_at_lags(envelopes, lower[batch], upper[batch])
+
+    return freq_centers, eacf
+
+
+def calculate_variable_envelope(
+        frequency : NDArray,
+        power : NDArray,
+        min_freq : float = 1.0,
+        max_freq : float = None,
+        width_factor : float = 6.0,
+        overlap_factor : float = 4.0,
+        max_memory_mb : float = 256
+):
+    """
+    EACF as function of frequency with windows of width_factor * Δν around every center,
+    so the window holds the same number of radial orders for giants and dwarfs, and 2 / Δν
+    is always resolved. Centers follow Viani et al. (2018), moving Δν / overlap_factor each step.
+
+    Windows are grouped in buckets of FFT lengths (1/8 octave apart), zero-padded to the length of
+    their bucket, and every bucket is tapered and transformed with batched operations, in batches
+    of at most max_memory_mb.
+
+    Input:
+        frequency       :: frequencies in muHz (evenly spaced)
+        power           :: PSD
+        min_freq        :: first window center in muHz
+        max_freq        :: last window center in muHz (defaults to the highest frequency)
+        width_factor    :: window width in units of Δν
+        overlap_factor  :: number of window centers per Δν
+        max_memory_mb   :: memory budget of a batch of windows
+
+    Output:
+        freq_centers    :: window centers
+        eacf            :: EACF per window center, in units of its white-noise level
+    """
+    if max_freq is None:
+        max_freq = np.max(frequency)
+    freq_centers, deltanu = viani_bin_centers(min_freq, max_freq, overlap_factor)
+    freq_centers, deltanu = freq_centers[:-1], deltanu[:-1]  # last center is beyond max_freq
+
+    df = np.median(np.diff(frequency))
+    n_points = np.round(width_factor * deltanu / df).astype(int)
+    n_points = np.clip(n_points, 2 * (MIN_LAG_INDEX + 1), len(power))
+    start = np.searchsorted(frequency, freq_centers - n_points * df / 2, side="left")
+    start = np.clip(start, 0, len(power) - n_points)
+
+    # FFT length of every window: the next fast length above a 1/8 octave ladder
+    ladder = np.ceil(2 ** (np.ceil(8 * np.log2(n_points)) / 8)).astype(int)
+    nffts = np.array([sp_fft.next_fast_len(int(n), real=True) for n in ladder])
+
+    # Zero-padding refines the lag grid by nfft / n_points, so 2 / Δν is at lag index 2 * nfft * df / Δν
+    target = 2 * nffts * df / deltanu
+    lower = np.maximum(np.floor((1 - LAG_TOLERANCE) * target), np.ceil(MIN_LAG_INDEX * nffts / n_points)).astype(int)
+    upper = np.ceil((1 + LAG_TOLERANCE) * target).astype(int)
+
+    padded = np.concatenate((power, np.zeros(np.max(nffts))))
+    eacf = np.full(len(freq_centers), np.nan)
+    for nfft in np.unique(nffts):
+        idx = np.flatnonzero(nffts == nfft)
+        batch_size = max(int(max_memory_mb * 2**20 / (4 * 8 * nfft)), 1)
+        lag_points = np.arange(nfft)
+
+        for first in range(0, len(idx), batch_size):
+            rows = idx[first : first + batch_size]
+            n = n_points[rows, None]
+
+            # Hann window (as scipy.signal.windows.hann) of every row, zero beyond its length
+            taper = np.where(lag_points < n, 0.5 - 0.5 * np.cos(2 * np.pi * lag_points / (n - 1)), 0.0)
+            windows = sliding_window_view(padded, nfft)[start[rows]] * taper
+
+            ft = np.abs(sp_fft.rfft(windows, axis=1, workers=-1))
+            envelopes = ft / ft[:, :1]
+            eacf[rows] = envelope_at_lags(envelopes, lower[rows], upper[rows])
+
+    # In units of the white-noise level of the envelope (sqrt(sum(w^2)) / sum(w) for a Hann window w),
+    # which is larger for the short windows at low frequency
+    eacf /= np.sqrt(1.5 / (n_points - 1))
+
+    return freq_centers, eacf
+
+
+def envelope_at_lags(envelopes : NDArray, lower : NDArray, upper : NDArray) -> NDArray:
+    """Largest envelope of every row in the lag indices [lower, upper] (nan if there are none)"""
+    lag_index = np.arange(envelopes.shape[1])
+    in_range = (lag_index >= lower[:, None]) & (lag_index <= upper[:, None])
+    resolved = in_range.any(axis=1)
+    eacf = np.full(len(envelopes), np.nan)
+    eacf[resolved] = np.max(np.where(in_range, envelopes, -np.inf), axis=1)[resolved]
+    return eacf
@@ -1,27 +1,42 @@
 import numpy as np
-import matplotlib.pyplot as plt
 from numpy.typing import NDArray
-from typing import Optional
 
-def plot(
-        frequency : NDArray,
-        power : NDArray,
-        envelope : NDArray,
-        ax : NDArray,
-        analytical_signal : Optional[NDArray] = None        
-): 
-    # Plot original spectrum
+
+def plot_spec_eacf(frequency : NDArray, power : NDArray, ax : NDArray, id : str):
+    """Plot spectrum."""
     ax.loglog(frequency, power, c="gray", label="spectrum")
-    if analytical_signal is not None:
-        # Plot analytical signal if provided
-        ax.loglog(frequency, analytical_signal, c="k", ls='-', label="analytical signal")
-    # Plot envelope
-    ax.loglog(frequency, envelope, c='k', label="envelope")
-    # Set labels
     ax.set_xlabel("frequency [μHz]")
     ax.set_ylabel("power spectral density")
-    # Set x- and y-lims
     ax.set_xlim(np.min(frequency), np.max(frequency))
-    # Legend
-    ax.legend(loc="upper left")
+    ax.text(0.02, 0.02, f"{id}", ha="left", va="bottom", transform=ax.transAxes)
+    ax.legend(loc="upper right")
+
+
+def plot_eacf_with_gaussian_fit(freq_centers : NDArray, eacf : NDArray, fit_vals : NDArray, ax : NDArray):
+    """Plot EACF vs frequency with Gaussian fit"""
+    def gaussian(x, A, sigma, mu):
+        return A * np.exp(-((x - mu) ** 2) / (2 * sigma**2))
+
+    x = np.linspace(np.min(freq_centers), np.max(freq_centers), len(freq_centers) * 10)
+    ax.set_xscale("log")
+    ax.plot(freq_centers, eacf, c="k", marker=".", label="EACF")
+    ax.plot(x, gaussian(x, *fit_vals), c="r", label="Gaussian fit")
+    ax.axvline(
+        fit_vals[2], c="b", ls="--", label=f"numax = {np.round(fit_vals[2],2)}"
+    )
+    ax.set_xlabel("frequency [μHz]")
+    ax.set_ylabel("A.U.")
+    ax.legend()
+
 
+def plot_envelope(lags : NDArray, acf : NDArray, envelope : NDArray, deltanu : float, ax : NDArray):
+    """Plot autocorrelation and envelope of one window against time lag, with the lag 2 / Δν"""
+    ax.plot(lags, acf, c="gray", label="autocorrelation")
+    ax.plot(lags, envelope, c="k", label="envelope")
+    ax.plot(lags, -envelope, c="k")
+    lag_deltanu = 2 / (deltanu * 1e-6 * 3600)
+    ax.axvline(lag_deltanu, c="r", ls="--", label="2 / Δν")
+    ax.set_xlabel("lag [hours]")
+    ax.set_ylabel("normalized autocorrelation")
+    ax.set_xlim(0, min(np.max(lags), 4 * lag_deltanu))
+    ax.legend()
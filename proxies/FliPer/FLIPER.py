@@ -36,8 +36,7 @@ A calling example is reported at the end of the code.
 from astropy.io import fits
 import numpy as np
 # from math import *
-import pandas as pd
-import joblib
+from .model_registry import load_model, feature_row
 
 
 class FLIPER:
@@ -201,34 +200,10 @@ class ML:
         """
         Estimation of logg/numax with machine learning (training given by 'ML_logg/numax_training_paper' to be dowload in GitHub).
         """
-        listing = [
-            {
-                "lnF02": self.CONVERT_TO_LOG(F02),
-                "lnF07": self.CONVERT_TO_LOG(F07),
-                "lnF7": self.CONVERT_TO_LOG(F7),
-                "lnF20": self.CONVERT_TO_LOG(F20),
-                "lnF50": self.CONVERT_TO_LOG(F50),
-                "noise": noise,
-                "cadence": cadence,
-                "mission": mission,
-            }
-        ]
-        df = pd.DataFrame(data=listing)
-        columnsTitles = [
-            "lnF02",
-            "lnF07",
-            "lnF7",
-            "lnF20",
-            "lnF50",
-            "noise",
-            "cadence",
-            "mission",
-        ]
-        df = df.reindex(columns=columnsTitles)
-        X = df.values
-        # print(df)
-
-        rf = joblib.load(path_to_training_file)
+        X = feature_row(F02, F07, F7, F20, F50, noise, cadence, mission)[None]
+
+        # Forest is loaded once per process (see model_registry)
+        rf = load_model(path_to_training_file)
         prediction = rf.predict(X)
         return prediction[0]
 
@@ -1,8 +1,8 @@
 import numpy as np
-from scipy.ndimage import median_filter
+from ..background import running_median
 
 
-def estimate_noise(pg=None, Kmag=None):
+def estimate_noise(power=None, Kmag=None):
     """
     Estimate noise for given spectrum.
     Bugnet et al. (2018) estimates noise based on Kepler magnitude.
@@ -11,36 +11,40 @@ def estimate_noise(pg=None, Kmag=None):
     and take the median as the noise level.
 
     Input:
-        pg :: power spectrum
+        power :: PSD (sorted by frequency)
 
     Output:
         noise :: noise level
     """
-    power = pg.power.value[-100:]
-    noise = np.median(power)
+    noise = np.median(np.asarray(power)[-100:])
     return noise
 
 
-def highpass_filter(pg, cutoff):
+def highpass_filter(frequency, power, cutoff, mode="exact", cache=None):
     """
     FliPer requires a power density spectrum filtered with a 20 day high pass filter,
     and also with a 80 day high pass filter
 
     Input:
-        pg :: power spectrum
+        frequency :: frequencies in muHz
+        power :: PSD
         cutoff :: cutoff in days
+        mode :: running median mode, "exact" or "approx" (see background.running_median)
+        cache :: BackgroundCache, filter is taken from (or added to) the cache, in the mode of the cache
 
     Output:
+        filter_pg :: frequency and filtered power as columns
         med_filter :: the filtered power
     """
-    freq = pg.frequency.value
-    power = pg.power.value
     ws = 1.0 / (cutoff * 24 * 3600) * 1e6
-    df = np.median(np.diff(freq))
+    df = np.median(np.diff(frequency))
     wp = int(ws / df)
     if wp % 2 == 0:
         wp += 1
     # print(len(freq), wp)
-    med_filter = median_filter(power, size=wp, mode="reflect")
-    filter_pg = np.column_stack((freq, med_filter))
+    if cache is not None:
+        med_filter = cache.get(power, wp)
+    else:
+        med_filter = running_median(power, wp, mode=mode)
+    filter_pg = np.column_stack((frequency, med_filter))
     return filter_pg, med_filter
@@ -1,7 +1,8 @@
 from .fliper_plotting import plot_spectrum
 from .FliPer_preparation import estimate_noise, highpass_filter
-from .fliper_values import Fp_20_days, Fp_80_days, calculate_FliPer_values
+from .fliper_values import Fp_20_days, Fp_80_days, Fp_error, FliPerSpectrum, calculate_FliPer_values
 from .FLIPER import DATA_PREPARATION, FLIPER, ML
+from .model_registry import FEATURE_COLUMNS, DEFAULT_MODEL_PATH, load_model, feature_row, predict_batch
 
 __all__ = [
     "plot_spectrum",
@@ -9,8 +10,15 @@ __all__ = [
     "highpass_filter",
     "Fp_20_days",
     "Fp_80_days",
+    "Fp_error",
+    "FliPerSpectrum",
     "calculate_FliPer_values",
     "DATA_PREPARATION",
     "FLIPER",
     "ML",
+    "FEATURE_COLUMNS",
+    "DEFAULT_MODEL_PATH",
+    "load_model",
+    "feature_row",
+    "predict_batch",
 ]
@@ -1,8 +1,8 @@
-from .FLIPER import DATA_PREPARATION
 import numpy as np
+from numpy.typing import NDArray
 
 
-def calculate_FliPer_values(lc, star_tab_psd_80, star_tab_psd_20, noise):
+def calculate_FliPer_values(cadence, star_tab_psd_80, star_tab_psd_20, noise):
     """
     Calculate FliPer values to be used later for numax estimate.
     FliPer values are, for a given frequency range, the averaged PSD power minus the photon noise.
@@ -10,6 +10,7 @@ def calculate_FliPer_values(lc, star_tab_psd_80, star_tab_psd_20, noise):
     We utilize routines already available in FliPer (Bugnet et al. 2018).
 
     Input:
+        cadence :: sampling time of the light curve in seconds
         Filtered PSDs (20d and 80d filter)
 
     Output:
@@ -18,10 +19,10 @@ def calculate_FliPer_values(lc, star_tab_psd_80, star_tab_psd_20, noise):
         Fp7 :: Fp from 7 muHz
         Fp20 :: Fp from 20 muHz
         Fp50 :: Fp from 50 muHz
+        cadence :: sampling time in seconds
     """
     fliper_20 = Fp_20_days(star_tab_psd_20, noise)
     fliper_80 = Fp_80_days(star_tab_psd_80, noise)
-    cadence = np.mean(np.diff(lc.time.value * 86400))
     return (
         fliper_80["Fp02"],
         fliper_20["Fp07"],
@@ -32,23 +33,80 @@ def calculate_FliPer_values(lc, star_tab_psd_80, star_tab_psd_20, noise):
     )
 
 
+class FliPerSpectrum:
+    """
+    FliPer values of one (filtered) PSD for any set of frequency thresholds.
+
+    The spectrum is corrected for apodization (as DATA_PREPARATION.APODIZATION) and one cumulative sum
+    is built from the high-frequency end, so the mean power above any threshold takes O(1),
+    and the error (Fp_error) follows from sums of 50-bin blocks read from the same cumulative sum.
+
+    Input:
+        frequency   :: frequencies in muHz
+        power       :: PSD
+    """
+
+    # Rebin of the spectra to have normal distribution on the uncertainties (see Fp_error)
+    n_rebin = 50
+
+    def __init__(self, frequency : NDArray, power : NDArray):
+        frequency = np.asarray(frequency, dtype=np.float64)
+        power = np.asarray(power, dtype=np.float64)
+        if np.any(np.diff(frequency) < 0):
+            order = np.argsort(frequency, kind="stable")
+            frequency = frequency[order]
+            power = power[order]
+
+        # Correct for apodization
+        nq = np.max(frequency)
+        nu = np.sin(np.pi / 2.0 * frequency / nq) / (np.pi / 2.0 * frequency / nq)
+        self.frequency = frequency
+        self.power = power / nu**2
+
+        # tail[i] = sum(power[i:]), summed from the high-frequency end where the power is smallest
+        self._tail = np.zeros(len(power) + 1, dtype=np.longdouble)
+        self._tail[:-1] = np.cumsum(self.power[::-1], dtype=np.longdouble)[::-1]
+
+    def values(self, thresholds, noise : float = 0.0):
+        """
+        FliPer values <PSD> - noise above every threshold, and their errors.
+
+        Input:
+            thresholds  :: lower frequency limits in muHz
+            noise       :: noise level subtracted from the mean power
+
+        Output:
+            Fp          :: FliPer value per threshold (nan if no power above the threshold)
+            sig_Fp      :: error per threshold (as Fp_error)
+        """
+        thresholds = np.atleast_1d(np.asarray(thresholds, dtype=float))
+        start = np.searchsorted(self.frequency, thresholds, side="left")
+        n_points = len(self.power) - start
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            Fp = np.where(n_points > 0, (self._tail[start] / n_points).astype(np.float64), np.nan) - noise
+
+        sig_Fp = np.full(len(thresholds), np.nan)
+        for k, (i, n) in enumerate(zip(start, n_points)):
+            if n == 0:
+                continue
+            # Sums of the 50-bin blocks from the threshold on (the incomplete last block is left out)
+            edges = i + self.n_rebin * np.arange(n // self.n_rebin + 1)
+            Ptmp = np.asarray(self._tail[edges[:-1]] - self._tail[edges[1:]], dtype=np.float64)
+            sig_Fp[k] = _error_from_blocks(Ptmp, n, self.n_rebin)
+        return Fp, sig_Fp
+
+
 def Fp_20_days(star_tab_psd_20, noise):
     """
     Compute FliPer value from 0.7, 7, 20, and 50 muHz to Nyquist with 20 days filtered data.
     Stolen from Bugnet et al. (2018)!
     We do not use Kepler or TESS mags to estimate noise, instead we use the last 100 bins of the PSD.
     """
-    star_tab_psd_20 = DATA_PREPARATION().APODIZATION(star_tab_psd_20)
-    end_20 = np.amax(DATA_PREPARATION().GET_ARRAY(star_tab_psd_20)[0] * 1e6)
-    # noise           =   DATA_PREPARATION().MAG_COR_KEP(star_tab_psd_20, kepmag)
-    Fp07 = DATA_PREPARATION().REGION(star_tab_psd_20, 0.7, end_20) - noise
-    Fp7 = DATA_PREPARATION().REGION(star_tab_psd_20, 7, end_20) - noise
-    Fp20 = DATA_PREPARATION().REGION(star_tab_psd_20, 20, end_20) - noise
-    Fp50 = DATA_PREPARATION().REGION(star_tab_psd_20, 50, end_20) - noise
-    sig_Fp07 = Fp_error(DATA_PREPARATION().CUT_SPECTRA(star_tab_psd_20, 0.7, end_20))
-    sig_Fp7 = Fp_error(DATA_PREPARATION().CUT_SPECTRA(star_tab_psd_20, 7, end_20))
-    sig_Fp20 = Fp_error(DATA_PREPARATION().CUT_SPECTRA(star_tab_psd_20, 20, end_20))
-    sig_Fp50 = Fp_error(DATA_PREPARATION().CUT_SPECTRA(star_tab_psd_20, 50, end_20))
+    spectrum = FliPerSpectrum(star_tab_psd_20[:, 0], star_tab_psd_20[:, 1])
+    (Fp07, Fp7, Fp20, Fp50), (sig_Fp07, sig_Fp7, sig_Fp20, sig_Fp50) = spectrum.values(
+        [0.7, 7, 20, 50], noise
+    )
 
     return {
         "Fp07": Fp07,
@@ -63,11 +121,9 @@ def Fp_20_days(star_tab_psd_20, noise):
 
 
 def Fp_80_days(star_tab_psd_80, noise):
-    star_tab_psd_80 = DATA_PREPARATION().APODIZATION(star_tab_psd_80)
-    end_80 = np.amax(DATA_PREPARATION().GET_ARRAY(star_tab_psd_80)[0] * 1e6)
-
-    Fp02 = DATA_PREPARATION().REGION(star_tab_psd_80, 0.2, end_80) - noise
-    sig_Fp02 = Fp_error(DATA_PREPARATION().CUT_SPECTRA(star_tab_psd_80, 0.2, end_80))
+    """Compute FliPer value from 0.2 muHz to Nyquist with 80 days filtered data."""
+    spectrum = FliPerSpectrum(star_tab_psd_80[:, 0], star_tab_psd_80[:, 1])
+    (Fp02,), (sig_Fp02,) = spectrum.values([0.2], noise)
 
     return {"Fp02": Fp02, "sig_Fp02": sig_Fp02}
 
@@ -77,12 +133,16 @@ def Fp_error(power):  # GUY
     Compute errors on FliPer values du to noise.
     """
     n = 50  #   rebin of the spectra to have normal distribution on the uncertainties
-    Ptmp = np.array(
-        [np.sum(power[i * n : (i + 1) * n]) for i in range(int(len(power) / n))]
-    )  #   power on the rebin
-    Ptot = np.sum(Ptmp)  #   total power
+    power = np.asarray(power, dtype=np.float64)
+    n_blocks = len(power) // n
+    Ptmp = power[: n_blocks * n].reshape(n_blocks, n).sum(axis=1)  #   power on the rebin
+    return _error_from_blocks(Ptmp, len(power), n)
+
+
+def _error_from_blocks(Ptmp, n_points, n):
+    """Error on the FliPer value from the block sums Ptmp of n bins (n_points bins in total)"""
     sig_Ptot = (
         np.sum((2 * Ptmp / 2 / n * n**0.5) ** 2)
     ) ** 0.5  #   uncertainties on total power
-    error_Fp = ((sig_Ptot / len(power)) ** 2) ** 0.5
+    error_Fp = ((sig_Ptot / n_points) ** 2) ** 0.5
     return error_Fp
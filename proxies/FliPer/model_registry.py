@@ -0,0 +1,68 @@
+"""
+FliPer random forests, loaded once per process and shared by all stars.
+
+Unpickling the forest takes much longer than predicting, so models are kept in a
+registry keyed by file path, and predictions for many stars are made with one
+vectorized rf.predict (e.g. for a whole catalog).
+"""
+
+import os
+import threading
+import numpy as np
+from numpy.typing import NDArray
+
+# Columns of a feature row, in the order the forest was trained on
+FEATURE_COLUMNS = ("lnF02", "lnF07", "lnF7", "lnF20", "lnF50", "noise", "cadence", "mission")
+
+DEFAULT_MODEL_PATH = "numax_proxies/proxies/FliPer/FliPer_model.pkl"
+
+_MODELS = {}
+_LOCK = threading.Lock()
+
+
+def load_model(path : str = DEFAULT_MODEL_PATH):
+    """Random forest stored at path, unpickled on first use in this process"""
+    key = os.path.abspath(path)
+    with _LOCK:
+        if key not in _MODELS:
+            # sklearn/joblib are only needed when FliPer is used
+            import joblib
+
+            _MODELS[key] = joblib.load(path)
+        return _MODELS[key]
+
+
+def feature_row(F02 : float, F07 : float, F7 : float, F20 : float, F50 : float,
+                noise : float, cadence : float, mission : int) -> NDArray:
+    """Feature row of one star from its FliPer values (non-positive values give nan, as ML.CONVERT_TO_LOG)"""
+    fliper = np.array([F02, F07, F7, F20, F50], dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        log_fliper = np.where(fliper > 0, np.log10(fliper), np.nan)
+    return np.concatenate((log_fliper, [noise, cadence, mission]))
+
+
+def predict_batch(features : NDArray, path : str = DEFAULT_MODEL_PATH) -> NDArray:
+    """
+    Numax of many stars with one prediction of the random forest.
+
+    Input:
+        features    :: array of feature rows (see FEATURE_COLUMNS and feature_row), shape (n_stars, 8)
+        path        :: path to the trained random forest
+
+    Output:
+        numax       :: numax in muHz per star, nan for rows with non-finite features
+                        or a non-positive log numax prediction
+    """
+    features = np.atleast_2d(np.asarray(features, dtype=float))
+    if features.shape[1] != len(FEATURE_COLUMNS):
+        raise ValueError(f"Feature rows need {len(FEATURE_COLUMNS)} columns {FEATURE_COLUMNS}, got {features.shape[1]}")
+
+    numax = np.full(len(features), np.nan)
+    valid = np.all(np.isfinite(features), axis=1)
+    if not np.any(valid):
+        return numax
+
+    prediction = np.asarray(load_model(path).predict(features[valid]), dtype=float)
+    good = np.isfinite(prediction) & (prediction > 0)
+    numax[np.flatnonzero(valid)[good]] = 10 ** prediction[good]
+    return numax
@@ -4,20 +4,26 @@ Functions for scaling relations method
 
 from .query import (
     query_gaia, 
+    query_gaia_bulk,
     get_query, 
     return_dict
 )
+from .gaia_cache import GaiaCache
 from .scaling_relations import (
     numax_scaling_relations,
+    vectorized_scaling_relations,
     make_uarray,
     compute_numaxes,
 )
 
 __all__ = [
     "query_gaia",
+    "query_gaia_bulk",
     "get_query",
     "numax_scaling_relations",
+    "vectorized_scaling_relations",
     "make_broadcastable_uarray",
     "compute_numaxes",
     "return_dict",
+    "GaiaCache",
 ]
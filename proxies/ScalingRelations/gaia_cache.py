@@ -0,0 +1,96 @@
+import json
+import sqlite3
+import time as t
+from dataclasses import fields
+from typing import Optional
+from uncertainties import ufloat
+from ...data_preparation.dataclasses import GaiaData
+
+
+class GaiaCache:
+    """
+    Persistent SQLite cache of SIMBAD identifier resolutions and Gaia results, keyed by target name.
+
+    Negative results (no Gaia id in SIMBAD, no row in Gaia DR3) are cached as well,
+    failed queries (time-outs, connection errors) are not.
+
+    Inputs:
+        filename    : SQLite file (created if it does not exist)
+        ttl_days    : entries older than this are ignored and queried again (None = never expire)
+        offline     : never query SIMBAD/Gaia, targets not in the cache give an empty GaiaData
+                        (entries are used regardless of their age)
+    """
+
+    def __init__(self, filename : str, ttl_days : Optional[float] = None, offline : bool = False):
+        self.filename = filename
+        self.ttl_days = ttl_days
+        self.offline = offline
+        with self._connect() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS simbad (target TEXT PRIMARY KEY, gaia_id TEXT, fetched REAL)"
+            )
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS gaia (target TEXT PRIMARY KEY, gaia_data TEXT, fetched REAL)"
+            )
+
+    def _connect(self):
+        # One connection per call, so the cache can be shared between threads and processes
+        return sqlite3.connect(self.filename, timeout=30)
+
+    def _lookup(self, table : str, target : str):
+        with self._connect() as con:
+            row = con.execute(
+                f"SELECT * FROM {table} WHERE target = ?", (target,)
+            ).fetchone()
+        if row is None:
+            return None
+        if not self.offline and self.ttl_days is not None and t.time() - row[2] > self.ttl_days * 86400:
+            return None
+        return row
+
+    def _store(self, table : str, target : str, value : Optional[str]):
+        with self._connect() as con:
+            con.execute(
+                f"INSERT OR REPLACE INTO {table} VALUES (?, ?, ?)", (target, value, t.time())
+            )
+
+    def get_simbad(self, target : str) -> tuple[bool, Optional[str]]:
+        """Return (found in cache, Gaia identifier or None)"""
+        row = self._lookup("simbad", target)
+        if row is None:
+            return False, None
+        return True, row[1]
+
+    def set_simbad(self, target : str, gaia_id : Optional[str]):
+        self._store("simbad", target, gaia_id)
+
+    def get_gaia(self, target : str) -> tuple[bool, Optional[GaiaData]]:
+        """Return (found in cache, GaiaData)"""
+        row = self._lookup("gaia", target)
+        if row is None:
+            return False, None
+        values = json.loads(row[1])
+        gaia_data = GaiaData(**{
+            name: ufloat(val, err) for name, (val, err) in values.items()
+        })
+        return True, gaia_data
+
+    def set_gaia(self, target : str, gaia_data : GaiaData):
+        values = {
+            f.name: (getattr(gaia_data, f.name).nominal_value, getattr(gaia_data, f.name).std_dev)
+            for f in fields(gaia_data)
+            if getattr(gaia_data, f.name) is not None
+        }
+        self._store("gaia", target, json.dumps(values))
+
+
+def gaia_cache_from_config(config) -> Optional[GaiaCache]:
+    """GaiaCache as specified in ProcessingConfig (None if no cache file given)"""
+    if config.gaia_cache_file is None:
+        return None
+    return GaiaCache(
+        filename=config.gaia_cache_file,
+        ttl_days=config.gaia_cache_ttl_days,
+        offline=config.gaia_offline,
+    )
@@ -1,37 +1,218 @@
 from astroquery.simbad import Simbad
 from astroquery.gaia import Gaia
 import numpy as np
+from astropy.table import Table
 from uncertainties import ufloat
 from pyvo.dal.exceptions import DALFormatError
 from requests.exceptions import ConnectionError
+import re
 import time as t
+from typing import Optional
 from ...data_preparation.dataclasses import GaiaData
-
-
-def query_gaia(id=None, ra=None, dec=None):
-    """Query Gaia database given identifier"""
-    try:
-        gaia_id = query_simbad(object_name=id) 
-    except Exception as e:
-        print('SIMBAD query failed:', e)
-        return None
+from .gaia_cache import GaiaCache
+
+
+# Astrophysical parameters (and their bounds) fetched from gaiadr3.astrophysical_parameters
+GAIA_PARAMETERS = ["teff_gspspec", "teff_gspphot", "logg_gspspec", "logg_gspphot"]
+GAIA_COLUMNS = ",\n                ".join(
+    f"dr3.{param}{suffix}" for param in GAIA_PARAMETERS for suffix in ("", "_lower", "_upper")
+)
+# Data releases whose source ids can be joined with gaiadr3.astrophysical_parameters
+# (EDR3 source ids are the DR3 ones), other releases (e.g. DR1) give an empty GaiaData
+GAIA_RELEASES = {"DR3": "DR3", "EDR3": "DR3", "DR2": "DR2"}
+
+
+def query_gaia(id=None, ra=None, dec=None, cache : Optional[GaiaCache] = None):
+    """
+    Query Gaia database given identifier.
+    With a cache, results (also empty ones) are stored and reused,
+    and in offline mode targets missing from the cache give an empty GaiaData without any query.
+    """
+    if cache is not None:
+        found, gaia_data = cache.get_gaia(id)
+        if found:
+            return gaia_data
+        if cache.offline:
+            return GaiaData()
+
+    found, gaia_id = cache.get_simbad(id) if cache is not None else (False, None)
+    if not found:
+        try:
+            gaia_id = query_simbad(object_name=id) 
+        except Exception as e:
+            print('SIMBAD query failed:', e)
+            return None
+        if cache is not None:
+            cache.set_simbad(id, gaia_id)
     
     if gaia_id is None:
+        if cache is not None:
+            cache.set_gaia(id, GaiaData())
         return None
+    if gaia_release(gaia_id) is None:
+        print(f'Gaia identifier {gaia_id} of {id} is not from DR2 or DR3')
+        if cache is not None:
+            cache.set_gaia(id, GaiaData())
+        return GaiaData()
     
     try:
         QUERY = get_query(gaia_id)
         job = Gaia.launch_job_async(QUERY)
         res = job.get_results()
         gaia_data = convert_to_GaiaData_dataclass(res)
-        return gaia_data
     except Exception as e:
         print('Gaia query failed:', e)
         return None
 
+    if cache is not None:
+        cache.set_gaia(id, gaia_data)
+    return gaia_data
+
+def query_gaia_bulk(ids, batch_size : int = 5000, cache : Optional[GaiaCache] = None) -> dict:
+    """
+    Query Gaia database for many targets at once.
+    Identifiers are resolved with one SIMBAD TAP query per batch, and the Gaia source ids
+    are uploaded as a table and joined against gaiadr3.astrophysical_parameters
+    (through gaiadr3.dr2_neighbourhood for DR2 ids), i.e. one Gaia job per batch and data release.
+    Names the bulk query does not match in SIMBAD are resolved one by one with query_simbad,
+    and targets whose Gaia id is from another data release (e.g. DR1) get an empty GaiaData.
+
+    Inputs:
+        ids         : target identifiers (as used by query_gaia)
+        batch_size  : number of targets per SIMBAD/Gaia job
+        cache       : GaiaCache, cached targets are not queried again
+
+    Output:
+        gaia_data   : dictionary target -> GaiaData (None if the query of its batch failed)
+    """
+    ids = list(dict.fromkeys(ids))
+    gaia_data = {}
+
+    # Targets already in the cache
+    todo = []
+    for id in ids:
+        found, data = cache.get_gaia(id) if cache is not None else (False, None)
+        if found:
+            gaia_data[id] = data
+        elif cache is not None and cache.offline:
+            gaia_data[id] = GaiaData()
+        else:
+            todo.append(id)
+
+    # Resolve Gaia ids with SIMBAD
+    gaia_ids = {}
+    unresolved = []
+    for id in todo:
+        found, gaia_id = cache.get_simbad(id) if cache is not None else (False, None)
+        if found:
+            gaia_ids[id] = gaia_id
+        else:
+            unresolved.append(id)
+    for batch in _batches(unresolved, batch_size):
+        try:
+            resolved = query_simbad_bulk(batch)
+        except Exception as e:
+            print('SIMBAD query failed:', e)
+            gaia_data.update({id: None for id in batch})
+            continue
+        for id in batch:
+            if id not in resolved:
+                # Identifier not matched by the bulk query (e.g. another spelling), resolve it as query_gaia does
+                try:
+                    resolved[id] = query_simbad(object_name=id)
+                except Exception as e:
+                    print('SIMBAD query failed:', e)
+                    gaia_data[id] = None
+                    continue
+            gaia_ids[id] = resolved[id]
+            if cache is not None:
+                cache.set_simbad(id, gaia_ids[id])
+
+    # No Gaia id (or one from an unsupported data release), nothing to query
+    for id, gaia_id in gaia_ids.items():
+        if gaia_id is None or gaia_release(gaia_id) is None:
+            gaia_data[id] = GaiaData()
+            if cache is not None:
+                cache.set_gaia(id, gaia_data[id])
+
+    # One job per batch and data release
+    for data_release in ("DR3", "DR2"):
+        targets = [
+            id for id, gaia_id in gaia_ids.items()
+            if gaia_id is not None and gaia_release(gaia_id) == data_release
+        ]
+        for batch in _batches(targets, batch_size):
+            upload = Table({
+                "target": batch,
+                "source_id": np.array([int(gaia_ids[id].split(" ")[2]) for id in batch], dtype=np.int64),
+            })
+            try:
+                job = Gaia.launch_job_async(
+                    get_bulk_query(data_release),
+                    upload_resource=upload,
+                    upload_table_name="targets",
+                )
+                res = job.get_results()
+            except Exception as e:
+                print('Gaia query failed:', e)
+                gaia_data.update({id: None for id in batch})
+                continue
+
+            rows = {}
+            for i, target in enumerate(res["target"]):
+                # A Gaia DR2 id can have multiple matches in DR3, just take the first one
+                rows.setdefault(str(target), i)
+            columns = [col for col in res.colnames if col != "target"]
+            for id in batch:
+                if id in rows:
+                    gaia_data[id] = convert_to_GaiaData_dataclass(res[columns][rows[id]:rows[id] + 1])
+                else:
+                    gaia_data[id] = GaiaData()
+                if cache is not None:
+                    cache.set_gaia(id, gaia_data[id])
+
+    return {id: gaia_data.get(id) for id in ids}
+
+def get_bulk_query(data_release : str):
+    """ADQL query joining uploaded table (tap_upload.targets: target, source_id) with Gaia DR3"""
+
+    if data_release == 'DR2':
+        join_string = """
+                JOIN gaiadr3.dr2_neighbourhood AS xmatch
+                    ON xmatch.dr2_source_id = targets.source_id
+                JOIN gaiadr3.astrophysical_parameters AS dr3
+                    ON dr3.source_id = xmatch.dr3_source_id
+                """
+    else:
+        join_string = """
+                JOIN gaiadr3.astrophysical_parameters AS dr3
+                    ON dr3.source_id = targets.source_id
+                """
+
+    QUERY = f"""
+            SELECT
+                targets.target,
+                dr3.source_id,
+                {GAIA_COLUMNS}
+            FROM tap_upload.targets AS targets
+            {join_string}
+            """
+
+    return QUERY
+
+def gaia_release(gaia_id) -> Optional[str]:
+    """
+    Data release to query for a SIMBAD Gaia identifier, e.g. "Gaia EDR3 123" -> "DR3"
+    (None for releases that cannot be joined with Gaia DR3 or malformed identifiers)
+    """
+    parts = str(gaia_id).split(" ")
+    if len(parts) != 3 or not parts[2].isdigit():
+        return None
+    return GAIA_RELEASES.get(parts[1])
+
 def get_query(id):
 
-    data_release = id.split(" ")[1]
+    data_release = gaia_release(id)
     gaia_id = id.split(" ")[2]
     gaia_id = int(gaia_id)
 
@@ -47,18 +228,7 @@ def get_query(id):
     QUERY = f"""
             SELECT
                 dr3.source_id,
-                dr3.teff_gspspec,
-                dr3.teff_gspspec_lower,
-                dr3.teff_gspspec_upper,
-                dr3.teff_gspphot,
-                dr3.teff_gspphot_lower,
-                dr3.teff_gspphot_upper,
-                dr3.logg_gspspec,
-                dr3.logg_gspspec_lower,
-                dr3.logg_gspspec_upper,
-                dr3.logg_gspphot,
-                dr3.logg_gspphot_lower,
-                dr3.logg_gspphot_upper
+                {GAIA_COLUMNS}
             FROM gaiadr3.astrophysical_parameters AS dr3
             {dr2_string if data_release == 'DR2' else f'WHERE dr3.source_id = {gaia_id}'}
             """
@@ -139,11 +309,66 @@ def query_simbad(object_name, retries=3, delay=1.5):
             if attempt < retries - 1:
                 t.sleep(delay)
             else:
-                return None  # SIMBAD query time-out even after retries
+                raise  # SIMBAD query time-out even after retries (not the same as no Gaia id)
+
+def simbad_identifier(object_name) -> str:
+    """
+    Identifier as stored by SIMBAD for the exact match of the TAP query,
+    e.g. "KIC1872517", "kic_1872517" or "KIC  1872517" -> "KIC 1872517"
+    """
+    name = " ".join(str(object_name).split())
+    match = re.fullmatch(r"([A-Za-z]+)[ _-]?(\d+)", name)
+    if match:
+        return f"{match.group(1).upper()} {match.group(2)}"
+    return name
+
+def query_simbad_bulk(object_names, retries=3, delay=1.5) -> dict:
+    """
+    Resolve Gaia identifiers of many objects with a single SIMBAD TAP query
+    (same choice of identifier as query_simbad). The names are matched as normalized
+    by simbad_identifier. Objects without Gaia id map to None, names not found
+    in SIMBAD (e.g. other spellings) are left out.
+    """
+    query = """
+            SELECT targets.target, gaia.id
+            FROM TAP_UPLOAD.targets AS targets
+            JOIN ident AS id_typed ON id_typed.id = targets.ident
+            LEFT OUTER JOIN ident AS gaia
+                ON gaia.oidref = id_typed.oidref AND gaia.id LIKE 'Gaia%'
+            """
+    object_names = list(object_names)
+    upload = Table({
+        "target": object_names,
+        "ident": [simbad_identifier(name) for name in object_names],
+    })
+    for attempt in range(retries):
+        try:
+            res = Simbad.query_tap(query, maxrec=100 * len(upload), targets=upload)
+            break
+        except (DALFormatError, ConnectionError, OSError):
+            if attempt < retries - 1:
+                t.sleep(delay)
+            else:
+                raise
+
+    Gaia_ids = {}
+    for target, id in zip(res["target"], res["id"]):
+        ids = Gaia_ids.setdefault(str(target), [])
+        if not np.ma.is_masked(id) and str(id):
+            ids.append(str(id))
+    return {target: sorted(ids)[-1] if ids else None for target, ids in Gaia_ids.items()}
+
+def _batches(items, batch_size):
+    for i in range(0, len(items), batch_size):
+        yield items[i:i + batch_size]
 
 def convert_to_GaiaData_dataclass(res):
     """Convert results from GaiaQuery to GaiaData dataclass"""
     gaia_data = GaiaData()
+    if len(res) == 0:
+        return gaia_data
+    # A Gaia DR2 id can have multiple matches in DR3, just take the first one
+    row = res[0]
     for col in res.colnames:
         # Skip lower/upper columns and source id
         if (
@@ -160,18 +385,18 @@ def convert_to_GaiaData_dataclass(res):
         uncertainty_col = f"{col}_uncertainty"
 
         # Check for nans
-        val = res[col]  # if col is res.colnames else np.nan
-        val_lower = res[lower_col] if lower_col in res.colnames else np.nan
-        val_upper = res[upper_col] if upper_col in res.colnames else np.nan
+        val = row[col]  # if col is res.colnames else np.nan
+        val_lower = row[lower_col] if lower_col in res.colnames else np.nan
+        val_upper = row[upper_col] if upper_col in res.colnames else np.nan
         val_uncertainty = (
-            res[uncertainty_col] if uncertainty_col in res.colnames else np.nan
+            row[uncertainty_col] if uncertainty_col in res.colnames else np.nan
         )
 
         # Calculate uncertainties/errors
         err = get_error(val, val_lower, val_upper, val_uncertainty)
 
         if np.isfinite(val) and np.isfinite(err):
-            setattr(gaia_data, col, ufloat(val, err))
+            setattr(gaia_data, col, ufloat(float(val), float(err)))
     
     return gaia_data
 
@@ -2,19 +2,19 @@ import numpy as np
 from uncertainties import unumpy as unp
 from uncertainties import ufloat
 from .query import query_gaia
+from .gaia_cache import GaiaCache
 from ...data_preparation.dataclasses import GaiaData, StarInfo
 from typing import Optional
-from itertools import product
 
 
-def compute_numaxes(star : StarInfo, gaia_data : Optional[GaiaData]) -> dict:
+def compute_numaxes(star : StarInfo, gaia_data : Optional[GaiaData], cache : Optional[GaiaCache] = None) -> dict:
     """Compute numax estimates from the scaling relations"""
 
     # Did we feed the function gaia_data?
     if gaia_data is not None:
         print("Gaia query already completed")
     else:
-        gaia_data = query_gaia(id=star.target)
+        gaia_data = query_gaia(id=star.target, cache=cache) or GaiaData()
 
     # Collect gaia data in lists
     teffs = collect(gaia_data.teff_gspspec, gaia_data.teff_gspphot)
@@ -56,66 +56,197 @@ def numax_scaling_relations(
 
     Parameters
     ----------
-    logg : float or array-like
+    logg : list of ufloat
         Surface gravity (dex)
-    teff : float or array-like
+    teff : list of ufloat
         Effective temperature (K)
-    lum : float or array-like
+    lum : list of ufloat
         Luminosity (L_sun)
-    mass : float or array-like
+    mass : list of ufloat
         Mass (M_sun)
-    radius : float or array-like
+    radius : list of ufloat
         Radius (R_sun)
 
     Returns
     -------
-    list of float or np.ndarray
-        [numax_1, numax_2, numax_3] scaling relation values in microHz
+    dict
+        numax_SR_<relation>_<i> -> ufloat, one per combination of the given values (in microHz)
     """
     numaxes = {}
 
-    # Solar reference values
-    logg_Sun = 4.44  # dex
-    teff_Sun = 5777.0  # K
-    numax_Sun = 3090.0  # microHz
-
-    # Values
-    teffs = make_uarray(teff)
-    loggs = make_uarray(logg)
-    masses = make_uarray(mass)
-    radii = make_uarray(radius)
-    lums = make_uarray(lum)
-
-    # Define lists
-    numax_1 = []
-    numax_2 = []
-    numax_3 = []
-
-    # logg–Teff relation
-    for logg, teff in product(loggs, teffs):
-        numax_1.append((numax_Sun * (10 ** (logg - logg_Sun)) / unp.sqrt(teff / teff_Sun))[0])
-
-    # Mass–Radius–Teff relation
-    for radius, mass, teff in product(radii, masses, teffs):
-        numax_2.append((numax_Sun * radius ** (-2) * mass / unp.sqrt(teff / teff_Sun))[0])
-    
-    # Mass–Luminosity–Teff relation
-    for lum, mass, teff in product(lums, masses, teffs):
-        mass_div_lum = mass / lum
-        numax_3.append((numax_Sun * mass_div_lum * (teff / teff_Sun) ** 3.5)[0])
+    # One star, one measurement source per element of the lists
+    values = {
+        name: (
+            np.array([[v.nominal_value for v in vals]], dtype=float).reshape(1, -1),
+            np.array([[v.std_dev for v in vals]], dtype=float).reshape(1, -1),
+        )
+        for name, vals in zip(
+            ("logg", "teff", "lum", "mass", "radius"),
+            (logg or [], teff or [], lum or [], mass or [], radius or []),
+        )
+    }
+    relations = vectorized_scaling_relations(**values)
 
     # Put estimates into dictionary
-    for i, val in enumerate(numax_1):
-        numaxes[f"numax_SR_logg_teff_{i}"] = val
-    
-    for i, val in enumerate(numax_2):
-        numaxes[f"numax_SR_mass_radius_teff_{i}"] = val
-
-    for i, val in enumerate(numax_3):
-        numaxes[f"numax_SR_mass_luminosity_teff_{i}"] = val
+    for relation, (numax, numax_err) in relations.items():
+        for i, (val, err) in enumerate(zip(numax[0], numax_err[0])):
+            numaxes[f"numax_SR_{relation}_{i}"] = ufloat(val, err)
 
     return numaxes
 
+# Solar reference values
+LOGG_SUN = 4.44  # dex
+TEFF_SUN = 5777.0  # K
+NUMAX_SUN = 3090.0  # microHz
+
+# Scaling relations as (parameter, exponent) pairs, numax = numax_Sun * prod((x / x_Sun) ** exponent)
+# (for logg: 10 ** (logg - logg_Sun)). Order of the parameters sets the order of the combinations.
+SCALING_RELATIONS = {
+    "logg_teff": (("logg", 1.0), ("teff", -0.5)),
+    "mass_radius_teff": (("radius", -2.0), ("mass", 1.0), ("teff", -0.5)),
+    "mass_luminosity_teff": (("lum", -1.0), ("mass", 1.0), ("teff", 3.5)),
+}
+
+def vectorized_scaling_relations(
+            logg=None,
+            teff=None,
+            lum=None,
+            mass=None,
+            radius=None,
+            n_mc : Optional[int] = None,
+            chunk_size : int = 100_000,
+            seed : Optional[int] = None,
+    ) -> dict:
+    """
+    Compute the three νmax (numax) scaling relations for many stars at once.
+
+    Every parameter is given as (values, errors), arrays of shape (n_stars,) or
+    (n_stars, n_sources) with one column per measurement source (e.g. GSP-Spec, GSP-Phot, literature).
+    Missing measurements are NaN and give NaN numax. Every combination of sources is
+    computed, in the same order as itertools.product of the sources.
+
+    Errors are propagated linearly (in log space, as uncertainties does) unless n_mc is given,
+    in which case n_mc Monte Carlo samples per star give the median and the 16th/84th percentiles.
+
+    Parameters
+    ----------
+    logg, teff, lum, mass, radius : tuple of array-like
+        (values, errors) in dex, K, L_sun, M_sun and R_sun
+    n_mc : int
+        Number of Monte Carlo samples (None = linear error propagation)
+    chunk_size : int
+        Number of stars per Monte Carlo chunk (bounds memory to chunk_size * n_combinations * n_mc)
+    seed : int
+        Seed of the Monte Carlo random generator
+
+    Returns
+    -------
+    dict
+        relation -> (numax, numax_err) arrays of shape (n_stars, n_combinations) in microHz,
+        or (numax, numax_err_lower, numax_err_upper) with Monte Carlo
+    """
+    params = {"logg": logg, "teff": teff, "lum": lum, "mass": mass, "radius": radius}
+    n_stars = max(
+        (np.atleast_1d(np.asarray(p[0])).shape[0] for p in params.values() if p is not None), default=0
+    )
+    for name, p in params.items():
+        if p is None:
+            params[name] = (np.empty((n_stars, 0)), np.empty((n_stars, 0)))
+        else:
+            values, errors = (np.asarray(a, dtype=float) for a in p)
+            params[name] = (values.reshape(n_stars, -1), errors.reshape(n_stars, -1))
+
+    relations = {}
+    rng = np.random.default_rng(seed)
+    for relation, terms in SCALING_RELATIONS.items():
+        if n_mc is None:
+            relations[relation] = _linear_relation(params, terms)
+        else:
+            chunks = [
+                _monte_carlo_relation(
+                    {name: (v[i:i + chunk_size], e[i:i + chunk_size]) for name, (v, e) in params.items()},
+                    terms, n_mc, rng,
+                )
+                for i in range(0, max(n_stars, 1), chunk_size)
+            ]
+            relations[relation] = tuple(np.concatenate(parts) for parts in zip(*chunks))
+    return relations
+
+def _log_term(name, values):
+    """ln(x / x_Sun) of a parameter"""
+    if name == "logg":
+        return (values - LOGG_SUN) * np.log(10)
+    if name == "teff":
+        return np.log(values / TEFF_SUN)
+    return np.log(values)
+
+def _relative_error(name, values, errors):
+    """Error on ln(x / x_Sun) of a parameter"""
+    if name == "logg":
+        return errors * np.log(10)
+    return errors / np.abs(values)
+
+def _combinations(arrays):
+    """Reshape (n_stars, n_sources_i, ...) arrays so they broadcast to (n_stars, n_sources_1, ..., n_sources_n, ...)"""
+    n = len(arrays)
+    return [
+        a.reshape(a.shape[:1] + (1,) * i + a.shape[1:2] + (1,) * (n - i - 1) + a.shape[2:])
+        for i, a in enumerate(arrays)
+    ]
+
+def _linear_relation(params, terms):
+    """numax and linearly propagated error for every combination of sources"""
+    n_stars = params[terms[0][0]][0].shape[0]
+    log_terms = _combinations([exponent * _log_term(name, params[name][0]) for name, exponent in terms])
+    rel_errs = _combinations([exponent * _relative_error(name, *params[name]) for name, exponent in terms])
+
+    numax = np.exp(np.log(NUMAX_SUN) + sum(log_terms))
+    numax_err = numax * np.sqrt(sum(rel_err ** 2 for rel_err in rel_errs))
+    return numax.reshape(n_stars, -1), numax_err.reshape(n_stars, -1)
+
+def _monte_carlo_relation(params, terms, n_mc, rng):
+    """numax (median) and asymmetric errors (16th/84th percentiles) from Monte Carlo samples"""
+    n_stars = params[terms[0][0]][0].shape[0]
+    log_terms = _combinations([
+        exponent * _log_term(name, rng.normal(
+            params[name][0][..., None], params[name][1][..., None],
+            size=params[name][0].shape + (n_mc,)
+        ))
+        for name, exponent in terms
+    ])
+    samples = np.exp(np.log(NUMAX_SUN) + sum(log_terms)).reshape(n_stars, -1, n_mc)
+
+    lower, numax, upper = _percentiles(samples, [16, 50, 84])
+    return numax, numax - lower, upper - numax
+
+def _percentiles(samples, q):
+    """
+    Percentiles over the last axis ignoring NaN samples, as np.nanpercentile (linear interpolation)
+    but vectorized over the rows: rows without NaN go through np.percentile, rows with NaN draws
+    (missing measurements, unphysical negative draws) are sorted with NaN last and indexed with their counts
+    """
+    shape = samples.shape[:-1]
+    samples = samples.reshape(-1, samples.shape[-1])
+    counts = np.count_nonzero(~np.isnan(samples), axis=-1)
+    result = np.full((len(q), samples.shape[0]), np.nan)
+
+    full = counts == samples.shape[-1]
+    if full.any():
+        result[:, full] = np.percentile(samples[full], q, axis=-1)
+
+    # All NaN rows (missing measurements) stay NaN
+    partial = ~full & (counts > 0)
+    if partial.any():
+        rows = np.sort(samples[partial], axis=-1)
+        index = np.asarray(q, dtype=float)[:, None] / 100 * (counts[partial] - 1)
+        below = np.floor(index).astype(int)
+        above = np.minimum(below + 1, counts[partial] - 1)
+        low = np.take_along_axis(rows, below.T, axis=-1).T
+        high = np.take_along_axis(rows, above.T, axis=-1).T
+        result[:, partial] = low + (index - below) * (high - low)
+
+    return result.reshape((len(q),) + shape)
+
 def make_uarray(vals):
     """Make lists broadcastable arrays"""
     return unp.uarray([[v.nominal_value] for v in vals], [[v.std_dev] for v in vals])
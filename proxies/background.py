@@ -0,0 +1,156 @@
+"""
+Running-median background of power spectra (ACF normalization and FliPer high-pass filters)
+
+Two modes:
+    exact   :: identical to scipy.ndimage.median_filter(power, size=window, mode="reflect").
+                Uses the O(N log w) 1D rank filter of scipy >= 1.14 when available, otherwise
+                a skiplist rolling median (pandas) on the reflected spectrum, instead of the
+                O(N w) generic scipy filter.
+    approx  :: medians of blocks of window / approx_blocks points, a running median over the
+                block medians, and linear interpolation back to the frequency grid (O(N)).
+                For chi^2 noise on a red background the median relative deviation from the exact
+                background is slightly below the scatter of the exact running median itself
+                (0.8% vs 0.9% for 12501 bins, 2.4% vs 3.1% for 1001 bins, approx_blocks = 16),
+                with up to ~7-10% (99th percentile) where the background is steep.
+                Features narrower than a block (e.g. strong single peaks) are smeared.
+
+Benchmark (1e6 bins of chi^2 noise, single core, scipy 1.17):
+    window      scipy median_filter     exact (pandas fallback)     approx
+    1001        0.11 s                  0.96 s                      0.04 s
+    12501       0.18 s                  1.45 s                      0.03 s
+Older scipy (< 1.14) has no 1D rank filter and costs O(N w), where the pandas
+fallback keeps O(N log w).
+"""
+
+import threading
+import numpy as np
+from concurrent.futures import Future
+from importlib.util import find_spec
+from typing import Literal
+from numpy.typing import NDArray
+from scipy.ndimage import median_filter
+
+# Does scipy have the fast 1D rank filter (scipy >= 1.14)?
+_FAST_SCIPY_MEDIAN = find_spec("scipy.ndimage._rank_filter_1d") is not None
+
+
+def running_median(power : NDArray, window : int, mode : Literal["exact", "approx"] = "exact",
+                   approx_blocks : int = 16) -> NDArray:
+    """
+    Running median of power with a window of window points (reflected at the edges).
+
+    Input:
+        power           :: PSD
+        window          :: window size in number of points
+        mode            :: "exact" or "approx" (see module docstring)
+        approx_blocks   :: number of blocks per window in approx mode
+
+    Output:
+        med_filter      :: running median
+    """
+    power = np.asarray(power, dtype=float)
+    window = max(int(window), 1)
+
+    if mode == "approx":
+        block = window // approx_blocks
+        if block > 1 and len(power) > 2 * block:
+            return _block_median(power, window, block)
+        mode = "exact"
+
+    if mode != "exact":
+        raise ValueError(f"Unknown background mode: '{mode}'")
+
+    if _FAST_SCIPY_MEDIAN or window >= len(power):
+        return median_filter(power, size=window, mode="reflect")
+    return _rolling_median(power, window)
+
+
+def _rolling_median(power : NDArray, window : int) -> NDArray:
+    """Skiplist rolling median, equal to median_filter(power, size=window, mode="reflect")"""
+    import pandas as pd
+
+    # scipy's "reflect" is numpy's "symmetric" (d c b a | a b c d | d c b a),
+    # and the window of point i is [i - window // 2, i + (window - 1) // 2]
+    padded = np.pad(power, (window // 2, (window - 1) // 2), mode="symmetric")
+    rolling = pd.Series(padded).rolling(window)
+    if window % 2:
+        med = rolling.median()
+    else:
+        # median_filter takes the upper of the two middle values for even windows
+        med = rolling.quantile((window // 2) / (window - 1), interpolation="nearest")
+    return med.to_numpy()[window - 1:]
+
+
+def _block_median(power : NDArray, window : int, block : int) -> NDArray:
+    """Approximate running median from a running median of block medians"""
+    n_blocks = len(power) // block
+    medians = np.median(power[:n_blocks * block].reshape(n_blocks, block), axis=1)
+    centers = np.arange(n_blocks) * block + (block - 1) / 2
+
+    # Last (partial) block
+    rest = len(power) - n_blocks * block
+    if rest > 0:
+        medians = np.append(medians, np.median(power[n_blocks * block:]))
+        centers = np.append(centers, n_blocks * block + (rest - 1) / 2)
+
+    smoothed = median_filter(medians, size=max(int(round(window / block)), 1), mode="reflect")
+    return np.interp(np.arange(len(power)), centers, smoothed)
+
+
+class BackgroundCache:
+    """
+    Running-median backgrounds of the PSDs of one star, computed once per PSD and window.
+
+    Entries are keyed by the memory of the power array (data pointer, shape, strides and dtype) and
+    the window size, so different views of the same spectrum (e.g. pg.power.value) share entries.
+    The array is kept referenced, so its memory cannot be reused while it is cached.
+    Thread-safe: when proxies running in parallel ask for the same background, one computes it
+    and the others wait for the result.
+
+    Input:
+        mode            :: running median mode, "exact" or "approx" (see running_median)
+        approx_blocks   :: number of blocks per window in approx mode
+    """
+
+    def __init__(self, mode : Literal["exact", "approx"] = "exact", approx_blocks : int = 16):
+        self.mode = mode
+        self.approx_blocks = approx_blocks
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    @staticmethod
+    def _array_key(power : NDArray) -> tuple:
+        interface = power.__array_interface__
+        return (interface["data"][0], power.shape, power.strides, power.dtype.str)
+
+    def get(self, power : NDArray, window : int) -> NDArray:
+        """Running median of power with window points (computed on first request)"""
+        power = np.asarray(power)
+        key = (self._array_key(power), int(window))
+        with self._lock:
+            entry = self._entries.get(key)
+            owner = entry is None
+            if owner:
+                entry = (power, Future())
+                self._entries[key] = entry
+
+        if owner:
+            try:
+                entry[1].set_result(
+                    running_median(power, window, mode=self.mode, approx_blocks=self.approx_blocks)
+                )
+            except Exception as e:
+                with self._lock:
+                    del self._entries[key]
+                entry[1].set_exception(e)
+        return entry[1].result()
+
+    def backgrounds(self, power : NDArray) -> dict:
+        """Backgrounds computed so far for power, as window -> running median"""
+        array_key = self._array_key(np.asarray(power))
+        with self._lock:
+            futures = [
+                (window, future) for (key, window), (_, future) in self._entries.items()
+                if key == array_key
+            ]
+        return {window: future.result() for window, future in sorted(futures, key=lambda f: f[0]) if future.done()}
@@ -1,6 +1,7 @@
 from .ACF import (
     calculate_relative_power,
     calculate_two_dim_ACF,
+    calculate_linear_two_dim_ACF,
     collapsed_acf,
     fit_gauss_to_collapsed_acf,
     plot_spec,
@@ -14,6 +15,7 @@ import numpy as np
 from numpy.typing import NDArray
 from typing import Optional, Literal
 from ..data_preparation.dataclasses import AvgPSDData, ACFConfig, ProcessingConfig
+from .background import BackgroundCache
 
 
 class NumaxFromACF:
@@ -23,16 +25,19 @@ class NumaxFromACF:
         acf_config : ACFConfig,
         config : ProcessingConfig,
         id : Optional[str] = "unknown",
-        initial_numax : Optional[float] = None
+        initial_numax : Optional[float] = None,
+        background_cache : Optional[BackgroundCache] = None
     ):
             
         """Initialization"""
         # Frequency and power
         self.frequency = avg_psd.frequency
         self.avg_psd = avg_psd.psd
+        # Nyquist frequency of the observations (cadence-dependent defaults), None: highest frequency
+        self.nyquist = avg_psd.nyquist
         
 
-        # ACF configuration parameters and global config (only needed for noise_std)
+        # ACF configuration parameters and global config (noise_std and background_mode)
         self.acf_config = acf_config
         self.config = config
 
@@ -40,23 +45,45 @@ class NumaxFromACF:
         self.id = id
         self.initial_numax = initial_numax
 
+        # Median filters shared with the other proxies of this star
+        self.background_cache = background_cache
+
     def compute(self):
         """Perform 2D ACF computations"""
         # Normalize spectrum
         self.normalized_power, self.med_filter = calculate_relative_power(
-            self.frequency, self.avg_psd
+            self.frequency, self.avg_psd, mode=self.config.background_mode, cache=self.background_cache,
+            nyquist=self.nyquist
         )
         # Calculate 2D ACF
-        self.twodim_ACF, self.freq_windows = calculate_two_dim_ACF(
-            frequency   = self.frequency, 
-            power       = self.normalized_power,
-            acf_config  = self.acf_config
-        )
+        if self.acf_config.sliding_window_style == 'linear':
+            # Streamed in batches and collapsed on the fly, full map only kept for plotting
+            memmap_file = None
+            if self.acf_config.acf_memmap_dir is not None:
+                os.makedirs(self.acf_config.acf_memmap_dir, exist_ok=True)
+                memmap_file = os.path.join(self.acf_config.acf_memmap_dir, f"{self.id}_2DACF.npy")
+            self.twodim_ACF, collapsed, self.freq_windows = calculate_linear_two_dim_ACF(
+                frequency   = self.frequency, 
+                power       = self.normalized_power,
+                acf_config  = self.acf_config,
+                keep_map    = bool(self.acf_config.plot),
+                memmap_file = memmap_file,
+                nyquist     = self.nyquist
+            )
+        else:
+            self.twodim_ACF, self.freq_windows = calculate_two_dim_ACF(
+                frequency   = self.frequency, 
+                power       = self.normalized_power,
+                acf_config  = self.acf_config,
+                nyquist     = self.nyquist
+            )
+            collapsed = None
         # Collapse 2D ACF and smooth
         self.smoothed_acf, self.unsmoothed_acf, self.freq_centers = collapsed_acf(
             acf                     = self.twodim_ACF, 
             freq_windows            = self.freq_windows, 
-            sliding_window_style    = self.acf_config.sliding_window_style
+            sliding_window_style    = self.acf_config.sliding_window_style,
+            collapsed               = collapsed
         )
         # Fit gauss to estimate numax
         self.numax, self.fit_vals = fit_gauss_to_collapsed_acf(
@@ -82,7 +109,7 @@ class NumaxFromACF:
                 ax=axs[0],
                 id=self.id,
             )
-            plot_2D_ACF_linear(self.twodim_ACF, self.frequency, ax=axs[1])
+            plot_2D_ACF_linear(self.twodim_ACF, self.frequency, ax=axs[1], nyquist=self.nyquist)
             plot_collapsed_acf_with_gaussian_fit_linear(
                 self.smoothed_acf, self.freq_centers, self.fit_vals, ax=axs[2]
             )
@@ -1,9 +1,18 @@
 # Numax estimate from EACF method (Mosser & Appourchaux 2009, I. W. Roxburg 2009)
 from ..data_preparation.dataclasses import PSDData, ProcessingConfig, EACFConfig, StarInfo
 from typing import Optional, Literal
-from .EACF.eacf_plot import plot
-from .EACF.calculate_envelope import calculate_envelope
-import matplotlib.pyplot as plt
+from .EACF import (
+    calculate_envelope,
+    calculate_variable_envelope,
+    eacf_envelopes,
+    expected_deltanu,
+    plot_spec_eacf,
+    plot_eacf_with_gaussian_fit,
+    plot_envelope
+)
+from .ACF.collapse_acf_and_fit import fit_gauss_to_collapsed_acf, normalize_0_1
+from uncertainties import ufloat
+import numpy as np
 import os
 
 class NumaxFromEACF:
@@ -14,7 +23,7 @@ class NumaxFromEACF:
             config : ProcessingConfig,
             eacf_config : EACFConfig
     ):
-        """ d
+        """
             Initialize class
         """
         self.star = star
@@ -27,7 +36,41 @@ class NumaxFromEACF:
         """
             Compute numax from EACF method.
         """
-        self.envelope = calculate_envelope(self.frequency, self.power)
+        # EACF vs frequency
+        if self.eacf_config.window_style == "variable":
+            # Window width scales with Δν, one curve from giants to dwarfs
+            self.freq_centers, self.eacf = calculate_variable_envelope(
+                frequency       = self.frequency,
+                power           = self.power,
+                min_freq        = self.eacf_config.min_freq,
+                max_freq        = self.eacf_config.max_freq,
+                width_factor    = self.eacf_config.width_factor,
+                overlap_factor  = self.eacf_config.overlap_factor,
+                max_memory_mb   = self.eacf_config.max_memory_mb
+            )
+        else:
+            self.freq_centers, self.eacf = calculate_envelope(
+                frequency       = self.frequency,
+                power           = self.power,
+                min_freq        = self.eacf_config.min_freq,
+                max_freq        = self.eacf_config.max_freq,
+                width           = self.eacf_config.window_width,
+                step            = self.eacf_config.step,
+                max_memory_mb   = self.eacf_config.max_memory_mb
+            )
+
+        # Fit gauss to the (resolved part of the) EACF to estimate numax
+        valid = np.isfinite(self.eacf)
+        if np.sum(valid) < 3:
+            self.numax, self.fit_vals = ufloat(np.nan, np.nan), [np.nan, np.nan, np.nan]
+            return self
+        self.numax, self.fit_vals = fit_gauss_to_collapsed_acf(
+            smoothed_acf            = normalize_0_1(self.eacf[valid]),
+            freq_centers            = self.freq_centers[valid],
+            initial_numax           = self.config.initial_numax,
+            max_acf_fit_iterations  = 1,
+            n_sigma_numax_acf       = 2
+        )
         return self
 
     @property
@@ -37,14 +80,25 @@ class NumaxFromEACF:
     
     def plot(self):
         """Plot EACF results"""
-        fig, ax = plt.subplots()
-        plot(
-            frequency=self.frequency,
-            power=self.power,
-            envelope=self.envelope,
-            ax=ax,
-            analytical_signal=None
+        import matplotlib.pyplot as plt
+
+        fig, axs = plt.subplots(3, 1, figsize=(6, 12))
+        plot_spec_eacf(self.frequency, self.power, ax=axs[0], id=self.star.target)
+
+        valid = np.isfinite(self.eacf)
+        plot_eacf_with_gaussian_fit(
+            self.freq_centers[valid], normalize_0_1(self.eacf[valid]), self.fit_vals, ax=axs[1]
         )
+
+        # Autocorrelation and envelope of the window at numax
+        center = self.fit_vals[2] if np.isfinite(self.fit_vals[2]) else self.freq_centers[np.nanargmax(self.eacf)]
+        if self.eacf_config.window_style == "variable":
+            width = self.eacf_config.width_factor * expected_deltanu(center)
+        else:
+            width = self.eacf_config.window_width
+        lags, acfs, envelopes = eacf_envelopes(self.frequency, self.power, [center], width)
+        plot_envelope(lags, acfs[0], envelopes[0], expected_deltanu(center), ax=axs[2])
+
         savepath = os.path.join("numax_proxies", "results", self.star.target, "figures")
         os.makedirs(savepath, exist_ok=True)
-        fig.savefig(f"{savepath}/CoVs_Bell.png", dpi=300, bbox_inches="tight")
+        fig.savefig(f"{savepath}/EACF.png", dpi=300, bbox_inches="tight")
@@ -3,45 +3,63 @@ from .FliPer import (
     highpass_filter,
     plot_spectrum,
     calculate_FliPer_values,
-    ML
+    feature_row,
+    predict_batch,
+    DEFAULT_MODEL_PATH
 )
+from ..data_preparation.dataclasses import PSDData, LightCurveData
+from typing import Optional
 import numpy as np
 
 
 class NumaxFromFliPer:
-    def __init__(self, id, gmag, lc=None, pg=None, *args, **kwargs):
+    def __init__(
+            self,
+            id : str,
+            gmag : Optional[float],
+            psd : PSDData,
+            lc : Optional[LightCurveData] = None,
+            background_mode : str = "exact",
+            background_cache = None,
+            *args, **kwargs
+    ):
+        """
+        FliPer proxy from the PSD (in muHz) and light curve (time in days) of the pipeline.
+        Without light curve (PSD read from file) the cadence follows from the Nyquist frequency.
+        """
         self._id = id or "unknown"
         self._gmag = gmag
         self._mission = 0 if "KIC" in self._id else 1  # 1 = TESS
-        if lc is not None and pg is None:
-            from numax_proxies.data_preparation import calculate_psd
-
-            pg = calculate_psd(lc)
-        self._lc = lc
-        self._pg = pg
+        self._frequency = psd.frequency
+        self._power = psd.psd
+        if lc is not None:
+            self._cadence = np.mean(np.diff(lc.time)) * 86400
+        else:
+            self._cadence = 1e6 / (2 * (psd.nyquist or np.max(self._frequency)))
 
-        self._noise = estimate_noise(
-            self._pg
-        )  # estimate noise as median power of last 100 freq bins
+        if psd.noise is not None:
+            self._noise = psd.noise
+        else:
+            self._noise = estimate_noise(
+                self._power
+            )  # estimate noise as median power of last 100 freq bins
         self._filter_pg_20d, self._filter_20d = highpass_filter(
-            self._pg, 20
+            self._frequency, self._power, 20, mode=background_mode, cache=background_cache
         )  # 20 days high pass filter
         self._filter_pg_80d, self._filter_80d = highpass_filter(
-            self._pg, 80
+            self._frequency, self._power, 80, mode=background_mode, cache=background_cache
         )  # 80 days high pass filter
-        self._PATH_TO_TRAINING_FILE_NUMAX = (
-            "numax_proxies/proxies/FliPer/FliPer_model.pkl"
-        )
+        self._PATH_TO_TRAINING_FILE_NUMAX = DEFAULT_MODEL_PATH
 
-    def compute(self, *args, **kwargs):
-        """Estimate numax from FliPer values"""
+    def features(self):
+        """Feature row of the random forest (see FliPer.FEATURE_COLUMNS), e.g. for predict_batch of many stars"""
         # Calculate FliPer values, and cadence
         self._Fp02, self._Fp07, self._Fp7, self._Fp20, self._Fp50, self._cadence = (
             calculate_FliPer_values(
-                self._lc, self._filter_pg_80d, self._filter_pg_20d, self._noise
+                self._cadence, self._filter_pg_80d, self._filter_pg_20d, self._noise
             )
         )
-        val = ML().PREDICTION(
+        return feature_row(
             self._Fp02,
             self._Fp07,
             self._Fp7,
@@ -50,19 +68,18 @@ class NumaxFromFliPer:
             self._noise,
             self._cadence,
             self._mission,
-            self._PATH_TO_TRAINING_FILE_NUMAX,
         )
-        if val is not None and np.isfinite(val) and val > 0:
-            numax = 10**val
-        else:
-            numax = np.nan
-        return numax
+
+    def compute(self, *args, **kwargs):
+        """Estimate numax from FliPer values"""
+        return predict_batch(self.features()[None], self._PATH_TO_TRAINING_FILE_NUMAX)[0]
 
     def plot(self, *args, **kwargs):
 
         plot_spectrum(
             id=self._id,
-            pg=self._pg,
+            frequency=self._frequency,
+            power=self._power,
             filter_20d=self._filter_20d,
             filter_80d=self._filter_80d,
             noise=self._noise,
@@ -30,6 +30,7 @@ class NumaxFromCoefficientsOfVariation:
         self.id = id or "unknown"
         self.frequency = psd.frequency
         self.power = psd.psd
+        self.nyquist = psd.nyquist
         self.config = config
         self.cov_config = cov_config
         self.initial_numax = initial_numax
@@ -49,7 +50,9 @@ class NumaxFromCoefficientsOfVariation:
             power=self.power,
             min_freq=self.cov_config.min_freq,
             overlap_factor=self.cov_config.overlap_factor,
-            use_linear_bins=self.cov_config.use_linear_bins
+            use_linear_bins=self.cov_config.use_linear_bins,
+            max_freq=self.cov_config.max_freq,
+            nyquist=self.nyquist
         )
         # Smooth CoV values (black crosses)
         self.smoothed_CoVs = smooth_CoV_values(
@@ -72,7 +75,8 @@ class NumaxFromCoefficientsOfVariation:
             frequency=self.frequency,
             power=self.power,
             overlap_factor=self.cov_config.overlap_factor,
-            min_freq=self.cov_config.min_freq
+            min_freq=self.cov_config.min_freq,
+            max_freq=self.cov_config.max_freq
         )
         self.smoothed_CoVs = Bell.smooth_CoV_values(
             self.bin_centers, self.CoVs
@@ -1,6 +1,7 @@
 from .ScalingRelations import (
     compute_numaxes
 )
+from .ScalingRelations.gaia_cache import gaia_cache_from_config
 from typing import Optional
 from ..data_preparation.dataclasses import GaiaData, ProcessingConfig, StarInfo
 
@@ -15,11 +16,8 @@ class NumaxFromScalingRelations:
         self.star = star
         self.config = config
     
-        # Is gaia data already found?
-        if gaia_data.has_data():
-            self.gaia_data = gaia_data
-        else:
-            self.gaia_data = None
+        # Is gaia data already queried? (None means query now)
+        self.gaia_data = gaia_data
 
     def compute(self):
         """
@@ -27,7 +25,8 @@ class NumaxFromScalingRelations:
         """
         self.numaxes = compute_numaxes(
             star = self.star, 
-            gaia_data = self.gaia_data
+            gaia_data = self.gaia_data,
+            cache = gaia_cache_from_config(self.config)
         )
         return self
 
@@ -0,0 +1,57 @@
+"""
+Variable-width window means shared by the proxies (CoV and collapsed ACF smoothing)
+"""
+
+import numpy as np
+from numpy.typing import NDArray
+
+
+def window_nanmean(x : NDArray, y : NDArray, lower : NDArray, upper : NDArray, closed_upper : bool = False):
+    """
+    Mean of the non-NaN y values with lower <= x < upper (or <= upper if closed_upper),
+    for every pair of window edges at once.
+    Windows are found with searchsorted, and sums and counts from cumulative sums, so the
+    cost is O((N + W) log N) instead of one scan of x per window.
+
+    Input:
+        x               :: positions of the values (e.g. bin centers)
+        y               :: values, NaN values are ignored (as np.nanmean)
+        lower           :: lower (closed) window edges
+        upper           :: upper window edges
+        closed_upper    :: include values at x == upper
+
+    Output:
+        means           :: mean per window, NaN if the window has no non-NaN values
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if np.any(np.diff(x) < 0):
+        order = np.argsort(x, kind="stable")
+        x = x[order]
+        y = y[order]
+
+    start = np.searchsorted(x, lower, side="left")
+    stop = np.searchsorted(x, upper, side="right" if closed_upper else "left")
+    stop = np.maximum(start, stop)
+
+    def prefix(a):
+        return np.concatenate(([0], np.cumsum(a)))
+
+    # Infinite values are counted separately, so they do not spoil the sums of all later windows
+    finite = np.isfinite(y)
+    n = prefix(~np.isnan(y))
+    total = prefix(np.where(finite, y, 0.0))
+    pos_inf = prefix(y == np.inf)
+    neg_inf = prefix(y == -np.inf)
+
+    counts = n[stop] - n[start]
+    sums = total[stop] - total[start]
+    n_pos_inf = pos_inf[stop] - pos_inf[start]
+    n_neg_inf = neg_inf[stop] - neg_inf[start]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(counts > 0, sums / counts, np.nan)
+    means[(n_pos_inf > 0) & (n_neg_inf == 0)] = np.inf
+    means[(n_neg_inf > 0) & (n_pos_inf == 0)] = -np.inf
+    means[(n_pos_inf > 0) & (n_neg_inf > 0)] = np.nan
+    return means
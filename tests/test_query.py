@@ -0,0 +1,144 @@
+"""
+Bulk SIMBAD/Gaia query against a local stand-in of the SIMBAD TAP service and the Gaia archive
+"""
+
+import io
+import pytest
+from astropy.table import Table
+from astropy.io.votable import from_table, parse_single_table
+from ..proxies.ScalingRelations import query, query_gaia_bulk, GaiaCache
+
+
+# SIMBAD identifiers of each object (as stored in the ident table)
+SIMBAD_OBJECTS = [
+    ["KIC 3", "Gaia DR2 30", "Gaia DR3 31"],
+    ["KIC 2", "Gaia DR2 20"],
+    ["KIC 4", "Gaia DR2 40", "Gaia DR3 41", "Gaia EDR3 41"],
+    ["KIC 1", "Gaia DR1 10"],
+    ["KIC 5"],
+    ["Kepler-10", "KIC 6", "Gaia DR3 61"],
+]
+# Gaia DR2 -> DR3 cross-match and DR3 astrophysical parameters
+DR2_NEIGHBOURHOOD = {20: 21, 30: 31, 40: 41}
+ASTROPHYSICAL_PARAMETERS = {21: 4800., 31: 4900., 41: 5000., 61: 5100.}
+
+
+def votable(table):
+    """Round trip through VOTable, as results come back from the TAP services"""
+    buffer = io.BytesIO()
+    from_table(table).to_xml(buffer)
+    buffer.seek(0)
+    return parse_single_table(buffer).to_table()
+
+
+class FakeSimbad:
+    """Stand-in of astroquery's Simbad, exact matches on the ident table as the TAP join"""
+
+    def __init__(self):
+        self.tap_queries = 0
+        self.objectid_queries = []
+
+    def query_tap(self, query, maxrec, targets):
+        self.tap_queries += 1
+        rows = []
+        for target, ident in zip(targets["target"], targets["ident"]):
+            for idents in SIMBAD_OBJECTS:
+                if ident in idents:
+                    gaia = [id for id in idents if id.startswith("Gaia")]
+                    rows += [(target, id) for id in gaia] or [(target, "")]
+        return votable(Table(rows=rows, names=("target", "id"), dtype=(str, str)))
+
+    def query_objectids(self, object_name):
+        self.objectid_queries.append(object_name)
+        for idents in SIMBAD_OBJECTS:
+            if object_name in idents:
+                return Table({"id": idents})
+        return None
+
+
+class FakeJob:
+    def __init__(self, results):
+        self.results = results
+
+    def get_results(self):
+        return self.results
+
+
+class FakeGaia:
+    """Stand-in of astroquery's Gaia, joins the uploaded source ids as get_bulk_query does"""
+
+    def __init__(self):
+        self.jobs = []
+
+    def launch_job_async(self, query, upload_resource, upload_table_name):
+        dr2 = "dr2_neighbourhood" in query
+        self.jobs.append(("DR2" if dr2 else "DR3", list(upload_resource["target"])))
+        rows = []
+        for target, source_id in zip(upload_resource["target"], upload_resource["source_id"]):
+            source_id = DR2_NEIGHBOURHOOD.get(int(source_id)) if dr2 else int(source_id)
+            if source_id in ASTROPHYSICAL_PARAMETERS:
+                teff = ASTROPHYSICAL_PARAMETERS[source_id]
+                rows.append((target, source_id, teff, teff - 100., teff + 100.))
+        names = ("target", "source_id", "teff_gspphot", "teff_gspphot_lower", "teff_gspphot_upper")
+        return FakeJob(votable(Table(rows=rows, names=names, dtype=(str, int, float, float, float))))
+
+
+@pytest.fixture
+def services(monkeypatch):
+    simbad, gaia = FakeSimbad(), FakeGaia()
+    monkeypatch.setattr(query, "Simbad", simbad)
+    monkeypatch.setattr(query, "Gaia", gaia)
+    return simbad, gaia
+
+
+def teff(gaia_data):
+    if gaia_data is None or gaia_data.teff_gspphot is None:
+        return None
+    return gaia_data.teff_gspphot.nominal_value
+
+
+def test_bulk_query_data_releases(services):
+    simbad, gaia = services
+    ids = ["KIC3", "kic_2", "KIC 4", "KIC 1", "KIC 5", "Kepler-10", "KIC 99"]
+    results = query_gaia_bulk(ids, batch_size=4)
+
+    assert list(results) == ids
+    assert teff(results["KIC3"]) == 4900.  # DR3 chosen over DR2
+    assert teff(results["kic_2"]) == 4800.  # DR2 through dr2_neighbourhood
+    assert teff(results["KIC 4"]) == 5000.  # EDR3 queried as DR3
+    assert teff(results["KIC 1"]) is None  # DR1 only, not queried
+    assert teff(results["KIC 5"]) is None  # no Gaia id
+    assert teff(results["Kepler-10"]) == 5100.  # not matched in bulk, resolved on its own
+    assert teff(results["KIC 99"]) is None  # not in SIMBAD
+
+    assert simbad.tap_queries == 2
+    assert simbad.objectid_queries == ["Kepler-10", "KIC 99"]
+    assert sorted(release for release, _ in gaia.jobs) == ["DR2", "DR3"]
+
+
+def test_bulk_query_cache(services, tmp_path):
+    simbad, gaia = services
+    cache = GaiaCache(str(tmp_path / "gaia.sqlite"))
+    ids = ["KIC 1", "KIC 2", "KIC 3", "KIC 99"]
+    first = query_gaia_bulk(ids, cache=cache)
+    n_jobs = len(gaia.jobs)
+
+    second = query_gaia_bulk(ids, cache=cache)
+    assert len(gaia.jobs) == n_jobs and simbad.tap_queries == 1
+    assert {id: teff(data) for id, data in first.items()} == {id: teff(data) for id, data in second.items()}
+
+
+def test_bulk_query_failures(services, monkeypatch):
+    simbad, gaia = services
+
+    def unavailable(*args, **kwargs):
+        raise ConnectionError("service unavailable")
+
+    monkeypatch.setattr(gaia, "launch_job_async", unavailable)
+    results = query_gaia_bulk(["KIC 1", "KIC 3", "KIC 5"])
+    assert results["KIC 3"] is None  # failed job, queried again later
+    assert teff(results["KIC 1"]) is None and results["KIC 1"] is not None
+    assert teff(results["KIC 5"]) is None and results["KIC 5"] is not None
+
+    monkeypatch.setattr(simbad, "query_tap", unavailable)
+    assert query_gaia_bulk(["KIC 1", "KIC 3"]) == {"KIC 1": None, "KIC 3": None}